@@ -11,6 +11,7 @@ __license__ = "MIT"
 import subprocess
 import sys
 import os
+import signal
 import argparse
 import shutil
 import time
@@ -18,10 +19,26 @@ import json
 import re
 import locale
 import socket
+import hashlib
+import hmac
+import mmap
+import sqlite3
+import heapq
+import statistics
+import tempfile
+import configparser
+import threading
+import email.utils
+import urllib.request
+import urllib.error
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Tuple
 import logging
+import io
+from collections import deque
 
 
 # ========================
@@ -278,8 +295,8 @@ TRANSLATIONS = {
         'en': '⏭️  Skipping eix update (--skip-eix)'
     },
     'SYNC_FAILED': {
-        'de': 'Repository-Synchronisation fehlgeschlagen nach 2 Versuchen',
-        'en': 'Repository synchronisation failed after 2 attempts'
+        'de': 'Repository-Synchronisation fehlgeschlagen nach {attempts} Versuchen',
+        'en': 'Repository synchronisation failed after {attempts} attempts'
     },
     'MODULES_CURRENT': {
         'de': 'Kernel-Module sind aktuell - keine Neucompilierung nötig',
@@ -318,8 +335,8 @@ TRANSLATIONS = {
         'en': 'make.conf not found: {path}'
     },
     'SYNC_RETRY': {
-        'de': 'Sync fehlgeschlagen - räume auf und versuche erneut...',
-        'en': 'Sync failed - cleaning up and retrying...'
+        'de': 'Sync fehlgeschlagen - räume auf und versuche erneut mit {mirror} in {delay}s...',
+        'en': 'Sync failed - cleaning up and retrying with {mirror} in {delay}s...'
     },
     'MODULE_ANALYSIS': {
         'de': 'Analysiere zu aktualisierende Pakete...',
@@ -460,8 +477,8 @@ HELP_TEXTS = {
         'en': 'Timeout in seconds for emerge operations'
     },
     'retry_count': {
-        'de': 'Anzahl der Wiederholungsversuche bei Fehler (Standard: 1)',
-        'en': 'Number of retries on failure (default: 1)'
+        'de': 'Durchläufe durch die Rsync-Mirror-Liste bei Sync-Fehlern, mit Backoff (Standard: 1)',
+        'en': 'Passes through the rsync mirror list on sync failures, with backoff (default: 1)'
     },
     'notification_webhook': {
         'de': 'Sende Abschluss-Benachrichtigung an Webhook-URL',
@@ -480,8 +497,8 @@ HELP_TEXTS = {
         'en': 'Custom Gentoo mirrors (comma-separated URLs)'
     },
     'use_mirrorselect': {
-        'de': 'Nutze mirrorselect für automatische Auswahl des schnellsten Mirrors',
-        'en': 'Use mirrorselect for automatic selection of fastest mirror'
+        'de': 'Nutze die mirrorselect-UI (nur mit Terminal) statt des eingebauten Mirror-Benchmarks',
+        'en': 'Use the mirrorselect UI (terminal only) instead of the built-in mirror benchmark'
     },
     'etc_update_mode': {
         'de': 'Modus für Konfigurationsdateien-Updates (Standard: interaktiv)',
@@ -512,8 +529,44 @@ HELP_TEXTS = {
         'en': 'Try to automatically handle blocked packages (uses --backtrack)'
     },
     'backtrack': {
-        'de': 'Backtrack-Stufe für Abhängigkeitslöser (Standard: 20)',
-        'en': 'Backtrack level for dependency resolver (default: 20)'
+        'de': 'Feste Backtrack-Stufe für Abhängigkeitslöser (Standard: aus früheren Runs gelernt)',
+        'en': 'Fixed backtrack level for dependency resolver (default: learned from previous runs)'
+    },
+    'plan_graph': {
+        'de': 'Zeige Merge-Graph der ausstehenden Updates (kritischer Pfad, Parallelität) als text, json oder dot',
+        'en': 'Show merge graph of pending updates (critical path, parallelism) as text, json or dot'
+    },
+    'deadline': {
+        'de': 'Wartungsfenster-Ende (HH:MM) - plant nur Updates ein, die rechtzeitig fertig werden',
+        'en': 'Maintenance window end (HH:MM) - only schedules updates that finish in time'
+    },
+    'window': {
+        'de': 'Länge des Wartungsfensters (z.B. 3h, 90m, 2h30m) - Alternative zu --deadline',
+        'en': 'Maintenance window length (e.g. 3h, 90m, 2h30m) - alternative to --deadline'
+    },
+    'fetch': {
+        'de': 'FETCHCOMMAND-Modus: lädt URI segmentiert von mehreren Mirrors nach DATEI '
+              '(make.conf: FETCHCOMMAND="gentoo-updater --fetch \\"\\${URI}\\" \\"\\${DISTDIR}/\\${FILE}\\"")',
+        'en': 'FETCHCOMMAND mode: downloads URI in segments from several mirrors to FILE '
+              '(make.conf: FETCHCOMMAND="gentoo-updater --fetch \\"\\${URI}\\" \\"\\${DISTDIR}/\\${FILE}\\"")'
+    },
+    'binhost': {
+        'de': 'Binhost-URL für Binärpakete (--getbinpkg); zeigt vorab, welche Updates als Binärpaket verfügbar sind',
+        'en': 'Binhost URL for binary packages (--getbinpkg); reports up front which updates have a binary package'
+    },
+    'role': {
+        'de': 'Fleet-Rolle: builder baut mit --buildpkg und veröffentlicht PKGDIR plus signierten Plan, '
+              'consumer installiert diesen Plan mit --usepkgonly',
+        'en': 'Fleet role: builder builds with --buildpkg and publishes PKGDIR plus a signed plan, '
+              'consumer installs that plan with --usepkgonly'
+    },
+    'history': {
+        'de': 'Zeige Build-Dauern eines Pakets aus /var/log/emerge.log (z.B. sys-devel/gcc)',
+        'en': 'Show build durations of a package from /var/log/emerge.log (e.g. sys-devel/gcc)'
+    },
+    'plan_graph_output': {
+        'de': 'Schreibe --plan-graph Export in Datei statt auf stdout',
+        'en': 'Write --plan-graph export to a file instead of stdout'
     }
 }
 
@@ -624,144 +677,2492 @@ def translate(key: str, **kwargs) -> str:
         return f"[TRANSLATION MISSING: {key}]"
 
 
-class Config:
-    """Konfigurationsverwaltung für den Updater"""
+# ========================
+# Mirror-Benchmark
+# ========================
+
+# Datei für den HTTP-Range-Download - liegt auf jedem vollständigen Distfile-Mirror
+MIRROR_PROBE_PATH = 'snapshots/gentoo-latest.tar.xz'
+MIRROR_PROBE_BYTES = 256 * 1024
+MIRROR_PROBE_TIMEOUT = 3.0
+DEFAULT_PORTS = {'http': 80, 'https': 443, 'rsync': 873}
+
+
+class MirrorProbe:
+    """Messergebnis für einen Mirror"""
     
-    DEFAULT_CONFIG = {
-        'emerge_jobs': 'auto',  # auto = CPU-Kerne, oder z.B. '4'
-        'emerge_load_average': 'auto',  # auto = CPU-Kerne, oder z.B. '4.0'
-        'enable_backups': True,
-        'backup_dir': '/var/backups/gentoo-updater',
-        'enable_notifications': False,
-        'notification_email': '',
-        'min_free_space_gb': 5,
-        'auto_depclean': True,
-        'auto_revdep_rebuild': True,
-        'critical_packages': ['sys-devel/gcc', 'sys-libs/glibc', 'dev-lang/python'],
-        'log_retention_days': 30
-    }
+    __slots__ = ('url', 'latency', 'throughput', 'error')
     
-    def __init__(self, config_file: str = '/etc/gentoo-updater.conf'):
-        self.config_file = config_file
-        self.config = self.load_config()
-        
-    def load_config(self) -> Dict:
-        """Lädt Konfiguration aus Datei oder verwendet Defaults"""
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    user_config = json.load(f)
-                    # Merge mit Defaults
-                    config = self.DEFAULT_CONFIG.copy()
-                    config.update(user_config)
-                    return config
-            except Exception as e:
-                print(f"{Colors.WARNING}[WARNING]{Colors.ENDC} {_('CONFIG_LOAD_WARNING', error=e)}")
-                return self.DEFAULT_CONFIG.copy()
-        return self.DEFAULT_CONFIG.copy()
+    def __init__(self, url: str, latency: Optional[float] = None,
+                 throughput: Optional[float] = None, error: Optional[str] = None):
+        self.url = url
+        self.latency = latency          # TCP-Connect bzw. rsync-Greeting in Sekunden
+        self.throughput = throughput    # Bytes/s beim Range-Download (nur HTTP)
+        self.error = error
     
-    def save_default_config(self):
-        """Speichert Default-Konfiguration in Datei"""
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.DEFAULT_CONFIG, f, indent=2)
-            print(f"{Colors.OKGREEN}[SUCCESS]{Colors.ENDC} {_('CONFIG_SAVE_SUCCESS', path=self.config_file)}")
-        except Exception as e:
-            print(f"{Colors.FAIL}[ERROR]{Colors.ENDC} {_('CONFIG_SAVE_ERROR', error=e)}")
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.latency is not None
     
-    def get(self, key: str, default=None):
-        """Gibt Konfigurationswert zurück"""
-        return self.config.get(key, default)
+    def sort_key(self) -> Tuple[int, float, float]:
+        """Erreichbar vor unerreichbar, dann Durchsatz absteigend, dann Latenz"""
+        if not self.ok:
+            return 1, 0.0, 0.0
+        return 0, -(self.throughput or 0.0), self.latency
     
-    def get_emerge_jobs(self) -> int:
-        """Berechnet optimale Job-Anzahl"""
-        jobs = self.config['emerge_jobs']
-        if jobs == 'auto':
-            return os.cpu_count() or 1
-        return int(jobs)
+    def to_dict(self) -> Dict:
+        return {
+            'url': self.url,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'throughput_kib_s': round(self.throughput / 1024, 1) if self.throughput else None,
+            'error': self.error
+        }
+
+
+def _mirror_address(url: str) -> Tuple[str, int]:
+    """Host und Port einer Mirror-URL"""
+    parsed = urlparse(url)
+    return parsed.hostname or '', parsed.port or DEFAULT_PORTS.get(parsed.scheme, 80)
+
+
+def probe_http_mirror(url: str, timeout: float = MIRROR_PROBE_TIMEOUT,
+                      probe_bytes: int = MIRROR_PROBE_BYTES) -> MirrorProbe:
+    """Misst TCP-Latenz und Durchsatz eines HTTP(S)-Distfile-Mirrors
     
-    def get_load_average(self) -> float:
-        """Berechnet optimale Load Average"""
-        load = self.config['emerge_load_average']
-        if load == 'auto':
-            return float(os.cpu_count() or 1)
-        return float(load)
+    Der Durchsatz wird über einen Range-Request auf MIRROR_PROBE_PATH gemessen;
+    der Download wird nach probe_bytes oder spätestens nach timeout abgebrochen.
+    """
+    probe = MirrorProbe(url)
+    host, port = _mirror_address(url)
+    try:
+        start = time.monotonic()
+        with socket.create_connection((host, port), timeout=timeout):
+            probe.latency = time.monotonic() - start
+        
+        request = urllib.request.Request(
+            url.rstrip('/') + '/' + MIRROR_PROBE_PATH,
+            headers={'Range': f'bytes=0-{probe_bytes - 1}',
+                     'User-Agent': f'gentoo-updater/{__version__}'}
+        )
+        start = time.monotonic()
+        deadline = start + timeout
+        received = 0
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            while received < probe_bytes and time.monotonic() < deadline:
+                chunk = response.read(min(65536, probe_bytes - received))
+                if not chunk:
+                    break
+                received += len(chunk)
+        elapsed = time.monotonic() - start
+        if not received:
+            probe.error = 'keine Daten empfangen'
+        else:
+            probe.throughput = received / max(elapsed, 1e-6)
+    except (OSError, urllib.error.URLError, ValueError) as e:
+        probe.error = str(getattr(e, 'reason', e))
+    return probe
 
 
-class GentooUpdater:
-    """Hauptklasse für Gentoo System-Updates"""
+def probe_rsync_mirror(url: str, timeout: float = MIRROR_PROBE_TIMEOUT) -> MirrorProbe:
+    """Misst die Zeit bis zum Greeting ('@RSYNCD: <version>') eines rsync-Daemons"""
+    probe = MirrorProbe(url)
+    host, port = _mirror_address(url)
+    try:
+        start = time.monotonic()
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.settimeout(max(0.1, timeout - (time.monotonic() - start)))
+            greeting = sock.recv(64)
+            if not greeting.startswith(b'@RSYNCD:'):
+                probe.error = 'kein rsync-Daemon'
+            else:
+                probe.latency = time.monotonic() - start
+    except OSError as e:
+        probe.error = str(e)
+    return probe
+
+
+def rank_mirrors(urls: List[str], probe=probe_http_mirror, max_workers: int = 8,
+                 **kwargs) -> List[MirrorProbe]:
+    """Prüft alle Mirrors parallel und gibt sie nach Qualität sortiert zurück
     
-    def __init__(self, verbose: bool = False, dry_run: bool = False, 
-                 rebuild_modules: bool = False, config: Optional[Config] = None,
-                 log_level: str = 'INFO', timeout: Optional[int] = None,
-                 retry_count: int = 1, webhook_url: Optional[str] = None,
-                 max_packages: Optional[int] = None, custom_mirrors: Optional[List[str]] = None,
-                 etc_update_mode: str = 'interactive', auto_autounmask: bool = True):
-        self.verbose = verbose
-        self.dry_run = dry_run
-        self.rebuild_modules = rebuild_modules
-        self.config = config or Config()
-        self.log_level = log_level
+    Args:
+        urls: Mirror-URLs
+        probe: probe_http_mirror oder probe_rsync_mirror
+        max_workers: Maximale Anzahl paralleler Proben
+        kwargs: Weitere Argumente für die Probe (timeout, probe_bytes)
+    """
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+        results = list(pool.map(lambda url: probe(url, **kwargs), urls))
+    return sorted(results, key=MirrorProbe.sort_key)
+
+
+def parse_tree_timestamp(text: str) -> Optional[datetime]:
+    """Parst den Inhalt von metadata/timestamp.chk (RFC 2822, z.B. 'Sat, 17 Oct 2026 00:45:01 +0000')"""
+    try:
+        return email.utils.parsedate_to_datetime(text.strip())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+SYNC_COMPLETED_RE = re.compile(rb'^(\d+):\s+=== Sync completed for (\S+)', re.MULTILINE)
+
+
+def last_local_sync(repo_path: str, emerge_log: str, repo: str = 'gentoo',
+                    tail_bytes: int = 1024 ** 2) -> Optional[float]:
+    """Zeitpunkt des letzten lokalen Syncs eines Repositories
+    
+    Bevorzugt '=== Sync completed for <repo>' aus dem Ende von emerge.log, sonst die
+    ctime von metadata/timestamp.chk (rsync übernimmt die mtime des Mirrors, die
+    ctime setzt erst das Schreiben auf dem Host).
+    
+    Returns:
+        Unix-Zeit oder None wenn nicht ermittelbar
+    """
+    try:
+        with open(emerge_log, 'rb') as f:
+            start = max(0, os.fstat(f.fileno()).st_size - tail_bytes)
+            f.seek(start)
+            data = f.read()
+        if start:
+            data = data.split(b'\n', 1)[-1]  # angeschnittene erste Zeile verwerfen
+        synced = [int(match.group(1)) for match in SYNC_COMPLETED_RE.finditer(data)
+                  if match.group(2).decode('utf-8', 'replace') == repo]
+        if synced:
+            return float(synced[-1])
+    except OSError:
+        pass
+    try:
+        return os.stat(os.path.join(repo_path, 'metadata', 'timestamp.chk')).st_ctime
+    except OSError:
+        return None
+
+
+def fetch_remote_timestamp(uri: str, timeout: float = 10.0) -> Optional[datetime]:
+    """Holt metadata/timestamp.chk eines Mirrors ohne den Tree zu synchronisieren
+    
+    rsync-Mirrors: Einzeldatei-Transfer mit rsync, HTTP(S)-Mirrors: GET.
+    
+    Returns:
+        Zeitstempel des Mirror-Trees oder None wenn nicht ermittelbar
+    """
+    remote_path = uri.rstrip('/') + '/metadata/timestamp.chk'
+    try:
+        if uri.startswith('rsync://'):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                target = os.path.join(tmp_dir, 'timestamp.chk')
+                result = subprocess.run(
+                    ["rsync", "--no-motd", f"--contimeout={int(timeout)}", f"--timeout={int(timeout)}",
+                     remote_path, target],
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout * 2
+                )
+                if result.returncode != 0:
+                    return None
+                with open(target, 'r') as f:
+                    return parse_tree_timestamp(f.read())
+        request = urllib.request.Request(remote_path, headers={'User-Agent': f'gentoo-updater/{__version__}'})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return parse_tree_timestamp(response.read(256).decode('ascii', 'replace'))
+    except (OSError, subprocess.TimeoutExpired, urllib.error.URLError, ValueError):
+        return None
+
+
+# rsync --stats (Portage nutzt --human-readable) und wget-Ausgabe beim Fetch
+RSYNC_START_RE = re.compile(r'>>> Starting rsync with (rsync://\S+?)\.{0,3}$')
+RSYNC_STATS_RE = re.compile(r'^sent ([\d.,]+[KMGT]?) bytes\s+received ([\d.,]+[KMGT]?) bytes\s+([\d.,]+[KMGT]?) bytes/sec')
+WGET_URL_RE = re.compile(r'^--\d{4}-\d\d-\d\d \d\d:\d\d:\d\d--\s+(\S+)')
+WGET_SAVED_RE = re.compile(r'\(([\d.,]+) ([KMG]?B)/s\) - .* saved \[(\d+)')
+WGET_FAILED_RE = re.compile(r'failed: |Unable to establish SSL connection|Read error|Connection timed out')
+HUMAN_UNITS = {'': 1, 'K': 1000, 'M': 1000 ** 2, 'G': 1000 ** 3, 'T': 1000 ** 4}
+WGET_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def parse_human_number(value: str) -> float:
+    """Parst Zahlen wie '1,234,567', '1.234.567', '1.234,56' oder '45.67M' aus rsync-Statistiken
+    
+    rsync formatiert nach der Locale: '.' und ',' können Tausender- wie Dezimaltrenner
+    sein. Kommen beide vor, ist der letzte der Dezimaltrenner; ein einzelner Trenner
+    gefolgt von genau drei Ziffern gilt ohne Einheit als Tausendertrenner.
+    """
+    unit = value[-1] if value[-1] in HUMAN_UNITS else ''
+    digits = value[:-1] if unit else value
+    separators = [char for char in digits if char in '.,']
+    if separators:
+        decimal = separators[-1]
+        if len(set(separators)) == 1 and (len(separators) > 1 or (not unit and len(digits.rsplit(decimal, 1)[1]) == 3)):
+            decimal = None
+        integer, _, fraction = digits.rpartition(decimal) if decimal else (digits, '', '')
+        digits = integer.replace('.', '').replace(',', '') + ('.' + fraction if decimal else '')
+    return float(digits) * HUMAN_UNITS[unit]
+
+
+class MirrorScoreboard:
+    """Persistente Mirror-Bewertung unter cache_dir/mirrors.json
+    
+    Pro Mirror werden Durchsatz, Latenz und Fehlerrate als EWMA geführt - gespeist
+    aus den Proben von rank_mirrors() und aus echten Transfers (emerge --sync, Fetch).
+    """
+    
+    ALPHA = 0.3
+    
+    def __init__(self, state_cache: 'StateCache'):
+        self.state_cache = state_cache
+        data = state_cache.load('mirrors')
+        self.mirrors: Dict[str, Dict] = data.get('mirrors', {})
+        self.probed_at: float = data.get('probed_at', 0.0)
+    
+    def _entry(self, url: str) -> Dict:
+        return self.mirrors.setdefault(url, {
+            'throughput': None, 'latency': None, 'failure_rate': 0.0,
+            'samples': 0, 'last_success': None, 'last_failure': None, 'updated': None
+        })
+    
+    def _update(self, entry: Dict, key: str, value: float):
+        old = entry[key]
+        entry[key] = value if old is None else self.ALPHA * value + (1 - self.ALPHA) * old
+        entry['samples'] += 1
+        entry['updated'] = time.time()
+    
+    def record_success(self, url: str):
+        entry = self._entry(url)
+        self._update(entry, 'failure_rate', 0.0)
+        entry['last_success'] = time.time()
+    
+    def record_failure(self, url: str):
+        entry = self._entry(url)
+        self._update(entry, 'failure_rate', 1.0)
+        entry['last_failure'] = time.time()
+    
+    def record_probe(self, probe: MirrorProbe):
+        """Übernimmt ein Probe-Ergebnis"""
+        if not probe.ok:
+            self.record_failure(probe.url)
+            return
+        entry = self._entry(probe.url)
+        self._update(entry, 'latency', probe.latency)
+        if probe.throughput:
+            self._update(entry, 'throughput', probe.throughput)
+        self.record_success(probe.url)
+    
+    def record_transfer(self, url: str, size: float, seconds: float):
+        """Übernimmt einen echten Transfer (Bytes und Dauer)"""
+        if size <= 0 or seconds <= 0:
+            return
+        self._update(self._entry(url), 'throughput', size / seconds)
+        self.record_success(url)
+    
+    def mark_probed(self):
+        self.probed_at = time.time()
+    
+    def needs_probe(self, urls: List[str], ttl: float) -> bool:
+        """True wenn die Rangfolge abgelaufen ist, Mirrors fehlen, seit der Messung Fehler
+        auftraten oder auch der bestbewertete Mirror zuletzt fehlschlug"""
+        if time.time() - self.probed_at > ttl:
+            return True
+        for url in urls:
+            entry = self.mirrors.get(url)
+            if entry is None:
+                return True
+            if entry['last_failure'] and entry['last_failure'] > self.probed_at:
+                return True
+        best = self.mirrors[self.rank(urls)[0]] if urls else None
+        return bool(best and best['last_failure'] and best['last_failure'] >= (best.get('last_success') or 0))
+    
+    def sort_key(self, url: str) -> Tuple[int, float, float]:
+        """Bekannte vor unbekannten Mirrors, dann Durchsatz * Erfolgsquote, dann Latenz"""
+        entry = self.mirrors.get(url)
+        if not entry or entry['latency'] is None and entry['throughput'] is None:
+            return 1, 0.0, 0.0
+        score = (entry['throughput'] or 0.0) * (1.0 - entry['failure_rate'])
+        return int(entry['failure_rate'] >= 0.5), -score, entry['latency'] or 0.0
+    
+    def rank(self, urls: List[str]) -> List[str]:
+        """Sortiert Mirror-URLs nach Bewertung (stabil für Gleichstand)"""
+        return sorted(urls, key=self.sort_key)
+    
+    def describe(self, url: str) -> str:
+        """Kurzbeschreibung für die Mirror-Ausgabe, leer wenn unbekannt"""
+        entry = self.mirrors.get(url)
+        if not entry:
+            return ''
+        parts = []
+        if entry['throughput']:
+            parts.append(f"{entry['throughput'] / 1024 ** 2:.1f} MiB/s")
+        if entry['latency'] is not None:
+            parts.append(f"{entry['latency'] * 1000:.0f} ms")
+        parts.append(f"{entry['failure_rate'] * 100:.0f}% Fehler")
+        return f" ({', '.join(parts)})"
+    
+    def save(self) -> bool:
+        return self.state_cache.save('mirrors', {'probed_at': self.probed_at, 'mirrors': self.mirrors})
+
+
+class MirrorTransferObserver:
+    """Zeilen-Observer für run_command: liest Transfer-Statistiken aus rsync- und wget-Ausgabe
+    
+    rsync-Statistiken werden dem Mirror aus '>>> Starting rsync with ...' zugeordnet
+    (oder dem konfigurierten sync-uri), wget-Downloads dem Mirror mit passendem URL-Präfix.
+    """
+    
+    def __init__(self, scoreboard: MirrorScoreboard, mirrors: List[str]):
+        self.scoreboard = scoreboard
+        self.mirrors = mirrors
+        self.rsync_mirror: Optional[str] = None
+        self._rsync_current: Optional[str] = None
+        self._wget_url: Optional[str] = None
+    
+    def mirror_for(self, url: str) -> Optional[str]:
+        """Bekannter Mirror, zu dem eine Download-URL gehört"""
+        for mirror in self.mirrors:
+            if url.startswith(mirror.rstrip('/')):
+                return mirror
+        return None
+    
+    def __call__(self, line: str):
+        line = line.strip()
+        match = RSYNC_START_RE.search(line)
+        if match:
+            self._rsync_current = self.mirror_for(match.group(1)) or self.rsync_mirror
+            return
+        match = RSYNC_STATS_RE.match(line)
+        if match:
+            mirror = self._rsync_current or self.rsync_mirror
+            rate = parse_human_number(match.group(3))
+            received = parse_human_number(match.group(2))
+            if mirror and rate > 0:
+                self.scoreboard.record_transfer(mirror, received, received / rate)
+            return
+        match = WGET_URL_RE.match(line)
+        if match:
+            self._wget_url = match.group(1)
+            return
+        mirror = self.mirror_for(self._wget_url) if self._wget_url else None
+        if not mirror:
+            return
+        match = WGET_SAVED_RE.search(line)
+        if match:
+            rate = float(match.group(1).replace(',', '.')) * WGET_UNITS.get(match.group(2), 1)
+            size = int(match.group(3))
+            if rate > 0:
+                self.scoreboard.record_transfer(mirror, size, size / rate)
+            self._wget_url = None
+        elif WGET_FAILED_RE.search(line):
+            self.scoreboard.record_failure(mirror)
+            self._wget_url = None
+
+
+# ========================
+# Segmentierter Downloader
+# ========================
+
+SEGMENT_SIZE = 8 * 1024 ** 2
+MANIFEST_HASHES = {'BLAKE2B': hashlib.blake2b, 'SHA512': hashlib.sha512}
+DOWNLOAD_SUFFIX = '.__download__'
+VERIFY_CHUNK = 4 * 1024 ** 2
+
+
+class FetchError(Exception):
+    """Download oder Verifikation eines Distfiles fehlgeschlagen"""
+
+
+def read_manifest_dist(manifest_path: str, filename: str) -> Optional[Tuple[int, Dict[str, str]]]:
+    """Sucht den DIST-Eintrag eines Distfiles im Manifest
+    
+    Returns:
+        Tuple (size, digests) mit BLAKE2B/SHA512 oder None wenn nicht gefunden
+    """
+    try:
+        with open(manifest_path, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[0] == 'DIST' and parts[1] == filename:
+                    digests = dict(zip(parts[3::2], parts[4::2]))
+                    return int(parts[2]), {name: value for name, value in digests.items()
+                                           if name in MANIFEST_HASHES}
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def verify_distfile(path: str, size: int, digests: Dict[str, str]) -> str:
+    """Prüft ein Distfile gegen Größe und Hashes aus dem Manifest (läuft im Prozess-Pool)
+    
+    Alle Hashes werden in einem Durchgang über eine mmap-Abbildung der Datei berechnet.
+    
+    Returns:
+        'ok', 'missing', 'partial' (kleiner als erwartet, emerge setzt fort) oder 'corrupt'
+    """
+    try:
+        actual = os.path.getsize(path)
+    except OSError:
+        return 'missing'
+    if actual < size:
+        return 'partial'
+    if actual > size:
+        return 'corrupt'
+    
+    hashers = {name: MANIFEST_HASHES[name]() for name in digests}
+    try:
+        with open(path, 'rb') as f:
+            if size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                    for offset in range(0, size, VERIFY_CHUNK):
+                        with view[offset:offset + VERIFY_CHUNK] as chunk:
+                            for hasher in hashers.values():
+                                hasher.update(chunk)
+    except (OSError, ValueError):
+        return 'corrupt'
+    if any(hashers[name].hexdigest() != value.lower() for name, value in digests.items()):
+        return 'corrupt'
+    return 'ok'
+
+
+def distfile_mirror_url(mirror: str, filename: str) -> str:
+    """URL eines Distfiles auf einem Gentoo-Mirror (layouts.conf: filename-hash BLAKE2B 8)"""
+    prefix = hashlib.blake2b(filename.encode()).hexdigest()[:2]
+    return f"{mirror.rstrip('/')}/distfiles/{prefix}/{filename}"
+
+
+class SegmentedDownloader:
+    """Lädt große Dateien in HTTP-Range-Segmenten parallel von mehreren Mirrors
+    
+    Segmente werden direkt an ihre Position in der vorab allozierten Datei
+    geschrieben und in Dateireihenfolge durch die Manifest-Hashes geschoben -
+    ohne zweiten Lesedurchgang. Worker laufen höchstens 2 * connections Segmente
+    vor der Hash-Position, das begrenzt den Speicherbedarf. Zu langsame oder
+    fehlerhafte Segmente werden vom nächsten Mirror geladen.
+    """
+    
+    def __init__(self, connections: int = 4, segment_size: int = SEGMENT_SIZE,
+                 timeout: float = 30.0, min_speed: int = 64 * 1024, logger=None):
+        self.connections = max(1, connections)
+        self.segment_size = segment_size
         self.timeout = timeout
-        self.retry_count = retry_count
-        self.webhook_url = webhook_url
-        self.max_packages = max_packages
-        self.custom_mirrors = custom_mirrors
-        self.etc_update_mode = etc_update_mode  # interactive, auto, oder skip
-        self.auto_autounmask = auto_autounmask
+        self.min_speed = min_speed      # Bytes/s - langsamere Segmente wechseln den Mirror
+        self.logger = logger or logging.getLogger(__name__)
+    
+    def _request(self, url: str, start: Optional[int] = None, end: Optional[int] = None):
+        headers = {'User-Agent': f'gentoo-updater/{__version__}'}
+        if start is not None:
+            headers['Range'] = f'bytes={start}-{end}'
+        return urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=self.timeout)
+    
+    def probe_size(self, urls: List[str]) -> Optional[int]:
+        """Dateigröße über einen Range-Request auf das erste Byte (Content-Range)"""
+        for url in urls:
+            try:
+                with self._request(url, 0, 0) as response:
+                    content_range = response.headers.get('Content-Range', '')
+                    if response.status == 206 and '/' in content_range:
+                        return int(content_range.rsplit('/', 1)[1])
+            except (OSError, urllib.error.URLError, ValueError):
+                continue
+        return None
+    
+    def _fetch_segment(self, urls: List[str], first: int, start: int, end: int, stats: Dict) -> bytes:
+        """Lädt ein Segment, beginnend beim Mirror urls[first], mit Mirror-Wechsel bei Fehlern"""
+        expected = end - start + 1
+        for attempt in range(len(urls)):
+            url = urls[(first + attempt) % len(urls)]
+            deadline = time.monotonic() + max(self.timeout, expected / self.min_speed)
+            try:
+                with self._request(url, start, end) as response:
+                    if response.status != 206:
+                        raise FetchError(f"Server unterstützt keine Range-Requests (HTTP {response.status})")
+                    buffer = bytearray()
+                    while len(buffer) < expected:
+                        chunk = response.read(min(1024 ** 2, expected - len(buffer)))
+                        if not chunk:
+                            break
+                        buffer += chunk
+                        if time.monotonic() > deadline:
+                            raise FetchError("Segment zu langsam")
+                if len(buffer) != expected:
+                    raise FetchError(f"unvollständig ({len(buffer)}/{expected} Bytes)")
+                stats['mirrors'][url] = stats['mirrors'].get(url, 0) + expected
+                return bytes(buffer)
+            except (OSError, urllib.error.URLError, FetchError) as e:
+                stats['retries'] += 1
+                self.logger.info(f"Segment {start}-{end} von {url}: {getattr(e, 'reason', e)} - nächster Mirror")
+        raise FetchError(f"Segment {start}-{end} von keinem Mirror ladbar")
+    
+    def fetch(self, urls: List[str], target: str, size: Optional[int] = None,
+              digests: Optional[Dict[str, str]] = None) -> Dict:
+        """Lädt eine Datei segmentiert und verifiziert sie gegen die Manifest-Digests
         
-        # Skip-Flags (werden von main() gesetzt)
-        self.skip_sync = False
-        self.skip_update = False
-        self.skip_eix = False
-        self.skip_cleanup = False
-        self.skip_revdep = False
+        Unterstützt kein Server Range-Requests (z.B. GitHub-Tarballs) oder scheitert
+        der segmentierte Download, wird die Datei mit einem einzelnen GET geladen.
         
-        # Logging einrichten
-        self.log_dir = Path('/var/log/gentoo-updater')
-        self.log_dir.mkdir(parents=True, exist_ok=True)
-        self.log_file = self.log_dir / f"update-{datetime.now().strftime('%Y%m%d-%H%M%S')}.log"
+        Args:
+            urls: Download-URLs derselben Datei, nach Mirror-Rang sortiert
+            target: Zieldatei (wird erst nach erfolgreicher Verifikation ersetzt)
+            size: Dateigröße aus dem Manifest (sonst per Range-Request ermittelt)
+            digests: Erwartete Hashes, z.B. {'BLAKE2B': ..., 'SHA512': ...}
         
-        self.setup_logging()
+        Returns:
+            Statistik mit bytes, seconds, segments, retries und Bytes pro Mirror
         
-        # Statistiken für Summary
-        self.stats = {
-            'packages_updated': [],
-            'packages_removed': [],
-            'critical_packages': [],
-            'kernel_updated': False,
-            'modules_rebuilt': False,
-            'errors': [],
-            'warnings': [],
-            'gentoo_mirrors': [],
-            'used_mirror': None,
-            'retry_count': self.retry_count,
-            'timeout': self.timeout,
-            'max_packages': self.max_packages
-        }
+        Raises:
+            FetchError: wenn auch der Download am Stück von keinem Mirror gelingt
+        """
+        if size is None:
+            size = self.probe_size(urls)
+            if size is None:
+                self.logger.info("Dateigröße nicht ermittelbar (kein Range-Support) - lade am Stück")
+                return self.fetch_single(urls, target, None, digests)
+        try:
+            return self._fetch_segmented(urls, target, size, digests)
+        except FetchError as e:
+            self.logger.info(f"Segmentierter Download fehlgeschlagen ({e}) - lade am Stück")
+            return self.fetch_single(urls, target, size, digests)
     
-    def setup_logging(self):
-        """Konfiguriert das Logging-System"""
-        # Log-Level konvertieren
-        level_map = {
-            'DEBUG': logging.DEBUG,
-            'INFO': logging.INFO,
-            'WARNING': logging.WARNING,
-            'ERROR': logging.ERROR
-        }
-        level = level_map.get(self.log_level, logging.INFO)
+    def fetch_single(self, urls: List[str], target: str, size: Optional[int] = None,
+                     digests: Optional[Dict[str, str]] = None) -> Dict:
+        """Lädt eine Datei ohne Range-Requests mit einem gestreamten GET pro Mirror
         
-        # Verbose überschreibt log_level
-        if self.verbose:
-            level = logging.DEBUG
+        Gleiche .__download__-Datei und gleiche Prüfung (Größe, Manifest-Digests)
+        wie der segmentierte Download.
         
-        logging.basicConfig(
-            level=level,
-            format='%(asctime)s [%(levelname)s] %(message)s',
-            handlers=[
-                logging.FileHandler(self.log_file),
-                logging.StreamHandler(sys.stdout)
-            ]
+        Raises:
+            FetchError: wenn kein Mirror eine passende Datei liefert
+        """
+        partial = target if target.endswith(DOWNLOAD_SUFFIX) else target + DOWNLOAD_SUFFIX
+        started = time.monotonic()
+        for attempt, url in enumerate(urls):
+            hashers = {name: MANIFEST_HASHES[name]() for name in (digests or {}) if name in MANIFEST_HASHES}
+            received = 0
+            try:
+                with self._request(url) as response, open(partial, 'wb') as f:
+                    for chunk in iter(lambda: response.read(1024 ** 2), b''):
+                        received += len(chunk)
+                        if size is not None and received > size:
+                            raise FetchError(f"größer als erwartet ({size} Bytes)")
+                        f.write(chunk)
+                        for hasher in hashers.values():
+                            hasher.update(chunk)
+                if size is not None and received != size:
+                    raise FetchError(f"unvollständig ({received}/{size} Bytes)")
+                for name, hasher in hashers.items():
+                    if hasher.hexdigest().lower() != digests[name].lower():
+                        raise FetchError(f"{name}-Prüfsumme von {os.path.basename(target)} stimmt nicht")
+            except (OSError, urllib.error.URLError, FetchError) as e:
+                self.logger.info(f"Download von {url}: {getattr(e, 'reason', e)} - nächster Mirror")
+                continue
+            
+            if partial != target:
+                os.replace(partial, target)
+            return {'bytes': received, 'seconds': round(time.monotonic() - started, 2), 'segments': 1,
+                    'retries': attempt, 'mirrors': {url: received}}
+        
+        if os.path.exists(partial):
+            os.unlink(partial)
+        raise FetchError(f"{os.path.basename(target)} von keinem Mirror ladbar")
+    
+    def _fetch_segmented(self, urls: List[str], target: str, size: int,
+                         digests: Optional[Dict[str, str]] = None) -> Dict:
+        """Segmentierter Download mit Streaming-Verifikation (siehe fetch())"""
+        hashers = {name: MANIFEST_HASHES[name]() for name in (digests or {}) if name in MANIFEST_HASHES}
+        segments = [(start, min(start + self.segment_size, size) - 1)
+                    for start in range(0, size, self.segment_size)]
+        stats = {'bytes': size, 'seconds': 0.0, 'segments': len(segments), 'retries': 0, 'mirrors': {}}
+        partial = target if target.endswith(DOWNLOAD_SUFFIX) else target + DOWNLOAD_SUFFIX
+        started = time.monotonic()
+        
+        fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if size and hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(fd, 0, size)
+            else:
+                os.ftruncate(fd, size)
+            
+            condition = threading.Condition()
+            state = {'next': 0, 'frontier': 0, 'error': None}
+            completed: Dict[int, bytes] = {}
+            max_ahead = 2 * self.connections
+            
+            def worker(worker_id: int):
+                while True:
+                    with condition:
+                        while (state['error'] is None and state['next'] < len(segments)
+                               and state['next'] >= state['frontier'] + max_ahead):
+                            condition.wait()
+                        if state['error'] is not None or state['next'] >= len(segments):
+                            return
+                        index = state['next']
+                        state['next'] += 1
+                    try:
+                        start, end = segments[index]
+                        data = self._fetch_segment(urls, worker_id + index, start, end, stats)
+                        os.pwrite(fd, data, start)
+                    except (OSError, FetchError) as e:
+                        with condition:
+                            state['error'] = e
+                            condition.notify_all()
+                        return
+                    with condition:
+                        # Hashes in Dateireihenfolge fortschreiben
+                        completed[index] = data
+                        while state['frontier'] in completed:
+                            chunk = completed.pop(state['frontier'])
+                            for hasher in hashers.values():
+                                hasher.update(chunk)
+                            state['frontier'] += 1
+                        condition.notify_all()
+            
+            threads = [threading.Thread(target=worker, args=(worker_id,), daemon=True)
+                       for worker_id in range(min(self.connections, max(1, len(segments))))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            if state['error'] is not None:
+                raise state['error'] if isinstance(state['error'], FetchError) else FetchError(str(state['error']))
+        except BaseException:
+            os.close(fd)
+            if os.path.exists(partial):
+                os.unlink(partial)
+            raise
+        os.close(fd)
+        
+        for name, hasher in hashers.items():
+            if hasher.hexdigest().lower() != digests[name].lower():
+                os.unlink(partial)
+                raise FetchError(f"{name}-Prüfsumme von {os.path.basename(target)} stimmt nicht")
+        
+        if partial != target:
+            os.replace(partial, target)
+        stats['seconds'] = round(time.monotonic() - started, 2)
+        return stats
+
+
+def fetchcommand_main(uri: str, target: str, config: 'Config') -> int:
+    """FETCHCOMMAND-Modus für Portage: segmentierter Download über alle Distfile-Mirrors
+    
+    Portage setzt in der Fetch-Umgebung O (Ebuild-Verzeichnis), darüber wird das
+    Manifest für die Streaming-Verifikation gefunden. Ohne Manifest prüft Portage
+    die Datei wie gewohnt nach dem Download.
+    
+    Returns:
+        Exit-Code (0 bei Erfolg)
+    """
+    filename = os.path.basename(target)
+    if filename.endswith(DOWNLOAD_SUFFIX):
+        filename = filename[:-len(DOWNLOAD_SUFFIX)]
+    
+    size, digests = None, None
+    if os.environ.get('O'):
+        manifest = read_manifest_dist(os.path.join(os.environ['O'], 'Manifest'), filename)
+        if manifest:
+            size, digests = manifest
+    
+    mirrors = read_gentoo_mirrors() or list(DEFAULT_GERMAN_MIRRORS_DISTFILES)
+    scoreboard = MirrorScoreboard(StateCache(config.get('cache_dir', '/var/cache/gentoo-updater')))
+    urls = [distfile_mirror_url(mirror, filename) for mirror in scoreboard.rank(mirrors)]
+    # Portage übergibt Mirror- und Upstream-URIs einzeln - die übergebene URI immer mitnutzen
+    urls = list(dict.fromkeys([uri] + urls if not any(uri.startswith(m.rstrip('/')) for m in mirrors)
+                              else urls + [uri]))
+    
+    downloader = SegmentedDownloader(
+        connections=int(config.get('segmented_fetch_connections', 4)),
+        segment_size=int(config.get('segmented_fetch_segment_mb', 8)) * 1024 ** 2
+    )
+    try:
+        stats = downloader.fetch(urls, target, size, digests)
+    except FetchError as e:
+        print(f"{filename}: {e}", file=sys.stderr)
+        return 1
+    print(f"{filename}: {stats['bytes'] / 1024 ** 2:.1f} MiB in {stats['seconds']:.1f}s "
+          f"({len(stats['mirrors'])} Mirror, {stats['segments']} Segmente)")
+    return 0
+
+
+def read_gentoo_mirrors(make_conf_path: str = '/etc/portage/make.conf') -> List[str]:
+    """GENTOO_MIRRORS aus make.conf (ohne Ausgaben, für den FETCHCOMMAND-Modus)"""
+    try:
+        with open(make_conf_path, 'r') as f:
+            match = re.search(r'GENTOO_MIRRORS\s*=\s*"([^"]+)"', f.read())
+    except OSError:
+        return []
+    return match.group(1).replace('\\', ' ').split() if match else []
+
+
+# ========================
+# Binhost-Index
+# ========================
+
+class BinhostIndex:
+    """Geparster Packages-Index eines Binhosts, indiziert nach CPV und USE-Set
+    
+    Format: Header-Block, danach pro Binärpaket ein durch Leerzeilen getrennter
+    Block mit "KEY: value"-Zeilen (CPV, USE, BUILD_ID, PATH, SIZE, ...).
+    """
+    
+    def __init__(self):
+        self.header: Dict[str, str] = {}
+        self.packages: Dict[str, List[Dict[str, str]]] = {}
+        self._by_use: Dict[Tuple[str, frozenset], Optional[Dict[str, str]]] = {}
+    
+    @classmethod
+    def parse(cls, text: str) -> 'BinhostIndex':
+        """Parst den Inhalt einer Packages-Datei"""
+        index = cls()
+        blocks = re.split(r'\n\s*\n', text.strip())
+        for number, block in enumerate(blocks):
+            fields = {}
+            for line in block.splitlines():
+                key, sep, value = line.partition(':')
+                if sep:
+                    fields[key.strip()] = value.strip()
+            if number == 0 and 'CPV' not in fields:
+                index.header = fields
+            elif 'CPV' in fields:
+                fields['_use'] = frozenset(fields.get('USE', '').split())
+                index.packages.setdefault(fields['CPV'], []).append(fields)
+        return index
+    
+    def __len__(self) -> int:
+        return sum(len(builds) for builds in self.packages.values())
+    
+    def lookup(self, cpv: str, use_flags: Tuple[str, ...] = (),
+               use_expand: Optional[Dict[str, Tuple[str, ...]]] = None) -> Optional[Dict[str, str]]:
+        """Sucht ein Binärpaket, dessen USE-Flags zur Mergeliste passen
+        
+        Args:
+            cpv: category/package-version
+            use_flags: USE-Flags aus emerge --verbose (z.B. 'ssl', '-doc', 'X*', '(-selinux)');
+                       erzwungene/maskierte Flags in Klammern werden nicht verglichen
+            use_expand: USE_EXPAND-Variablen aus emerge --verbose (z.B. PYTHON_TARGETS); im
+                        Index stehen sie mit Präfix im USE-Feld (python_targets_python3_12).
+                        Verglichen werden die Variablen aus USE_EXPAND im Index-Header
+        
+        Returns:
+            Index-Eintrag (neuester BUILD_ID zuerst) oder None
+        """
+        prefixed = set(self.header.get('USE_EXPAND', '').split())
+        groups = [('', use_flags)] + [(f"{variable.lower()}_", values)
+                                      for variable, values in (use_expand or {}).items()
+                                      if not prefixed or variable in prefixed]
+        enabled = set()
+        disabled = set()
+        for prefix, flags in groups:
+            for flag in flags:
+                if flag.startswith('('):
+                    continue
+                flag = flag.strip('{}').rstrip('*%')
+                if flag.startswith('-'):
+                    disabled.add(prefix + flag[1:])
+                elif flag:
+                    enabled.add(prefix + flag)
+        
+        key = (cpv, frozenset(enabled | {f"-{flag}" for flag in disabled}))
+        if key not in self._by_use:
+            candidates = sorted(self.packages.get(cpv, []),
+                                key=lambda build: int(build.get('BUILD_ID', 0) or 0), reverse=True)
+            self._by_use[key] = next(
+                (build for build in candidates
+                 if enabled <= build['_use'] and not disabled & build['_use']),
+                None
+            )
+        return self._by_use[key]
+
+
+def fetch_binhost_index(url: str, cache_path: Path, timeout: float = 30.0) -> Optional[str]:
+    """Lädt die Packages-Datei eines Binhosts mit If-Modified-Since gegen eine lokale Kopie
+    
+    Returns:
+        Inhalt der Packages-Datei (bei Netzwerkfehler die zwischengespeicherte Kopie) oder None
+    """
+    request = urllib.request.Request(f"{url.rstrip('/')}/Packages")
+    try:
+        request.add_header('If-Modified-Since',
+                           email.utils.formatdate(cache_path.stat().st_mtime, usegmt=True))
+    except OSError:
+        pass
+    
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            data = response.read()
+            modified = response.headers.get('Last-Modified')
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix('.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, cache_path)
+        if modified:
+            mtime = email.utils.parsedate_to_datetime(modified).timestamp()
+            os.utime(cache_path, (mtime, mtime))
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            logging.getLogger(__name__).warning(f"Binhost-Index {url}: HTTP {e.code}")
+    except (OSError, ValueError, TypeError) as e:
+        logging.getLogger(__name__).warning(f"Binhost-Index {url} nicht erreichbar: {e}")
+    
+    try:
+        return cache_path.read_text(errors='replace')
+    except OSError:
+        return None
+
+
+# ========================
+# Fleet-Modus (Builder/Consumer)
+# ========================
+
+FLEET_PLAN = 'plan.json'
+FLEET_SIGNATURE = 'plan.json.sig'
+FLEET_PACKAGES = 'packages'
+
+
+def sign_fleet_plan(data: bytes, key: bytes) -> str:
+    """HMAC-SHA256 über die exakten Bytes von plan.json
+    
+    Der Plan enthält SHA-256 und Größe des Packages-Index und jedes Binärpakets,
+    die Signatur deckt damit alles ab, was Consumer installieren. Der Schlüssel ist
+    symmetrisch: jeder Host, der ihn besitzt, kann auch Pläne signieren - er darf
+    daher nur an vertrauenswürdige Consumer verteilt werden.
+    """
+    return hmac.new(key, data, hashlib.sha256).hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 einer Datei (blockweise gelesen)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(VERIFY_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def binpkg_path(build: Dict[str, str]) -> str:
+    """Relativer Pfad eines Binärpakets im PKGDIR (PATH-Feld, sonst CPV.tbz2)"""
+    return build.get('PATH') or f"{build['CPV']}.tbz2"
+
+
+def download_verified(url: str, path: str, size: int, sha256: str, timeout: float = 60.0) -> bool:
+    """Lädt eine Datei und übernimmt sie nur, wenn Größe und SHA-256 stimmen
+    
+    Eine bereits vorhandene, passende Datei wird nicht erneut geladen.
+    """
+    try:
+        if os.path.getsize(path) == size and file_sha256(path) == sha256:
+            return True
+    except OSError:
+        pass
+    
+    tmp_path = f"{path}.tmp"
+    digest = hashlib.sha256()
+    received = 0
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=timeout) as response, open(tmp_path, 'wb') as f:
+            for chunk in iter(lambda: response.read(VERIFY_CHUNK), b''):
+                received += len(chunk)
+                if received > size:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        if received != size or digest.hexdigest() != sha256:
+            os.unlink(tmp_path)
+            return False
+        os.replace(tmp_path, path)
+        return True
+    except (OSError, ValueError) as e:
+        logging.getLogger(__name__).warning(f"Download von {url} fehlgeschlagen: {e}")
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+def current_profile() -> str:
+    """Aktives Portage-Profil relativ zu profiles/ (z.B. default/linux/amd64/23.0)"""
+    target = os.path.realpath('/etc/portage/make.profile')
+    return target.split('/profiles/', 1)[-1]
+
+
+def sync_directory(source: str, target: str, last: str = 'Packages') -> int:
+    """Kopiert neue oder geänderte Dateien (Größe/mtime) von source nach target
+    
+    Die Datei last (der Packages-Index) wird zuletzt ersetzt, damit Consumer nie
+    einen Index sehen, dessen Pakete noch fehlen.
+    
+    Returns:
+        Anzahl kopierter Dateien
+    """
+    copied = 0
+    deferred = []
+    for root, _dirs, files in os.walk(source):
+        for name in files:
+            src = os.path.join(root, name)
+            dst = os.path.join(target, os.path.relpath(src, source))
+            try:
+                st = os.stat(src)
+                dst_st = os.stat(dst)
+                if dst_st.st_size == st.st_size and int(dst_st.st_mtime) == int(st.st_mtime):
+                    continue
+            except FileNotFoundError:
+                pass
+            if root == source and name == last:
+                deferred.append((src, dst))
+                continue
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(src, dst + '.tmp')
+            os.replace(dst + '.tmp', dst)
+            copied += 1
+    for src, dst in deferred:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copy2(src, dst + '.tmp')
+        os.replace(dst + '.tmp', dst)
+        copied += 1
+    return copied
+
+
+# ========================
+# Resolver-Cache
+# ========================
+
+REPOS_DIR = '/var/db/repos'
+GENTOO_REPO_DIR = '/var/db/repos/gentoo'
+WORLD_FILE = '/var/lib/portage/world'
+VDB_DIR = '/var/db/pkg'
+PORTAGE_COUNTER_FILE = '/var/cache/edb/counter'
+
+# Einziger Resolver-Lauf pro Run - Superset aller Flags, die Block-, Kritisch-,
+# Kernel- und Paketlisten-Erkennung benötigen. --tree liefert die Abhängigkeits-
+# struktur für den Merge-Graphen, --verbose USE-Flags und Download-Größen.
+RESOLVER_COMMAND = [
+    "emerge", "--update", "--deep", "--newuse",
+    "--with-bdeps=y", "--pretend", "--verbose", "--tree", "@world"
+]
+
+
+def _hash_file(digest, path: str):
+    """Fügt Pfad, mtime und Inhalt einer Datei zu einem Hash hinzu"""
+    try:
+        st = os.stat(path)
+        with open(path, 'rb') as f:
+            content = f.read()
+    except OSError:
+        return
+    digest.update(f"{path}\0{st.st_mtime_ns}\0{st.st_size}\0".encode())
+    digest.update(hashlib.sha1(content).digest())
+
+
+def repository_fingerprint(repos_dir: str = REPOS_DIR) -> str:
+    """Fingerprint über den Stand aller Repositories unter /var/db/repos
+    
+    rsync-Repositories liefern metadata/timestamp.chk, git-Overlays den
+    Stand von .git/index.
+    """
+    digest = hashlib.sha1()
+    if not os.path.isdir(repos_dir):
+        return ''
+    
+    for name in sorted(os.listdir(repos_dir)):
+        repo_path = os.path.join(repos_dir, name)
+        timestamp_chk = os.path.join(repo_path, 'metadata', 'timestamp.chk')
+        git_index = os.path.join(repo_path, '.git', 'index')
+        if os.path.exists(timestamp_chk):
+            _hash_file(digest, timestamp_chk)
+        elif os.path.exists(git_index):
+            _hash_file(digest, git_index)
+        else:
+            try:
+                digest.update(f"{repo_path}\0{os.stat(repo_path).st_mtime_ns}\n".encode())
+            except OSError:
+                pass
+    return digest.hexdigest()
+
+
+def update_state_fingerprint(config_dir: str = '/etc/portage') -> str:
+    """Fingerprint aller Eingaben von check_updates
+    
+    Umfasst Repository-Stand, World-File, /etc/portage/** (inkl. make.conf und
+    make.profile-Link), den Portage-Counter und die Resolver-Flags. Stimmt er
+    mit dem letzten Run überein, liefert emerge --pretend dasselbe Ergebnis.
+    """
+    digest = hashlib.sha1()
+    digest.update(' '.join(RESOLVER_COMMAND).encode())
+    digest.update(repository_fingerprint().encode())
+    _hash_file(digest, WORLD_FILE)
+    
+    if os.path.isdir(config_dir):
+        for root, dirs, files in os.walk(config_dir):
+            dirs.sort()
+            for name in sorted(files):
+                _hash_file(digest, os.path.join(root, name))
+        profile_link = os.path.join(config_dir, 'make.profile')
+        if os.path.islink(profile_link):
+            digest.update(os.readlink(profile_link).encode())
+    
+    # Portage erhöht den Counter bei jedem Merge/Unmerge
+    _hash_file(digest, PORTAGE_COUNTER_FILE)
+    try:
+        digest.update(str(os.stat(VDB_DIR).st_mtime_ns).encode())
+    except OSError:
+        pass
+    return digest.hexdigest()
+
+
+class StateCache:
+    """Persistenter Zustand zwischen Runs (JSON-Dateien unter /var/cache/gentoo-updater)"""
+    
+    def __init__(self, cache_dir: str = '/var/cache/gentoo-updater'):
+        self.cache_dir = Path(cache_dir)
+    
+    def path(self, name: str) -> Path:
+        """Pfad der Cache-Datei für einen Namen"""
+        return self.cache_dir / f"{name}.json"
+    
+    def load(self, name: str) -> Dict:
+        """Lädt ein Cache-Dokument (leeres Dict wenn fehlend oder defekt)"""
+        try:
+            with open(self.path(name), 'r') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+    
+    def save(self, name: str, data: Dict) -> bool:
+        """Speichert ein Cache-Dokument atomar"""
+        target = self.path(name)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, target)
+            return True
+        except OSError:
+            return False
+
+
+# ========================
+# Befehlsausgabe
+# ========================
+
+OUTPUT_TAIL_LINES = 500
+OUTPUT_SPOOL_BYTES = 4 * 1024 ** 2
+OUTPUT_READ_CHUNK = 1024 ** 2
+
+
+class OutputCapture:
+    """Ausgabe eines Befehls mit konstantem Speicherbedarf
+    
+    Die letzten tail_lines Zeilen liegen im Speicher, der vollständige Stream in
+    einem Puffer, der ab spool_bytes in eine temporäre Datei ausgelagert wird.
+    Detektoren lesen den Stream bei Bedarf erneut - zeilenweise über Iteration
+    oder per mmap über contains(). Aufrufer geben den Puffer mit close() oder
+    als Kontextmanager frei.
+    """
+    
+    def __init__(self, tail_lines: int = OUTPUT_TAIL_LINES, spool_bytes: int = OUTPUT_SPOOL_BYTES):
+        self.tail = deque(maxlen=tail_lines)
+        self.lines = 0
+        self.size = 0
+        self.returncode: Optional[int] = None  # Exit Code des Befehls (von run_command gesetzt)
+        self._spool_bytes = spool_bytes
+        self._file = io.BytesIO()
+        self._on_disk = False
+    
+    def write(self, line: str):
+        """Hängt eine Zeile an"""
+        if not line.endswith('\n'):
+            line += '\n'
+        data = line.encode('utf-8', errors='replace')
+        if not self._on_disk and self.size + len(data) > self._spool_bytes:
+            spool = tempfile.TemporaryFile(prefix='gentoo-updater-')
+            spool.write(self._file.getbuffer())
+            self._file = spool
+            self._on_disk = True
+        self._file.write(data)
+        self.size += len(data)
+        self.lines += 1
+        self.tail.append(line.rstrip('\n'))
+    
+    def __iter__(self):
+        """Liest den vollständigen Stream zeilenweise (ohne Zeilenende) erneut"""
+        offset = 0
+        rest = b''
+        while True:
+            self._file.seek(offset)
+            chunk = self._file.read(OUTPUT_READ_CHUNK)
+            self._file.seek(0, os.SEEK_END)
+            if not chunk:
+                break
+            offset += len(chunk)
+            *complete, rest = (rest + chunk).split(b'\n')
+            for line in complete:
+                yield line.decode('utf-8', errors='replace')
+        if rest:
+            yield rest.decode('utf-8', errors='replace')
+    
+    def contains(self, *needles: str) -> bool:
+        """Prüft ohne Groß-/Kleinschreibung, ob einer der Texte im Stream vorkommt"""
+        if not self.size or not needles:
+            return False
+        pattern = re.compile(b'|'.join(re.escape(needle.encode()) for needle in needles), re.IGNORECASE)
+        self._file.flush()
+        if not self._on_disk:
+            return pattern.search(self._file.getbuffer()) is not None
+        with mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return pattern.search(mapped) is not None
+    
+    def tail_text(self) -> str:
+        """Die letzten Zeilen als Text (für Fehlermeldungen)"""
+        return '\n'.join(self.tail)
+    
+    def __str__(self) -> str:
+        """Vollständiger Text - nur für kurze Ausgaben (z.B. --pretend) gedacht"""
+        self._file.seek(0)
+        data = self._file.read()
+        self._file.seek(0, os.SEEK_END)
+        return data.decode('utf-8', errors='replace')
+    
+    def __bool__(self) -> bool:
+        return self.size > 0
+    
+    def close(self):
+        """Gibt den Puffer bzw. die temporäre Datei frei"""
+        self._file.close()
+    
+    def __enter__(self) -> 'OutputCapture':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# ========================
+# emerge-Output Parser
+# ========================
+
+MERGE_LINE_RE = re.compile(
+    r'^\[(?P<type>ebuild|binary|uninstall|blocks|nomerge)(?P<flags>[^\]]*)\](?P<indent>\s+)(?P<atom>\S+)(?P<rest>.*)$'
+)
+VERSION_RE = re.compile(
+    r'-(?P<version>\d+(?:\.\d+)*[a-z]?(?:_(?:alpha|beta|pre|rc|p)\d*)*(?:-r\d+)?)(?:-(?P<build_id>\d+))?$'
+)
+USE_RE = re.compile(r'\bUSE="([^"]*)"')
+USE_EXPAND_RE = re.compile(r'\b([A-Z][A-Z0-9_]*)="([^"]*)"')  # z.B. PYTHON_TARGETS="python3_12 -python3_11"
+OLD_VERSION_RE = re.compile(r'^\s*\[([^\]]+)\]')
+SIZE_RE = re.compile(r'([\d.,]+)\s*([KMG]i?B|kB)\s*$')
+TOTAL_RE = re.compile(r'^Total:\s+(\d+)\s+package')
+SIZE_UNITS = {'kB': 1000, 'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3,
+              'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def split_atom(atom: str) -> Tuple[str, str, str, str, str]:
+    """Zerlegt ein Atom wie '=cat/pkg-1.0-r1:slot::repo'
+    
+    Returns:
+        Tuple (category, package, version, slot, repository)
+    """
+    repository = ''
+    slot = ''
+    if '::' in atom:
+        atom, repository = atom.split('::', 1)
+    if ':' in atom:
+        atom, slot = atom.split(':', 1)
+    atom = atom.lstrip('=<>~')
+    category, _sep, pv = atom.partition('/')
+    match = VERSION_RE.search(pv)
+    if match:
+        return category, pv[:match.start()], match.group('version'), slot, repository
+    return category, pv, '', slot, repository
+
+
+class MergeEntry:
+    """Ein Eintrag der emerge-Mergeliste ([ebuild  U  ], [binary  N ], [uninstall], ...)"""
+    
+    __slots__ = ('merge_type', 'flags', 'category', 'package', 'version',
+                 'old_version', 'slot', 'repository', 'use_flags', 'use_changes',
+                 'download_size', 'depth', 'use_expand')
+    
+    def __init__(self, merge_type: str, flags: str, category: str, package: str,
+                 version: str, old_version: str = '', slot: str = '',
+                 repository: str = '', use_flags: Tuple[str, ...] = (),
+                 use_changes: Tuple[str, ...] = (), download_size: int = 0,
+                 depth: int = 0, use_expand: Optional[Dict[str, Tuple[str, ...]]] = None):
+        self.merge_type = merge_type
+        self.flags = flags
+        self.category = category
+        self.package = package
+        self.version = version
+        self.old_version = old_version
+        self.slot = slot
+        self.repository = repository
+        self.use_flags = use_flags
+        self.use_changes = use_changes
+        self.download_size = download_size
+        self.depth = depth  # Einrückung bei --tree (0 = oberste Ebene)
+        self.use_expand = use_expand or {}  # USE_EXPAND-Variable -> Werte (Schreibweise wie use_flags)
+    
+    @property
+    def cp(self) -> str:
+        """category/package ohne Version"""
+        return f"{self.category}/{self.package}"
+    
+    @property
+    def cpv(self) -> str:
+        """category/package-version"""
+        if not self.version:
+            return self.cp
+        return f"{self.cp}-{self.version}"
+    
+    @property
+    def is_merge(self) -> bool:
+        """True für Einträge, die tatsächlich gebaut/installiert werden"""
+        return self.merge_type in ('ebuild', 'binary')
+    
+    def __repr__(self) -> str:
+        return f"MergeEntry({self.merge_type} [{self.flags}] {self.cpv})"
+
+
+class MergePlan:
+    """Geparste emerge --pretend Ausgabe (in einem Durchlauf erzeugt)"""
+    
+    def __init__(self):
+        self.entries: List[MergeEntry] = []
+        self.total: Optional[int] = None
+        self.block_messages: List[str] = []
+    
+    @classmethod
+    def parse(cls, output: str) -> 'MergePlan':
+        """Parst emerge --pretend bzw. --depclean --pretend Ausgabe zeilenweise"""
+        plan = cls()
+        for line in output.splitlines():
+            match = MERGE_LINE_RE.match(line)
+            if match:
+                plan.entries.append(cls._parse_entry(match))
+                continue
+            
+            if line.startswith('Total:'):
+                total_match = TOTAL_RE.match(line)
+                if total_match:
+                    plan.total = int(total_match.group(1))
+            elif line.startswith('All selected packages:'):
+                # depclean: "All selected packages: =cat/pkg-1.0 =cat/other-2.0"
+                for atom in line.split(':', 1)[1].split():
+                    category, package, version, slot, repository = split_atom(atom)
+                    plan.entries.append(MergeEntry('uninstall', '', category, package,
+                                                   version, slot=slot, repository=repository))
+            else:
+                lowered = line.lower()
+                if 'blocked by' in lowered or 'blocking' in lowered:
+                    plan.block_messages.append(line.strip())
+        return plan
+    
+    @staticmethod
+    def _parse_entry(match) -> MergeEntry:
+        """Erzeugt einen MergeEntry aus einer gematchten Mergelisten-Zeile"""
+        category, package, version, slot, repository = split_atom(match.group('atom'))
+        rest = match.group('rest')
+        
+        old_version = ''
+        old_match = OLD_VERSION_RE.match(rest)
+        if old_match:
+            old_version = old_match.group(1).split(',')[0].split(':')[0].strip()
+        
+        use_flags: Tuple[str, ...] = ()
+        use_changes: Tuple[str, ...] = ()
+        use_match = USE_RE.search(rest)
+        if use_match:
+            use_flags = tuple(use_match.group(1).split())
+            use_changes = tuple(flag for flag in use_flags if flag.endswith(('*', '%')))
+        use_expand = {variable: tuple(values.split()) for variable, values in USE_EXPAND_RE.findall(rest)
+                      if variable != 'USE'}
+        
+        download_size = 0
+        size_match = SIZE_RE.search(rest)
+        if size_match:
+            number = size_match.group(1).replace(',', '')
+            try:
+                download_size = int(float(number) * SIZE_UNITS.get(size_match.group(2), 1024))
+            except ValueError:
+                download_size = 0
+        
+        return MergeEntry(
+            match.group('type'), match.group('flags').replace(' ', ''),
+            category, package, version, old_version, slot, repository,
+            use_flags, use_changes, download_size,
+            depth=len(match.group('indent')) - 1, use_expand=use_expand
+        )
+    
+    @property
+    def merges(self) -> List[MergeEntry]:
+        """Nur Einträge, die gebaut/installiert werden (--tree kann Pakete wiederholen)"""
+        unique: Dict[str, MergeEntry] = {}
+        for entry in self.entries:
+            if entry.is_merge and entry.cpv not in unique:
+                unique[entry.cpv] = entry
+        return list(unique.values())
+    
+    @property
+    def has_blocks(self) -> bool:
+        """True bei [blocks]-Einträgen oder Blocker-Meldungen"""
+        return bool(self.block_messages) or any(
+            entry.merge_type == 'blocks' for entry in self.entries
+        )
+    
+    @property
+    def download_size(self) -> int:
+        """Summe der Download-Größen in Bytes"""
+        return sum(entry.download_size for entry in self.entries)
+    
+    def graph(self) -> 'DependencyGraph':
+        """Baut den Merge-Graphen aus der --tree Einrückung"""
+        return DependencyGraph.from_entries(self.entries)
+
+
+class DependencyGraph:
+    """DAG der Mergeliste (Kante: Abhängigkeit -> abhängiges Paket)
+    
+    Basiert auf der Einrückung von emerge --tree: ein eingerücktes Paket ist eine
+    Abhängigkeit des nächsten weniger eingerückten Pakets darüber. [nomerge]-Einträge
+    strukturieren nur die Ausgabe und erzeugen keine Kanten.
+    """
+    
+    def __init__(self):
+        self.nodes: Dict[str, MergeEntry] = {}
+        self.deps: Dict[str, set] = {}       # Paket -> Pakete, die vorher gebaut werden müssen
+        self.rdeps: Dict[str, set] = {}      # Paket -> Pakete, die darauf warten
+        self.cyclic: List[str] = []          # Pakete aus aufgelösten Zyklen
+    
+    @classmethod
+    def from_entries(cls, entries: List[MergeEntry]) -> 'DependencyGraph':
+        """Erzeugt den Graphen aus geparsten --tree Einträgen"""
+        graph = cls()
+        stack: List[Tuple[int, Optional[str]]] = []  # (depth, cpv oder None für nomerge)
+        
+        for entry in entries:
+            if entry.merge_type not in ('ebuild', 'binary', 'nomerge'):
+                continue
+            while stack and stack[-1][0] >= entry.depth:
+                stack.pop()
+            parent = stack[-1][1] if stack else None
+            
+            if entry.is_merge:
+                graph.add_node(entry)
+                if parent is not None and parent != entry.cpv:
+                    graph.add_edge(entry.cpv, parent)
+                stack.append((entry.depth, entry.cpv))
+            else:
+                stack.append((entry.depth, None))
+        return graph
+    
+    def add_node(self, entry: MergeEntry):
+        """Fügt ein Paket hinzu (doppelte Einträge werden zusammengeführt)"""
+        if entry.cpv not in self.nodes:
+            self.nodes[entry.cpv] = entry
+            self.deps[entry.cpv] = set()
+            self.rdeps[entry.cpv] = set()
+    
+    def add_edge(self, dependency: str, dependant: str):
+        """dependant benötigt dependency"""
+        self.deps[dependant].add(dependency)
+        self.rdeps[dependency].add(dependant)
+    
+    def topological_order(self) -> List[str]:
+        """Build-Reihenfolge (Abhängigkeiten zuerst, Kahn-Algorithmus)
+        
+        Zyklen (z.B. durch doppelt aufgeführte Pakete in der --tree Ausgabe) werden
+        nicht verworfen: die verbleibenden Pakete folgen in Plan-Reihenfolge, ihre
+        Rückwärtskanten werden entfernt und die Pakete in self.cyclic vermerkt.
+        """
+        remaining = {cpv: len(deps) for cpv, deps in self.deps.items()}
+        ready = deque(cpv for cpv in self.nodes if remaining[cpv] == 0)
+        order = []
+        while ready:
+            cpv = ready.popleft()
+            order.append(cpv)
+            for dependant in sorted(self.rdeps[cpv]):
+                remaining[dependant] -= 1
+                if remaining[dependant] == 0:
+                    ready.append(dependant)
+        
+        if len(order) < len(self.nodes):
+            leftover = [cpv for cpv in self.nodes if remaining[cpv] > 0]
+            self.cyclic.extend(leftover)
+            order.extend(leftover)
+            self._drop_back_edges(order)
+        return order
+    
+    def _drop_back_edges(self, order: List[str]):
+        """Entfernt Kanten, die gegen die gegebene Reihenfolge zeigen (bricht Zyklen)"""
+        position = {cpv: index for index, cpv in enumerate(order)}
+        for cpv in order:
+            for dependency in [dep for dep in self.deps[cpv] if position[dep] > position[cpv]]:
+                self.deps[cpv].discard(dependency)
+                self.rdeps[dependency].discard(cpv)
+    
+    def layers(self) -> List[List[str]]:
+        """Ebenen, deren Pakete unabhängig voneinander gebaut werden können"""
+        level: Dict[str, int] = {}
+        for cpv in self.topological_order():
+            level[cpv] = 1 + max((level[dep] for dep in self.deps[cpv]), default=-1)
+        result: List[List[str]] = [[] for _ in range(max(level.values(), default=-1) + 1)]
+        for cpv, index in level.items():
+            result[index].append(cpv)
+        return result
+    
+    @property
+    def max_parallelism(self) -> int:
+        """Maximal erreichbare Parallelität (breiteste Ebene)"""
+        return max((len(layer) for layer in self.layers()), default=0)
+    
+    def critical_path(self, weight=None) -> Tuple[List[str], float]:
+        """Längster (gewichteter) Pfad durch den Graphen
+        
+        Args:
+            weight: Funktion cpv -> Dauer; Standard: 1 pro Paket
+        
+        Returns:
+            Tuple (Pfad in Build-Reihenfolge, Gesamtgewicht)
+        """
+        weight = weight or (lambda cpv: 1.0)
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for cpv in self.topological_order():
+            best_dep = max(self.deps[cpv], key=lambda dep: finish[dep], default=None)
+            finish[cpv] = weight(cpv) + (finish[best_dep] if best_dep else 0.0)
+            previous[cpv] = best_dep
+        if not finish:
+            return [], 0.0
+        
+        node = max(finish, key=finish.get)
+        total = finish[node]
+        path = []
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        return list(reversed(path)), total
+    
+    def batches(self, size: int) -> List[List[str]]:
+        """Teilt die Build-Reihenfolge in Batches von höchstens 'size' Paketen
+        
+        Jede Kante des Graphen zeigt in denselben oder einen früheren Batch. Da
+        --tree eine gemeinsame Abhängigkeit nur unter ihrem ersten Abhängigen zeigt,
+        sind die Kanten aber nur ein Spannbaum des echten Abhängigkeitsgraphen -
+        weitere Abhängige können in einem früheren Batch landen. Der finale
+        @world-Lauf nach den Batches holt solche Pakete nach.
+        """
+        order = self.topological_order()
+        size = max(1, size)
+        return [order[index:index + size] for index in range(0, len(order), size)]
+    
+    def timed_batches(self, durations: Dict[str, float], jobs: int, seconds: float) -> List[List[str]]:
+        """Teilt die Build-Reihenfolge in Batches von etwa 'seconds' erwarteter Dauer
+        
+        Ein Batch dauert bei 'jobs' Slots mindestens sein längstes Paket und
+        mindestens die Summe seiner Pakete / jobs (wie in run_batched_update).
+        """
+        jobs = max(1, jobs)
+        result: List[List[str]] = []
+        batch: List[str] = []
+        longest = total = 0.0
+        for cpv in self.topological_order():
+            duration = durations.get(cpv, 0.0)
+            if batch and max(longest, duration, (total + duration) / jobs) > seconds:
+                result.append(batch)
+                batch, longest, total = [], 0.0, 0.0
+            batch.append(cpv)
+            longest = max(longest, duration)
+            total += duration
+        if batch:
+            result.append(batch)
+        return result
+    
+    def dependants_of(self, cpvs) -> set:
+        """Alle transitiven Abhängigen der angegebenen Pakete"""
+        result = set()
+        stack = list(cpvs)
+        while stack:
+            for dependant in self.rdeps.get(stack.pop(), ()):
+                if dependant not in result:
+                    result.add(dependant)
+                    stack.append(dependant)
+        return result
+    
+    def subgraph(self, cpvs) -> 'DependencyGraph':
+        """Teilgraph mit den angegebenen Paketen und deren internen Kanten"""
+        keep = set(cpvs)
+        graph = DependencyGraph()
+        for cpv in keep:
+            graph.add_node(self.nodes[cpv])
+        for cpv in keep:
+            for dep in self.deps[cpv] & keep:
+                graph.add_edge(dep, cpv)
+        return graph
+    
+    def dependant_counts(self) -> Dict[str, int]:
+        """Anzahl transitiver Abhängiger pro Paket (wie viele Pakete es blockiert)"""
+        order = self.topological_order()
+        bit = {cpv: 1 << index for index, cpv in enumerate(order)}
+        descendants: Dict[str, int] = {}
+        for cpv in reversed(order):
+            mask = 0
+            for dependant in self.rdeps[cpv]:
+                mask |= bit[dependant] | descendants[dependant]
+            descendants[cpv] = mask
+        return {cpv: bin(mask).count('1') for cpv, mask in descendants.items()}
+    
+    def to_dict(self, weight=None) -> Dict:
+        """Exportiert Graph und Kennzahlen als JSON-fähiges Dict"""
+        path, length = self.critical_path(weight)
+        counts = self.dependant_counts()
+        return {
+            'nodes': [
+                {'cpv': cpv, 'dependants': counts.get(cpv, 0),
+                 'deps': sorted(self.deps[cpv])}
+                for cpv in self.topological_order()
+            ],
+            'layers': [len(layer) for layer in self.layers()],
+            'max_parallelism': self.max_parallelism,
+            'critical_path': path,
+            'critical_path_length': length
+        }
+    
+    def to_dot(self) -> str:
+        """Exportiert den Graphen im Graphviz DOT-Format"""
+        critical = set(self.critical_path()[0])
+        lines = ['digraph merge_plan {', '  rankdir=LR;']
+        for cpv in self.topological_order():
+            style = ' [color=red, penwidth=2]' if cpv in critical else ''
+            lines.append(f'  "{cpv}"{style};')
+        for cpv in self.topological_order():
+            for dependant in sorted(self.rdeps[cpv]):
+                lines.append(f'  "{cpv}" -> "{dependant}";')
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+
+# Alle Diagnose-Muster in einem Regex - ein search() pro Zeile
+DIAGNOSTIC_RE = re.compile(
+    r'(?P<autounmask>use --autounmask-write to write changes to config files'
+    r'|the following use changes are necessary to proceed'
+    r'|autounmask change\(s\)'
+    r'|no ebuilds built with use flags to satisfy)'
+    r'|(?P<conflict>conflicts with)'
+    r'|(?P<blocked>the above package list contains packages which cannot be)'
+    r'|(?P<merging>^>>> (?:emerging|jobs:))'
+    r'|(?P<ignored>following binary packages have been ignored)'
+    r'|(?P<skipped>updates/rebuilds have been skipped|update\(s\) have been skipped|update has been skipped)'
+    r"|couldn't download '(?P<fetch_file>[^']+)'"
+    r'|fetch failed for \'?(?P<fetch_package>[^\s,\']+)'
+    r'|\* error: (?P<error_package>\S+) failed'
+    r"|(?:the complete build log is located at|log file:\s*)\s*'(?P<build_log>[^']+)'"
+    r'|(?P<failed_summary>the following (?:\d+ )?packages? (?:has|have) failed to build)',
+    re.IGNORECASE
+)
+SKIPPED_PACKAGE_RE = re.compile(r'^\s*\(([^,]+),')
+FAILED_PACKAGE_RE = re.compile(r'^\s*\(([^,:]+)[^,]*,')
+QUOTED_PATH_RE = re.compile(r"^\s*'(/[^']+)'")
+# Zeilen nach "updates/rebuilds have been skipped", die Paket-Zeilen enthalten können
+SKIPPED_WINDOW = 19
+
+
+class DiagnosticsReport:
+    """Typisiertes Ergebnis der emerge-Diagnose"""
+    
+    __slots__ = ('autounmask', 'blocked', 'merging', 'conflicts', 'ignored_binpkgs',
+                 'skipped_updates', 'fetch_failures', 'failed', 'lines', 'resolve_seconds')
+    
+    def __init__(self):
+        self.autounmask = False                  # Autounmask-/USE-Änderungen nötig
+        self.blocked = False                     # Unauflösbare Blocker in der Mergeliste
+        self.merging = False                     # Resolver fertig, Builds laufen
+        self.conflicts: List[str] = []           # Zeilen "X conflicts with Y"
+        self.ignored_binpkgs: List[str] = []     # Binärpakete mit USE-Mismatch
+        self.skipped_updates: List[str] = []     # Übersprungene Updates (Atome)
+        self.fetch_failures: List[str] = []      # Distfiles bzw. Pakete ohne Download
+        self.failed: Dict[str, Optional[str]] = {}  # Fehlgeschlagenes Paket -> Build-Log
+        self.lines = 0
+        self.resolve_seconds: Optional[float] = None  # Zeit bis zum ersten Merge (Resolver-Dauer)
+    
+    @property
+    def failed_package(self) -> Optional[str]:
+        """Erstes fehlgeschlagenes Paket"""
+        return next(iter(self.failed), None)
+    
+    @property
+    def build_log(self) -> Optional[str]:
+        """Build-Log des ersten fehlgeschlagenen Pakets"""
+        return self.failed.get(self.failed_package) if self.failed else None
+    
+    def to_dict(self) -> Dict:
+        return {
+            'autounmask': self.autounmask,
+            'blocked': self.blocked,
+            'conflicts': self.conflicts,
+            'ignored_binpkgs': self.ignored_binpkgs,
+            'skipped_updates': self.skipped_updates,
+            'fetch_failures': self.fetch_failures,
+            'failed': self.failed,
+            'lines': self.lines,
+            'resolve_seconds': self.resolve_seconds
+        }
+
+
+class EmergeDiagnostics:
+    """Inkrementeller Klassifikator für emerge-Ausgabe (Zeilen-Observer für run_command)
+    
+    Ein kombinierter Regex pro Zeile plus ein kleiner Zustandsautomat für die
+    mehrzeiligen Abschnitte (ignorierte Binärpakete, übersprungene Updates,
+    Fehlerübersicht). Der Text selbst wird nie gespeichert.
+    """
+    
+    NORMAL, IGNORED, SKIPPED, FAILED = range(4)
+    
+    def __init__(self):
+        self.report = DiagnosticsReport()
+        self._started = time.monotonic()
+        self._state = self.NORMAL
+        self._window = 0
+        self._pending_log: Optional[str] = None  # Paket, dessen Log-Zeile noch folgt
+    
+    @classmethod
+    def scan(cls, lines) -> DiagnosticsReport:
+        """Klassifiziert eine vollständige Ausgabe (OutputCapture oder Zeilenliste)"""
+        diagnostics = cls()
+        for line in lines:
+            diagnostics(line)
+        return diagnostics.report
+    
+    def __call__(self, line: str):
+        line = line.rstrip('\n')
+        report = self.report
+        report.lines += 1
+        
+        if self._state != self.NORMAL and self._section_line(line):
+            return
+        
+        match = DIAGNOSTIC_RE.search(line)
+        if match is None:
+            return
+        group = match.lastgroup
+        if group == 'autounmask':
+            report.autounmask = True
+        elif group == 'blocked':
+            report.blocked = True
+        elif group == 'merging':
+            if not report.merging:
+                report.resolve_seconds = round(time.monotonic() - self._started, 1)
+            report.merging = True
+        elif group == 'conflict':
+            report.conflicts.append(line.strip())
+        elif group == 'ignored':
+            self._state = self.IGNORED
+        elif group == 'skipped':
+            self._state = self.SKIPPED
+            self._window = SKIPPED_WINDOW
+        elif group in ('fetch_file', 'fetch_package'):
+            report.fetch_failures.append(match.group(group))
+        elif group == 'error_package':
+            package = match.group(group).split('::')[0]
+            report.failed.setdefault(package, None)
+            self._pending_log = package
+        elif group == 'build_log':
+            if self._pending_log is not None:
+                report.failed[self._pending_log] = match.group(group)
+                self._pending_log = None
+        elif group == 'failed_summary':
+            self._state = self.FAILED
+    
+    def resolver_failure(self, line: str = '') -> Optional[str]:
+        """Abbruch-Prädikat für run_command: Grund, sobald der Resolver sicher gescheitert ist
+        
+        Greift nur, solange noch kein Paket gebaut wird - laufende Builds werden nie abgebrochen.
+        """
+        report = self.report
+        if report.merging:
+            return None
+        if report.autounmask:
+            return "autounmask-Änderungen erforderlich"
+        if report.blocked:
+            return "unauflösbare Blocker"
+        return None
+    
+    def _section_line(self, line: str) -> bool:
+        """Verarbeitet eine Zeile innerhalb eines mehrzeiligen Abschnitts
+        
+        Returns:
+            True wenn die Zeile vollständig verarbeitet ist
+        """
+        report = self.report
+        stripped = line.strip()
+        if self._state == self.IGNORED:
+            if not stripped:
+                return True
+            if any(marker in line for marker in ('WARNING:', 'NOTE:', '!!! ', '>>>')):
+                self._state = self.NORMAL
+                return False
+            report.ignored_binpkgs.append(stripped)
+            return True
+        
+        if self._state == self.SKIPPED:
+            self._window -= 1
+            if self._window <= 0:
+                self._state = self.NORMAL
+            package = SKIPPED_PACKAGE_RE.match(line)
+            if package and '::' in line:
+                report.skipped_updates.append(package.group(1).strip())
+            # Paket-Zeilen enden oft mit "conflicts with" - auch normal klassifizieren
+            return False
+        
+        # Fehlerübersicht: " (cat/pkg-1.0:0/0::repo, ebuild scheduled for merge), Log file:"
+        # gefolgt von "  '/var/tmp/portage/.../build.log'"
+        package = FAILED_PACKAGE_RE.match(line)
+        if package:
+            self._pending_log = package.group(1).strip()
+            report.failed.setdefault(self._pending_log, None)
+            return True
+        path = QUOTED_PATH_RE.match(line)
+        if path and self._pending_log is not None:
+            report.failed[self._pending_log] = path.group(1)
+            self._pending_log = None
+            return True
+        if stripped.startswith(('*', '>>>', '!!!')):
+            self._state = self.NORMAL
+            return False
+        return True
+
+
+EMERGING_RE = re.compile(r'^>>> Emerging (?:binary )?\((\d+) of (\d+)\) ([^\s:]+)')
+
+
+class DeadlineGuard:
+    """Abbruch-Prädikat für run_command: hält emerge an der Deadline an
+    
+    Geprüft wird an jeder '>>> Emerging (n of m)'-Zeile: wird das startende Paket
+    mit seiner erwarteten Dauer nicht mehr vor der Deadline fertig, wird emerge
+    beendet. Mit --jobs > 1 trifft das auch parallel laufende Builds - sie folgen
+    im nächsten Fenster.
+    """
+    
+    def __init__(self, deadline: float, durations: Optional[Dict[str, float]] = None):
+        self.deadline = deadline
+        self.durations = durations or {}
+        self.stopped_at: Optional[str] = None  # Paket, vor dem angehalten wurde
+    
+    def __call__(self, line: str) -> Optional[str]:
+        match = EMERGING_RE.match(line)
+        if match is None or self.stopped_at is not None:
+            return None
+        cpv = match.group(3)
+        if time.time() + self.durations.get(cpv, 0.0) <= self.deadline:
+            return None
+        self.stopped_at = cpv
+        return (f"Deadline {datetime.fromtimestamp(self.deadline).strftime('%H:%M')} - "
+                f"{cpv} ({match.group(1)} von {match.group(2)}) würde nicht mehr rechtzeitig fertig")
+
+
+# ========================
+# Build-Historie (emerge.log)
+# ========================
+
+EMERGE_LOG_START_RE = re.compile(r'^(\d+):\s+>>> emerge \((\d+) of (\d+)\) (\S+) to ')
+EMERGE_LOG_DONE_RE = re.compile(r'^(\d+):\s+::: completed emerge \((\d+) of (\d+)\) (\S+) to ')
+EMERGE_LOG_BINARY_RE = re.compile(r'^\d+:\s+=== \(\d+ of \d+\) Merging Binary \(([^:)]+)')
+
+# Gewichtung neuer Builds für die erwartete Dauer (exponentiell gleitender Mittelwert)
+HISTORY_EWMA_ALPHA = 0.5
+
+
+class EmergeHistory:
+    """Inkrementeller SQLite-Index über /var/log/emerge.log
+    
+    Liest nur den seit dem letzten Lauf angehängten Teil der Log-Datei (gespeicherter
+    Byte-Offset) und paart '>>> emerge' mit '::: completed emerge' zu Build-Dauern.
+    Binärpakete werden gespeichert, fließen aber nicht in die erwartete Dauer ein.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS builds (
+            cp TEXT NOT NULL,
+            cpv TEXT NOT NULL,
+            version TEXT NOT NULL,
+            started INTEGER NOT NULL,
+            finished INTEGER NOT NULL,
+            duration INTEGER NOT NULL,
+            binary INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_builds_cp ON builds(cp, finished);
+        CREATE INDEX IF NOT EXISTS idx_builds_finished ON builds(finished);
+        CREATE TABLE IF NOT EXISTS package_stats (
+            cp TEXT PRIMARY KEY,
+            builds INTEGER NOT NULL,
+            last_version TEXT,
+            last_duration INTEGER,
+            ewma_duration REAL,
+            last_finished INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS pending (
+            cpv TEXT PRIMARY KEY,
+            started INTEGER NOT NULL,
+            binary INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+    
+    def __init__(self, db_path: str, log_path: str = '/var/log/emerge.log'):
+        self.db_path = Path(db_path)
+        self.log_path = log_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.executescript(self.SCHEMA)
+        self._expected: Optional[Dict[str, float]] = None
+    
+    def close(self):
+        """Schließt die Datenbank"""
+        self.conn.close()
+    
+    def _meta(self, key: str, default: str = '') -> str:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+    
+    def _set_meta(self, key: str, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+    
+    def update(self) -> int:
+        """Indiziert neue Einträge aus emerge.log
+        
+        Returns:
+            Anzahl neu erfasster Builds
+        """
+        try:
+            st = os.stat(self.log_path)
+        except OSError:
+            return 0
+        
+        offset = int(self._meta('offset', '0') or 0)
+        inode = self._meta('inode')
+        # Log wurde rotiert oder gekürzt - von vorne beginnen
+        if inode != str(st.st_ino) or st.st_size < offset:
+            offset = 0
+            self.conn.execute("DELETE FROM pending")
+        
+        if st.st_size == offset:
+            return 0
+        
+        new_builds = 0
+        with open(self.log_path, 'rb') as f:
+            f.seek(offset)
+            while True:
+                chunk = f.readlines(4 * 1024 * 1024)
+                if not chunk:
+                    break
+                for raw in chunk:
+                    if not raw.endswith(b'\n'):
+                        # Unvollständige letzte Zeile - beim nächsten Lauf erneut lesen
+                        break
+                    offset += len(raw)
+                    new_builds += self._process_line(raw.decode('utf-8', 'replace'))
+                else:
+                    continue
+                break
+        
+        self._set_meta('offset', offset)
+        self._set_meta('inode', st.st_ino)
+        self.conn.commit()
+        if new_builds:
+            self._expected = None
+        return new_builds
+    
+    def _process_line(self, line: str) -> int:
+        """Verarbeitet eine emerge.log Zeile, gibt 1 zurück wenn ein Build abgeschlossen wurde"""
+        if '>>> emerge (' in line:
+            match = EMERGE_LOG_START_RE.match(line)
+            if match:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO pending (cpv, started, binary) VALUES (?, ?, 0)",
+                    (match.group(4), int(match.group(1)))
+                )
+        elif 'Merging Binary (' in line:
+            match = EMERGE_LOG_BINARY_RE.match(line)
+            if match:
+                self.conn.execute("UPDATE pending SET binary = 1 WHERE cpv = ?", (match.group(1),))
+        elif '::: completed emerge (' in line:
+            match = EMERGE_LOG_DONE_RE.match(line)
+            if not match:
+                return 0
+            cpv = match.group(4)
+            row = self.conn.execute(
+                "SELECT started, binary FROM pending WHERE cpv = ?", (cpv,)
+            ).fetchone()
+            if not row:
+                return 0
+            self.conn.execute("DELETE FROM pending WHERE cpv = ?", (cpv,))
+            self._record_build(cpv, row[0], int(match.group(1)), bool(row[1]))
+            return 1
+        return 0
+    
+    def _record_build(self, cpv: str, started: int, finished: int, binary: bool):
+        """Speichert einen Build und aktualisiert die Paket-Statistik"""
+        category, package, version, _slot, _repo = split_atom(cpv)
+        cp = f"{category}/{package}"
+        duration = max(0, finished - started)
+        self.conn.execute(
+            "INSERT INTO builds (cp, cpv, version, started, finished, duration, binary) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (cp, cpv, version, started, finished, duration, int(binary))
+        )
+        if binary:
+            return
+        
+        row = self.conn.execute(
+            "SELECT builds, ewma_duration FROM package_stats WHERE cp = ?", (cp,)
+        ).fetchone()
+        if row:
+            ewma = HISTORY_EWMA_ALPHA * duration + (1 - HISTORY_EWMA_ALPHA) * row[1]
+            self.conn.execute(
+                "UPDATE package_stats SET builds = ?, last_version = ?, last_duration = ?, "
+                "ewma_duration = ?, last_finished = ? WHERE cp = ?",
+                (row[0] + 1, version, duration, ewma, finished, cp)
+            )
+        else:
+            self.conn.execute(
+                "INSERT INTO package_stats (cp, builds, last_version, last_duration, "
+                "ewma_duration, last_finished) VALUES (?, 1, ?, ?, ?, ?)",
+                (cp, version, duration, float(duration), finished)
+            )
+    
+    def expected_durations(self) -> Dict[str, float]:
+        """Erwartete Build-Dauer (Sekunden) pro category/package, einmal geladen"""
+        if self._expected is None:
+            self._expected = dict(self.conn.execute(
+                "SELECT cp, ewma_duration FROM package_stats"
+            ))
+        return self._expected
+    
+    def expected_duration(self, cp: str) -> Optional[float]:
+        """O(1)-Lookup der erwarteten Build-Dauer eines Pakets"""
+        return self.expected_durations().get(cp)
+    
+    def builds(self, atom: str, limit: int = 20) -> List[Tuple[str, int, int, bool]]:
+        """Letzte Builds eines Pakets ('cat/pkg' oder nur 'pkg')
+        
+        Returns:
+            Liste von (cpv, finished, duration, binary), neueste zuerst
+        """
+        if '/' in atom:
+            query = "SELECT cpv, finished, duration, binary FROM builds WHERE cp = ? "
+            params: Tuple = (atom,)
+        else:
+            query = "SELECT cpv, finished, duration, binary FROM builds WHERE cp LIKE ? "
+            params = (f"%/{atom}",)
+        rows = self.conn.execute(query + "ORDER BY finished DESC LIMIT ?", params + (limit,))
+        return [(cpv, finished, duration, bool(binary)) for cpv, finished, duration, binary in rows]
+
+
+class BuildEstimator:
+    """Schätzt Build-Dauern und die Gesamtdauer einer Mergeliste
+    
+    Reihenfolge der Quellen pro Paket: eigene Historie, Median der Kategorie,
+    Modell nach Download-Größe, globaler Median, fester Default.
+    """
+    
+    DEFAULT_SECONDS = 300.0
+    BINARY_SECONDS = 30.0              # Entpacken/Mergen eines Binärpakets
+    SECONDS_PER_MIB = 20.0             # Größenmodell für nie gebaute Pakete
+    MIN_CATEGORY_SAMPLES = 3
+    
+    def __init__(self, durations: Optional[Dict[str, float]] = None):
+        self.durations = durations or {}
+        by_category: Dict[str, List[float]] = {}
+        for cp, seconds in self.durations.items():
+            by_category.setdefault(cp.split('/', 1)[0], []).append(seconds)
+        self.category_medians = {
+            category: statistics.median(values)
+            for category, values in by_category.items()
+            if len(values) >= self.MIN_CATEGORY_SAMPLES
+        }
+        self.global_median = (statistics.median(self.durations.values())
+                              if self.durations else self.DEFAULT_SECONDS)
+    
+    def duration(self, entry: MergeEntry) -> Tuple[float, str]:
+        """Erwartete Dauer eines Pakets
+        
+        Returns:
+            Tuple (Sekunden, Quelle: history/category/size/median/binary)
+        """
+        if entry.merge_type == 'binary':
+            return self.BINARY_SECONDS, 'binary'
+        if entry.cp in self.durations:
+            return self.durations[entry.cp], 'history'
+        if entry.category in self.category_medians:
+            return self.category_medians[entry.category], 'category'
+        if entry.download_size:
+            return max(60.0, entry.download_size / (1024 ** 2) * self.SECONDS_PER_MIB), 'size'
+        return self.global_median, 'median'
+    
+    def estimate(self, graph: 'DependencyGraph', jobs: int) -> Dict:
+        """Simuliert den parallelen Build des Graphen mit 'jobs' Slots
+        
+        Pakete werden nach längstem verbleibenden Pfad priorisiert (wie ein
+        kritischer-Pfad-Scheduler), Abhängigkeiten müssen fertig sein.
+        """
+        durations = {cpv: self.duration(entry)[0] for cpv, entry in graph.nodes.items()}
+        sources: Dict[str, int] = {}
+        for entry in graph.nodes.values():
+            source = self.duration(entry)[1]
+            sources[source] = sources.get(source, 0) + 1
+        
+        # Längster Pfad bis zum Ende (inkl. eigener Dauer) als Priorität
+        tail: Dict[str, float] = {}
+        for cpv in reversed(graph.topological_order()):
+            tail[cpv] = durations[cpv] + max((tail[d] for d in graph.rdeps[cpv]), default=0.0)
+        
+        remaining = {cpv: len(deps) for cpv, deps in graph.deps.items()}
+        ready = [(-tail[cpv], cpv) for cpv in graph.nodes if remaining[cpv] == 0]
+        heapq.heapify(ready)
+        running: List[Tuple[float, str]] = []
+        now = 0.0
+        slots = max(1, jobs)
+        
+        while ready or running:
+            while ready and len(running) < slots:
+                _priority, cpv = heapq.heappop(ready)
+                heapq.heappush(running, (now + durations[cpv], cpv))
+            now, finished = heapq.heappop(running)
+            for dependant in graph.rdeps[finished]:
+                remaining[dependant] -= 1
+                if remaining[dependant] == 0:
+                    heapq.heappush(ready, (-tail[dependant], dependant))
+        
+        _path, critical_seconds = graph.critical_path(lambda cpv: durations[cpv])
+        return {
+            'seconds': round(now, 1),
+            'sequential_seconds': round(sum(durations.values()), 1),
+            'critical_path_seconds': round(critical_seconds, 1),
+            'jobs': slots,
+            'packages': len(durations),
+            'sources': sources
+        }
+
+
+def parse_window(value: str) -> int:
+    """Parst eine Fensterlänge wie '3h', '90m', '2h30m' oder Sekunden
+    
+    Raises:
+        ValueError: bei ungültigem Format
+    """
+    value = value.strip().lower()
+    if value.isdigit():
+        return int(value)
+    match = re.fullmatch(r'(?:(\d+)h)?\s*(?:(\d+)m)?', value)
+    if not match or not any(match.groups()):
+        raise ValueError(f"Ungültiges Zeitfenster: {value}")
+    hours, minutes = (int(group or 0) for group in match.groups())
+    return hours * 3600 + minutes * 60
+
+
+def parse_deadline(value: str) -> float:
+    """Parst eine Uhrzeit HH:MM als nächsten Zeitpunkt in der Zukunft (Unix-Zeit)
+    
+    Raises:
+        ValueError: bei ungültigem Format
+    """
+    target = datetime.strptime(value.strip(), '%H:%M')
+    now = datetime.now()
+    deadline = now.replace(hour=target.hour, minute=target.minute, second=0, microsecond=0)
+    if deadline <= now:
+        deadline += timedelta(days=1)
+    return deadline.timestamp()
+
+
+def format_duration(seconds: float) -> str:
+    """Formatiert Sekunden als 'Xh Ym' bzw. 'Ym Zs'"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {secs:02d}s"
+    return f"{secs}s"
+
+
+def read_mem_available(meminfo: str = '/proc/meminfo') -> Optional[int]:
+    """MemAvailable in Bytes (None wenn nicht lesbar)"""
+    try:
+        with open(meminfo, 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+# Backtrack-Stufen für Start und Eskalation (10 = emerge-Standard)
+BACKTRACK_LEVELS = (10, 20, 30, 50)
+
+
+def recovery_strategies(level: int) -> List[Tuple[str, List[str]]]:
+    """Recovery-Strategien bei Resolver-Fehlern, günstigste zuerst
+    
+    Args:
+        level: Backtrack-Stufe des fehlgeschlagenen Laufs
+    """
+    higher = [candidate for candidate in BACKTRACK_LEVELS if candidate > level]
+    strategies = []
+    if higher:
+        strategies.append((f"backtrack={higher[0]}", [f"--backtrack={higher[0]}"]))
+    strategies.append(("binpkg-respect-use=n", ["--binpkg-respect-use=n"]))
+    if higher:
+        strategies.append((f"backtrack={higher[-1]}+binpkg-respect-use=n",
+                           [f"--backtrack={higher[-1]}", "--binpkg-respect-use=n"]))
+    return strategies
+
+
+def backtrack_of(command: List[str], default: int = 10) -> int:
+    """Backtrack-Stufe eines emerge-Befehls"""
+    for arg in command:
+        if arg.startswith('--backtrack='):
+            try:
+                return int(arg.split('=', 1)[1])
+            except ValueError:
+                pass
+    return default
+
+
+class BacktrackHistory:
+    """Pro Host benötigte Backtrack-Stufen und Resolver-Dauern (cache_dir/backtrack.json)
+    
+    Gestartet wird mit der kleinsten Stufe, die im Gedächtnisfenster zuletzt
+    aufgelöst hat. Ohne Erfolg gilt die Standardstufe bzw. die nächste Stufe über
+    der höchsten gescheiterten; scheitert sie, eskaliert die Recovery. Verfallen die
+    Ergebnisse, beginnt der nächste Run wieder bei der Standardstufe.
+    """
+    
+    MAX_ATTEMPTS = 100
+    
+    def __init__(self, state_cache: 'StateCache', memory_days: float = 14):
+        self.state_cache = state_cache
+        self.memory_seconds = memory_days * 86400
+        self.attempts: List[Dict] = state_cache.load('backtrack').get('attempts', [])
+        self.recorded: List[Dict] = []
+    
+    def latest(self, now: Optional[float] = None) -> Dict[int, bool]:
+        """Letztes Ergebnis je Stufe im Gedächtnisfenster (nur reine Backtrack-Versuche)"""
+        cutoff = (now or time.time()) - self.memory_seconds
+        latest: Dict[int, bool] = {}
+        for attempt in self.attempts:
+            if attempt.get('pure') and attempt.get('timestamp', 0) >= cutoff:
+                latest[attempt['level']] = attempt['resolved']
+        return latest
+    
+    def choose(self, default: int = 20, floor: int = 0) -> Tuple[int, str]:
+        """Wählt die Start-Stufe
+        
+        Args:
+            default: Standardstufe ohne verwertbare Historie (backtrack_level)
+            floor: Mindeststufe (z.B. backtrack_level bei --resolve-blocks)
+        
+        Returns:
+            Tuple (level, reason)
+        """
+        latest = self.latest()
+        succeeded = sorted(level for level, resolved in latest.items() if resolved and level >= floor)
+        if succeeded:
+            return succeeded[0], f"Stufe {succeeded[0]} löste zuletzt auf"
+        
+        start = max(default, floor)
+        failed = [level for level, resolved in latest.items() if not resolved]
+        if failed and max(failed) >= start:
+            higher = [level for level in BACKTRACK_LEVELS if level > max(failed)]
+            if not higher:
+                return max(failed), f"alle Stufen bis {max(failed)} scheiterten zuletzt"
+            return higher[0], f"Stufe {max(failed)} scheiterte zuletzt"
+        if failed:
+            return start, f"Standardstufe (Stufe {max(failed)} scheiterte zuletzt)"
+        return start, "Standardstufe" + ("" if latest else ", keine Historie")
+    
+    def record(self, level: int, resolved: bool, seconds: Optional[float], strategy: str, pure: bool = True):
+        """Merkt sich einen Resolver-Versuch
+        
+        Args:
+            pure: False wenn zusätzliche Optionen (z.B. --binpkg-respect-use=n) im Spiel waren
+        """
+        attempt = {
+            'timestamp': int(time.time()),
+            'level': level,
+            'resolved': resolved,
+            'seconds': seconds,
+            'strategy': strategy,
+            'pure': pure
+        }
+        self.attempts.append(attempt)
+        self.recorded.append(attempt)
+    
+    def save(self) -> bool:
+        return self.state_cache.save('backtrack', {'attempts': self.attempts[-self.MAX_ATTEMPTS:]})
+
+
+def strategy_command(base_cmd: List[str], options: List[str]) -> List[str]:
+    """Setzt die Optionen einer Strategie vor die Ziele (@world bzw. =atom) ein
+    
+    Ein vorhandenes --backtrack wird ersetzt, wenn die Strategie eines mitbringt.
+    """
+    replaces_backtrack = any(option.startswith('--backtrack=') for option in options)
+    flags = [arg for arg in base_cmd[1:]
+             if arg.startswith('-') and not (replaces_backtrack and arg.startswith('--backtrack='))]
+    targets = [arg for arg in base_cmd[1:] if not arg.startswith('-')]
+    return [base_cmd[0], *flags, *options, *targets]
+
+
+class ResolverResult:
+    """Ergebnis eines emerge --pretend Laufs, das von allen Detektoren geteilt wird"""
+    
+    def __init__(self, command: List[str], returncode: int, stdout: str,
+                 stderr: str, duration: float, fingerprint: str,
+                 from_cache: bool = False):
+        self.command = command
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.fingerprint = fingerprint
+        self.from_cache = from_cache
+        self._plan: Optional[MergePlan] = None
+    
+    @property
+    def plan(self) -> MergePlan:
+        """Geparste Mergeliste (einmalig beim ersten Zugriff erzeugt)"""
+        if self._plan is None:
+            self._plan = MergePlan.parse(self.stdout)
+        return self._plan
+    
+    @property
+    def no_updates(self) -> bool:
+        """True wenn emerge keine ausstehenden Pakete meldet"""
+        return self.plan.total == 0
+
+
+class Config:
+    """Konfigurationsverwaltung für den Updater"""
+    
+    DEFAULT_CONFIG = {
+        'emerge_jobs': 'auto',  # auto = CPU-Kerne, oder z.B. '4'
+        'emerge_load_average': 'auto',  # auto = CPU-Kerne, oder z.B. '4.0'
+        'enable_backups': True,
+        'backup_dir': '/var/backups/gentoo-updater',
+        'enable_notifications': False,
+        'notification_email': '',
+        'min_free_space_gb': 5,
+        'auto_depclean': True,
+        'auto_revdep_rebuild': True,
+        'critical_packages': ['sys-devel/gcc', 'sys-libs/glibc', 'dev-lang/python'],
+        'log_retention_days': 30,
+        'cache_dir': '/var/cache/gentoo-updater',
+        'resolver_cache': True,  # Resolver-Ergebnis zwischen Runs wiederverwenden
+        'emerge_log': '/var/log/emerge.log',
+        'deadline_safety_factor': 1.2,  # Puffer auf geschätzte Dauern bei --deadline/--window
+        'deadline_batches': 4,  # Batches (= Deadline-Prüfpunkte) pro Wartungsfenster
+        'mirror_probe': True,  # Mirrors vor dem Sync parallel messen und nach Rang eintragen
+        'mirror_probe_timeout': MIRROR_PROBE_TIMEOUT,
+        'mirror_probe_bytes': MIRROR_PROBE_BYTES,
+        'mirror_score_ttl': 86400,  # Sekunden bis die Mirror-Rangfolge neu gemessen wird
+        'sync_connect_timeout': 15,  # rsync --contimeout pro Mirror
+        'sync_io_timeout': 180,  # rsync --timeout (I/O) pro Mirror
+        'min_sync_interval': 0,  # Kein Sync, wenn der letzte lokale Sync jünger ist (Sekunden, 0 = aus)
+        'sync_timestamp_check': True,  # timestamp.chk mit dem Mirror vergleichen, bevor rsync läuft
+        'repo_sync_jobs': 4,  # Parallele Repository-Syncs (inkl. Gentoo-Tree)
+        'repo_sync_timeout': 600,  # Timeout pro Overlay-Sync in Sekunden
+        'repo_sync_retries': 1,  # Wiederholungen pro Overlay
+        'prefetch_distfiles': True,  # Distfiles parallel zur Kompilierung in Build-Reihenfolge laden
+        'prefetch_batch': 4,  # Pakete pro emerge --fetchonly Aufruf
+        'segmented_fetch': False,  # Große Distfiles segmentiert von mehreren Mirrors laden
+        'segmented_fetch_min_mb': 64,
+        'segmented_fetch_connections': 4,
+        'segmented_fetch_segment_mb': 8,
+        'verify_distfiles': True,  # Vorhandene Distfiles vor dem Build parallel gegen das Manifest prüfen
+        'binhost': '',  # Binhost-URL(s) für --getbinpkg, leer = PORTAGE_BINHOST aus make.conf
+        'fleet_role': '',  # builder, consumer oder leer (--role)
+        'fleet_dir': '/var/www/gentoo-fleet',  # Builder: Zielverzeichnis für PKGDIR und plan.json
+        'fleet_url': '',  # Consumer: URL des vom Builder veröffentlichten Verzeichnisses
+        'fleet_key_file': '/etc/gentoo-updater.key',  # Gemeinsamer HMAC-Schlüssel für plan.json
+        'fleet_max_age': 604800,  # Consumer: ältere Pläne werden ignoriert (Sekunden)
+        'early_abort': True,  # emerge beenden, sobald der Resolver sicher gescheitert ist
+        'recovery_probe_mb': 1024,  # Erwarteter Speicherbedarf je paralleler --pretend-Probe
+        'adaptive_backtrack': True,  # Backtrack-Stufe aus früheren Runs lernen (--backtrack legt sie fest)
+        'backtrack_memory_days': 14  # Wie lange das Ergebnis einer Stufe gilt
+    }
+    
+    def __init__(self, config_file: str = '/etc/gentoo-updater.conf'):
+        self.config_file = config_file
+        self.config = self.load_config()
+        
+    def load_config(self) -> Dict:
+        """Lädt Konfiguration aus Datei oder verwendet Defaults"""
+        if os.path.exists(self.config_file):
+            try:
+                with open(self.config_file, 'r') as f:
+                    user_config = json.load(f)
+                    # Merge mit Defaults
+                    config = self.DEFAULT_CONFIG.copy()
+                    config.update(user_config)
+                    # Eine explizit gesetzte Backtrack-Stufe gilt fest, sofern die
+                    # gelernte Stufe nicht ausdrücklich eingeschaltet ist
+                    if 'backtrack_level' in user_config and 'adaptive_backtrack' not in user_config:
+                        config['adaptive_backtrack'] = False
+                    return config
+            except Exception as e:
+                print(f"{Colors.WARNING}[WARNING]{Colors.ENDC} {_('CONFIG_LOAD_WARNING', error=e)}")
+                return self.DEFAULT_CONFIG.copy()
+        return self.DEFAULT_CONFIG.copy()
+    
+    def save_default_config(self):
+        """Speichert Default-Konfiguration in Datei"""
+        try:
+            with open(self.config_file, 'w') as f:
+                json.dump(self.DEFAULT_CONFIG, f, indent=2)
+            print(f"{Colors.OKGREEN}[SUCCESS]{Colors.ENDC} {_('CONFIG_SAVE_SUCCESS', path=self.config_file)}")
+        except Exception as e:
+            print(f"{Colors.FAIL}[ERROR]{Colors.ENDC} {_('CONFIG_SAVE_ERROR', error=e)}")
+    
+    def get(self, key: str, default=None):
+        """Gibt Konfigurationswert zurück"""
+        return self.config.get(key, default)
+    
+    def get_emerge_jobs(self, max_parallelism: Optional[int] = None) -> int:
+        """Berechnet optimale Job-Anzahl
+        
+        Args:
+            max_parallelism: Breiteste Ebene des Merge-Graphen - bei 'auto' werden
+                nicht mehr Jobs gestartet als Pakete gleichzeitig baubar sind
+        """
+        jobs = self.config['emerge_jobs']
+        if jobs == 'auto':
+            jobs = os.cpu_count() or 1
+            if max_parallelism:
+                jobs = max(1, min(jobs, max_parallelism))
+            return jobs
+        return int(jobs)
+    
+    def get_load_average(self) -> float:
+        """Berechnet optimale Load Average"""
+        load = self.config['emerge_load_average']
+        if load == 'auto':
+            return float(os.cpu_count() or 1)
+        return float(load)
+
+
+class GentooUpdater:
+    """Hauptklasse für Gentoo System-Updates"""
+    
+    def __init__(self, verbose: bool = False, dry_run: bool = False, 
+                 rebuild_modules: bool = False, config: Optional[Config] = None,
+                 log_level: str = 'INFO', timeout: Optional[int] = None,
+                 retry_count: int = 1, webhook_url: Optional[str] = None,
+                 max_packages: Optional[int] = None, custom_mirrors: Optional[List[str]] = None,
+                 etc_update_mode: str = 'interactive', auto_autounmask: bool = True):
+        self.verbose = verbose
+        self.dry_run = dry_run
+        self.rebuild_modules = rebuild_modules
+        self.config = config or Config()
+        self.log_level = log_level
+        self.timeout = timeout
+        self.retry_count = retry_count
+        self.webhook_url = webhook_url
+        self.max_packages = max_packages
+        self.custom_mirrors = custom_mirrors
+        self.use_mirrorselect = False  # mirrorselect-UI statt eingebautem Benchmark (--use-mirrorselect)
+        self._rsync_rotation: Optional[List[str]] = None  # Rsync-Mirror-Reihenfolge für das Failover
+        self._split_sync = False  # True wenn Overlays parallel zum Gentoo-Tree synchronisiert werden
+        self._backup_future = None  # Backup-Task, der parallel zum Sync läuft
+        self._eix_process: Optional[subprocess.Popen] = None  # eix-update im Hintergrund
+        self._eix_started = 0.0
+        self._eix_fingerprint = ''
+        
+        # Distfile-Prefetch im Hintergrund
+        self._prefetch_thread: Optional[threading.Thread] = None
+        self._prefetch_process: Optional[subprocess.Popen] = None
+        self._prefetch_stop = threading.Event()
+        self._prefetch_lock = threading.Lock()  # Stop-Prüfung und Prozessstart atomar
+        self._prefetch_done: Dict[str, float] = {}
+        self._prefetch_started = 0.0
+        self._fleet_checked = False  # Consumer: Fleet-Plan bereits (vor dem Prefetch) installiert
+        self.emerge_env: Dict[str, str] = {}  # Zusätzliche Umgebung für alle emerge-Aufrufe (z.B. PORTAGE_BINHOST)
+        self.etc_update_mode = etc_update_mode  # interactive, auto, oder skip
+        self.auto_autounmask = auto_autounmask
+        
+        # Skip-Flags (werden von main() gesetzt)
+        self.skip_sync = False
+        self.skip_update = False
+        self.skip_eix = False
+        self.skip_cleanup = False
+        self.skip_revdep = False
+        
+        # Deadline (Unix-Zeit) für das Wartungsfenster, gesetzt über --deadline/--window/--timeout
+        self.deadline: Optional[float] = None
+        
+        # Geteiltes Resolver-Ergebnis (ein emerge --pretend pro Run)
+        self._resolution: Optional[ResolverResult] = None
+        self.state_cache = StateCache(self.config.get('cache_dir', '/var/cache/gentoo-updater'))
+        self._history: Optional[EmergeHistory] = None
+        
+        # Mirror-Scoreboard, gespeist aus Proben und echten Transfers in run_command
+        self.mirror_scores = MirrorScoreboard(self.state_cache)
+        self.transfer_observer = MirrorTransferObserver(
+            self.mirror_scores,
+            list(dict.fromkeys((custom_mirrors or []) + DEFAULT_GERMAN_MIRRORS_DISTFILES
+                               + DEFAULT_GERMAN_MIRRORS_RSYNC))
+        )
+        self.line_observers = [self.transfer_observer]
+        
+        # Logging einrichten
+        self.log_dir = Path('/var/log/gentoo-updater')
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.log_file = self.log_dir / f"update-{datetime.now().strftime('%Y%m%d-%H%M%S')}.log"
+        
+        self.setup_logging()
+        
+        # Statistiken für Summary
+        self.stats = {
+            'packages_updated': [],
+            'packages_removed': [],
+            'critical_packages': [],
+            'kernel_updated': False,
+            'modules_rebuilt': False,
+            'errors': [],
+            'warnings': [],
+            'gentoo_mirrors': [],
+            'used_mirror': None,
+            'retry_count': self.retry_count,
+            'timeout': self.timeout,
+            'max_packages': self.max_packages,
+            'resolver': {'runs': 0, 'seconds': 0.0, 'cache_hit': False}
+        }
+    
+    def setup_logging(self):
+        """Konfiguriert das Logging-System"""
+        # Log-Level konvertieren
+        level_map = {
+            'DEBUG': logging.DEBUG,
+            'INFO': logging.INFO,
+            'WARNING': logging.WARNING,
+            'ERROR': logging.ERROR
+        }
+        level = level_map.get(self.log_level, logging.INFO)
+        
+        # Verbose überschreibt log_level
+        if self.verbose:
+            level = logging.DEBUG
+        
+        logging.basicConfig(
+            level=level,
+            format='%(asctime)s [%(levelname)s] %(message)s',
+            handlers=[
+                logging.FileHandler(self.log_file),
+                logging.StreamHandler(sys.stdout)
+            ]
         )
         self.logger = logging.getLogger('gentoo-updater')
         self.logger.info("=" * 70)
@@ -823,8 +3224,12 @@ class GentooUpdater:
             self.print_warning(_('DISK_CHECK_FAILED', error=e))
             return True
     
-    def backup_important_files(self):
-        """Erstellt Backup wichtiger Konfigurationsdateien"""
+    def backup_important_files(self, prune: bool = True):
+        """Erstellt Backup wichtiger Konfigurationsdateien
+        
+        Args:
+            prune: Alte Backups direkt im Anschluss löschen
+        """
         if not self.config.get('enable_backups', True):
             return
         
@@ -852,7 +3257,8 @@ class GentooUpdater:
                         shutil.copy2(file_path, backup_path)
             
             self.print_success(_('BACKUP_SUCCESS', path=backup_path))
-            self.cleanup_old_backups(backup_dir)
+            if prune:
+                self.cleanup_old_backups(backup_dir)
             
         except Exception as e:
             self.print_warning(_('BACKUP_FAILED', error=e))
@@ -870,6 +3276,96 @@ class GentooUpdater:
         except Exception as e:
             self.print_warning(f"Konnte alte Backups nicht löschen: {e}")
     
+    def resolve_world(self, force: bool = False) -> ResolverResult:
+        """Führt emerge --pretend @world einmal pro Run aus und cached das Ergebnis
+        
+        Das Ergebnis wird verworfen, sobald sich /etc/portage, das World-File,
+        die Repositories oder die installierten Pakete ändern (z.B. durch
+        autounmask-write oder einen Config-Merge). Erfolgreiche Ergebnisse werden
+        zusätzlich unter cache_dir gespeichert, sodass ein Run ohne Änderungen
+        emerge --pretend komplett überspringt.
+        
+        Args:
+            force: Erzwingt einen neuen Resolver-Lauf
+        
+        Returns:
+            Geteiltes ResolverResult
+        """
+        fingerprint = update_state_fingerprint()
+        
+        if (not force and self._resolution is not None
+                and self._resolution.fingerprint == fingerprint):
+            self.logger.debug("Verwende gecachtes Resolver-Ergebnis")
+            return self._resolution
+        
+        use_persistent = self.config.get('resolver_cache', True) and not force
+        if use_persistent:
+            cached = self.state_cache.load('resolver')
+            if cached.get('fingerprint') == fingerprint:
+                self._resolution = ResolverResult(
+                    RESOLVER_COMMAND, cached.get('returncode', 0),
+                    cached.get('stdout', ''), cached.get('stderr', ''),
+                    0.0, fingerprint, from_cache=True
+                )
+                self.stats['resolver']['cache_hit'] = True
+                self.print_info(f"Keine Änderungen seit {cached.get('timestamp', '?')} - "
+                                f"überspringe emerge --pretend (Resolver-Cache)")
+                return self._resolution
+        
+        # Gestreamt über run_command: Beobachter sehen die Zeilen sofort, ein Abbruch
+        # beendet emerge zuverlässig (stderr landet mit im Stream)
+        start = time.monotonic()
+        _, output = self.run_command(RESOLVER_COMMAND, "Abhängigkeitsauflösung (emerge --pretend @world)",
+                                     allow_fail=True, capture_output=True, report=False)
+        with output:
+            stdout = str(output)
+            returncode = output.returncode if output.returncode is not None else 1
+        duration = time.monotonic() - start
+        
+        self._resolution = ResolverResult(
+            RESOLVER_COMMAND, returncode, stdout, '', duration, fingerprint
+        )
+        self.stats['resolver']['runs'] += 1
+        self.stats['resolver']['seconds'] += round(duration, 2)
+        self.logger.info(f"Resolver-Lauf abgeschlossen in {duration:.1f}s (Exit Code: {returncode})")
+        
+        # Nur erfolgreiche Ergebnisse persistieren - Fehlschläge werden im nächsten Run neu geprüft
+        if self.config.get('resolver_cache', True) and returncode == 0 and not self.dry_run:
+            self.state_cache.save('resolver', {
+                'fingerprint': fingerprint,
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'returncode': returncode,
+                'stdout': stdout,
+                'stderr': ''
+            })
+        return self._resolution
+    
+    def invalidate_resolution(self):
+        """Verwirft das gecachte Resolver-Ergebnis"""
+        self._resolution = None
+    
+    def get_history(self) -> Optional[EmergeHistory]:
+        """Öffnet den Build-Historie-Index und liest neue emerge.log Einträge ein"""
+        if self._history is None:
+            try:
+                self._history = EmergeHistory(
+                    str(self.state_cache.cache_dir / 'history.sqlite'),
+                    self.config.get('emerge_log', '/var/log/emerge.log')
+                )
+            except (OSError, sqlite3.Error) as e:
+                self.logger.warning(f"Build-Historie nicht verfügbar: {e}")
+                return None
+        
+        try:
+            start = time.monotonic()
+            new_builds = self._history.update()
+            if new_builds:
+                self.logger.info(f"Build-Historie: {new_builds} neue Builds indiziert "
+                                 f"({time.monotonic() - start:.1f}s)")
+        except (OSError, sqlite3.Error) as e:
+            self.logger.warning(f"Konnte emerge.log nicht indizieren: {e}")
+        return self._history
+    
     def check_blocked_packages(self, auto_resolve: bool = False) -> bool:
         """Prüft auf blockierte Pakete
         
@@ -882,13 +3378,9 @@ class GentooUpdater:
         self.print_info("Prüfe auf blockierte Pakete...")
         
         try:
-            result = subprocess.run(
-                ["emerge", "--update", "--deep", "--newuse", "--pretend", "@world"],
-                capture_output=True,
-                text=True
-            )
+            result = self.resolve_world()
             
-            if "blocked by" in result.stdout.lower() or "blocking" in result.stdout.lower():
+            if result.plan.has_blocks:
                 print(result.stdout)
                 
                 if auto_resolve:
@@ -904,14 +3396,11 @@ class GentooUpdater:
             self.print_warning(f"Konnte Blockierungen nicht prüfen: {e}")
             return True
     
-    def detect_critical_updates(self, pretend_output: str) -> List[str]:
+    def detect_critical_updates(self, entries: List[MergeEntry]) -> List[str]:
         """Erkennt kritische Paket-Updates und speichert sie in stats"""
         critical_packages = self.config.get('critical_packages', [])
-        found_critical = []
-        
-        for pkg in critical_packages:
-            if pkg in pretend_output:
-                found_critical.append(pkg)
+        merged_cps = {entry.cp for entry in entries if entry.is_merge}
+        found_critical = [pkg for pkg in critical_packages if pkg in merged_cps]
         
         if found_critical:
             self.print_warning(_('CRITICAL_PACKAGES_WARNING'))
@@ -923,6 +3412,17 @@ class GentooUpdater:
         
         return found_critical
     
+    def wait_for_backup(self):
+        """Wartet auf das parallel laufende Backup, bevor Konfigurationsdateien geändert werden"""
+        if self._backup_future is not None:
+            self._backup_future.result()
+    
+    def _run_timed(self, func, *args, **kwargs) -> float:
+        """Führt func aus und gibt die Laufzeit in Sekunden zurück (für Preflight-Tasks)"""
+        start = time.monotonic()
+        func(*args, **kwargs)
+        return time.monotonic() - start
+    
     def cleanup_manifest_quarantine(self):
         """Räumt beschädigte Manifest-Dateien auf"""
         quarantine_dir = "/var/db/repos/gentoo/.tmp-unverified-download-quarantine"
@@ -1086,10 +3586,66 @@ class GentooUpdater:
         
         return None
     
-    def configure_rsync_mirrors(self):
-        """Konfiguriert die deutschen RSYNC Mirror in repos.conf/gentoo.conf
+    def benchmark_mirrors(self) -> Tuple[List[str], Optional[str]]:
+        """Misst Distfile- und Rsync-Mirrors parallel und ohne TTY
+        
+        HTTP-Mirrors werden über TCP-Latenz und einen kurzen Range-Download bewertet,
+        Rsync-Mirrors über die Zeit bis zum Daemon-Greeting. Jede Probe hat ein festes
+        Timeout, sodass die Auswahl unabhängig von der Mirror-Anzahl nach wenigen
+        Sekunden fertig ist.
+        
+        Returns:
+            Tuple (distfile_mirrors, rsync_mirror): erreichbare Mirrors nach Rang
+            sortiert und der beste Rsync-Mirror (None wenn keiner erreichbar)
+        """
+        timeout = float(self.config.get('mirror_probe_timeout', MIRROR_PROBE_TIMEOUT))
+        self.print_info(f"Messe Mirror-Geschwindigkeit (Timeout {timeout:g}s pro Mirror)...")
+        start = time.monotonic()
+        
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            distfiles_future = pool.submit(
+                rank_mirrors, DEFAULT_GERMAN_MIRRORS_DISTFILES, probe_http_mirror,
+                timeout=timeout,
+                probe_bytes=int(self.config.get('mirror_probe_bytes', MIRROR_PROBE_BYTES))
+            )
+            rsync_future = pool.submit(
+                rank_mirrors, DEFAULT_GERMAN_MIRRORS_RSYNC, probe_rsync_mirror, timeout=timeout
+            )
+            distfiles = distfiles_future.result()
+            rsync = rsync_future.result()
+        
+        self.stats['mirror_probe'] = {
+            'seconds': round(time.monotonic() - start, 2),
+            'distfiles': [probe.to_dict() for probe in distfiles],
+            'rsync': [probe.to_dict() for probe in rsync]
+        }
+        
+        for probe in distfiles + rsync:
+            self.mirror_scores.record_probe(probe)
+            if probe.ok:
+                speed = f", {probe.throughput / 1024:.0f} KiB/s" if probe.throughput else ""
+                self.logger.info(f"Mirror {probe.url}: {probe.latency * 1000:.0f} ms{speed}")
+            else:
+                self.logger.info(f"Mirror {probe.url}: nicht erreichbar ({probe.error})")
+        
+        self.mirror_scores.mark_probed()
+        if not self.dry_run:
+            self.mirror_scores.save()
+        
+        best_distfiles = [probe.url for probe in distfiles if probe.ok]
+        best_rsync = next((probe.url for probe in rsync if probe.ok), None)
+        self.print_success(
+            f"Mirror-Messung abgeschlossen in {self.stats['mirror_probe']['seconds']:.1f}s: "
+            f"{len(best_distfiles)}/{len(distfiles)} Distfile-, "
+            f"{sum(probe.ok for probe in rsync)}/{len(rsync)} Rsync-Mirror erreichbar"
+        )
+        return best_distfiles, best_rsync
+    
+    def configure_rsync_mirrors(self, primary_rsync_mirror: Optional[str] = None):
+        """Konfiguriert den RSYNC Mirror in repos.conf/gentoo.conf
         
-        Setzt rsync.de.gentoo.org als primären Mirror mit deutschen Fallbacks
+        Args:
+            primary_rsync_mirror: sync-uri, Standard ist rsync.de.gentoo.org
         """
         repos_conf_path = '/etc/portage/repos.conf/gentoo.conf'
         
@@ -1110,7 +3666,7 @@ class GentooUpdater:
             
             # Baue neue Fallback-Liste (nur primär Mirror, rsync.de.gentoo.org)
             # Portage übernimmt automatisch Fallbacks aus repos.conf wenn dieser Mirror ausfällt
-            primary_rsync_mirror = 'rsync://rsync.de.gentoo.org/gentoo-portage'
+            primary_rsync_mirror = primary_rsync_mirror or DEFAULT_GERMAN_MIRRORS_RSYNC[0]
             
             # Ersetze sync-uri mit deutschem Primary Mirror
             if 'sync-uri' in repos_conf_content:
@@ -1129,7 +3685,7 @@ class GentooUpdater:
                 try:
                     with open(repos_conf_path, 'w') as f:
                         f.write(updated_content)
-                    self.print_success(f"repos.conf aktualisiert mit deutschem RSYNC Mirror (rsync.de.gentoo.org)")
+                    self.print_success(f"repos.conf aktualisiert mit RSYNC Mirror {primary_rsync_mirror}")
                     self.logger.info(f"Primärer RSYNC Mirror: {primary_rsync_mirror}")
                     if current_sync:
                         self.logger.info(f"Alter Mirror: {current_sync}")
@@ -1160,7 +3716,7 @@ class GentooUpdater:
         
         if mirrors:
             for i, mirror in enumerate(mirrors, 1):
-                print(f"  {i}. {mirror}")
+                print(f"  {i}. {mirror}{self.mirror_scores.describe(mirror)}")
                 self.logger.info(f"Distfile Mirror {i}: {mirror}")
             self.logger.info(f"Insgesamt {len(mirrors)} Distfile-Mirror(s) konfiguriert")
             self.stats['used_mirror'] = mirrors[0]
@@ -1171,7 +3727,10 @@ class GentooUpdater:
             
     def run_command(self, command: List[str], description: str, 
                     allow_fail: bool = False, capture_output: bool = False,
-                    custom_env: Optional[Dict[str, str]] = None) -> Tuple[bool, str]:
+                    custom_env: Optional[Dict[str, str]] = None,
+                    observers: Optional[List] = None,
+                    abort_predicates: Optional[List] = None,
+                    report: bool = True) -> Tuple[bool, OutputCapture]:
         """
         Führt einen Befehl aus und gibt den Status zurück
         
@@ -1181,103 +3740,302 @@ class GentooUpdater:
             allow_fail: Wenn True, wird bei Fehler nicht abgebrochen
             capture_output: Wenn True, wird Output zurückgegeben statt gedruckt
             custom_env: Zusätzliche oder überschreibende Umgebungsvariablen
+            observers: Zusätzliche Callables, die jede Ausgabezeile erhalten
+                       (zusätzlich zu self.line_observers)
+            abort_predicates: Callables, die nach den Observern jede Zeile erhalten und einen
+                              Grund zurückgeben, sobald der Lauf sicher scheitert - dann wird
+                              die Prozessgruppe sofort beendet
+            report: Wenn False, werden Erfolg und Fehlschlag nicht gemeldet - der
+                    Aufrufer wertet output.returncode selbst aus
             
         Returns:
-            Tuple (success, output): True bei Erfolg, False bei Fehler und Output
+            Tuple (success, output): True bei Erfolg, False bei Fehler und die
+            Ausgabe als OutputCapture (begrenzter Speicher, vollständig erneut lesbar)
         """
         self.print_info(f"{description}...")
         self.logger.debug(f"Führe aus: {' '.join(command)}")
+        output = OutputCapture()
         
         if self.dry_run:
             self.print_warning(_('DRY_RUN_MSG', cmd=' '.join(command)))
-            return True, ""
+            return True, output
         
         # Baue Umgebung auf
         env = os.environ.copy()
+        if command and command[0] == 'emerge':
+            env.update(self.emerge_env)
         if custom_env:
             env.update(custom_env)
+        line_observers = self.line_observers + list(observers or [])
             
         try:
-            if capture_output:
-                result = subprocess.run(
-                    command,
-                    capture_output=True,
-                    text=True,
-                    env=env
-                )
-                output = result.stdout + result.stderr
-                
-                if result.returncode == 0:
-                    self.print_success(f"{description} erfolgreich abgeschlossen")
-                    return True, output
-                else:
-                    self.print_error(f"{description} fehlgeschlagen (Exit Code: {result.returncode})")
-                    if not allow_fail:
-                        sys.exit(1)
-                    return False, output
-            else:
-                process = subprocess.Popen(
-                    command,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    universal_newlines=True,
-                    bufsize=1,
-                    env=env
-                )
-                
-                output_lines = []
-                # Echtzeit-Ausgabe
+            # Eigene Prozessgruppe, damit ein Abbruch auch alle Kindprozesse trifft
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                universal_newlines=True,
+                bufsize=1,
+                env=env,
+                start_new_session=bool(abort_predicates)
+            )
+            
+            start = time.monotonic()
+            abort_reason = None
+            try:
+                # Zeilenweise lesen - mit capture_output still, sonst Echtzeit-Ausgabe
                 for line in process.stdout:
-                    print(line, end='')
-                    output_lines.append(line)
-                    
-                process.wait()
-                output = ''.join(output_lines)
-                
-                if process.returncode == 0:
-                    self.print_success(f"{description} erfolgreich abgeschlossen")
-                    return True, output
-                else:
-                    self.print_error(f"{description} fehlgeschlagen (Exit Code: {process.returncode})")
-                    if not allow_fail:
-                        sys.exit(1)
-                    return False, output
+                    if not capture_output:
+                        print(line, end='')
+                    output.write(line)
+                    self._notify_observers(line_observers, line)
+                    for predicate in abort_predicates or ():
+                        abort_reason = predicate(line)
+                        if abort_reason:
+                            break
+                    if abort_reason:
+                        self.terminate_process_group(process)
+                        break
+                process.wait()
+            finally:
+                # Abbruch durch Exception, Ctrl+C oder sys.exit im Observer: keinen Prozess
+                # zurücklassen (die neue Session erhält kein SIGINT vom Terminal)
+                if process.poll() is None:
+                    if abort_predicates:
+                        self.terminate_process_group(process)
+                    else:
+                        process.kill()
+                    process.wait()
+                process.stdout.close()
+            output.returncode = process.returncode
+            
+            if abort_reason:
+                seconds = round(time.monotonic() - start, 1)
+                self.print_warning(f"{description} nach {seconds}s abgebrochen: {abort_reason}")
+                self.stats.setdefault('aborts', []).append({
+                    'description': description,
+                    'reason': abort_reason,
+                    'seconds': seconds
+                })
+                if not allow_fail:
+                    sys.exit(1)
+                return False, output
+            
+            if not report:
+                return process.returncode == 0, output
+            if process.returncode == 0:
+                self.print_success(f"{description} erfolgreich abgeschlossen")
+                return True, output
+            else:
+                self.print_error(f"{description} fehlgeschlagen (Exit Code: {process.returncode})")
+                if not allow_fail:
+                    sys.exit(1)
+                return False, output
                 
         except FileNotFoundError:
             self.print_error(_('COMMAND_NOT_FOUND', cmd=command[0]))
             if not allow_fail:
                 sys.exit(1)
-            return False, ""
+            return False, output
         except Exception as e:
             self.print_error(_('RUN_COMMAND_ERROR', desc=description, error=str(e)))
             self.logger.exception("Exception Details:")
             if not allow_fail:
                 sys.exit(1)
-            return False, str(e)
+            output.write(str(e))
+            return False, output
+        except BaseException:
+            # sys.exit/KeyboardInterrupt: die Ausgabe erreicht keinen Aufrufer mehr
+            output.close()
+            raise
             
-    def sync_repositories(self, retry: int = 1, mirror_index: int = 0) -> bool:
-        """Synchronisiert die Portage-Repositories mit Mirror-Fallback
+    def _notify_observers(self, observers: List, line: str):
+        """Reicht eine Ausgabezeile an Beobachter weiter - deren Fehler brechen den Befehl nie ab"""
+        for observer in observers:
+            try:
+                observer(line)
+            except Exception:
+                self.logger.exception(f"Beobachter {type(observer).__name__} fehlgeschlagen bei Zeile: {line.rstrip()}")
+    
+    def terminate_process_group(self, process: subprocess.Popen, grace: float = 10.0):
+        """Beendet die Prozessgruppe eines Befehls (SIGTERM, nach grace Sekunden SIGKILL)"""
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            return
+        try:
+            process.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            process.wait()
+    
+    def get_repositories(self) -> Dict[str, Dict[str, str]]:
+        """Liest die Repository-Konfiguration (portageq repos_config, sonst /etc/portage/repos.conf)
         
-        Args:
-            retry: Anzahl der Wiederholungsversuche bei Manifest-Fehler
-            mirror_index: Index des zu verwendenden German Mirror (0-2)
+        Returns:
+            Dict Repository-Name -> Optionen (location, sync-type, auto-sync, ...)
+        """
+        parser = configparser.ConfigParser(interpolation=None, strict=False)
+        try:
+            result = subprocess.run(
+                ["portageq", "repos_config", "/"],
+                capture_output=True,
+                text=True,
+                timeout=30
+            )
+            if result.returncode == 0:
+                parser.read_string(result.stdout)
+        except (OSError, subprocess.TimeoutExpired, configparser.Error) as e:
+            self.logger.debug(f"portageq repos_config fehlgeschlagen: {e}")
+        
+        if not parser.sections():
+            repos_conf = Path('/etc/portage/repos.conf')
+            files = sorted(repos_conf.iterdir()) if repos_conf.is_dir() else [repos_conf]
+            try:
+                parser.read([str(path) for path in files if path.is_file()])
+            except configparser.Error as e:
+                self.logger.warning(f"repos.conf nicht lesbar: {e}")
+        
+        return {name: dict(parser[name]) for name in parser.sections()}
+    
+    def sync_overlay(self, name: str) -> Dict:
+        """Synchronisiert ein einzelnes Repository mit emaint sync -r (eigener Timeout und Retry)
+        
+        Läuft in einem Worker-Thread - Ausgaben gehen nur ins Log, die Meldungen
+        erzeugt sync_repositories nach Abschluss.
+        
+        Returns:
+            Dict mit seconds, success, attempts und error
+        """
+        timeout = int(self.config.get('repo_sync_timeout', 600))
+        retries = int(self.config.get('repo_sync_retries', 1))
+        result = {'seconds': 0.0, 'success': False, 'attempts': 0, 'error': None}
+        command = ["emaint", "sync", "-r", name]
+        
+        if self.dry_run:
+            self.logger.info(f"DRY-RUN: {' '.join(command)}")
+            result['success'] = True
+            return result
+        
+        start = time.monotonic()
+        for attempt in range(1, retries + 2):
+            result['attempts'] = attempt
+            try:
+                process = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+                output = process.stdout + process.stderr
+                self.logger.debug(f"emaint sync -r {name}:\n{output}")
+                if process.returncode == 0:
+                    result['success'] = True
+                    result['error'] = None
+                    break
+                lines = [line for line in output.splitlines() if line.strip()]
+                result['error'] = lines[-1].strip() if lines else f"Exit Code {process.returncode}"
+            except subprocess.TimeoutExpired:
+                result['error'] = f"Timeout nach {timeout}s"
+            except OSError as e:
+                result['error'] = str(e)
+                break
+            if attempt <= retries:
+                time.sleep(min(5 * attempt, 30))
+        
+        result['seconds'] = round(time.monotonic() - start, 1)
+        return result
+    
+    def sync_repositories(self) -> bool:
+        """Synchronisiert den Gentoo-Tree und alle Overlays parallel
+        
+        Overlays mit Sync-Konfiguration laufen als einzelne emaint sync -r Aufrufe
+        in einem Thread-Pool (repo_sync_jobs inkl. Haupt-Tree), während der
+        Gentoo-Tree mit Mirror-Failover synchronisiert wird. Ein fehlerhaftes
+        Overlay erzeugt nur eine Warnung.
+        
+        Returns:
+            True wenn der Gentoo-Tree erfolgreich synchronisiert wurde
         """
-        self.print_section(f"SCHRITT 1: Repository-Synchronisation (Versuch {retry}/2)")
+        repos = self.get_repositories()
+        overlays = [
+            name for name, options in repos.items()
+            if name != 'gentoo' and options.get('sync-type')
+            and options.get('auto-sync', 'yes').lower() not in ('no', 'false', '0')
+        ]
         
-        # Versuche erst, die schnellsten Mirror mit mirrorselect zu wählen (nur beim ersten Versuch)
-        # WICHTIG: -i öffnet UI nur wenn Terminal interaktiv ist, sonst automatisch fallback
+        self._split_sync = bool(overlays) and 'gentoo' in repos
+        if not self._split_sync:
+            return self.sync_main_repository()
+        
+        jobs = int(self.config.get('repo_sync_jobs', 4))
+        self.stats['repo_sync'] = {}
+        self.logger.info(f"Synchronisiere {len(overlays)} Overlay(s) parallel: {', '.join(overlays)}")
+        
+        with ThreadPoolExecutor(max_workers=max(1, jobs - 1)) as pool:
+            futures = {name: pool.submit(self.sync_overlay, name) for name in overlays}
+            success = self.sync_main_repository()
+            attempts = self.stats.get('sync_attempts', [])
+            self.stats['repo_sync']['gentoo'] = {
+                'seconds': round(sum(attempt['seconds'] for attempt in attempts), 1),
+                'success': success,
+                'attempts': len(attempts),
+                'error': None if success else 'alle Mirror fehlgeschlagen'
+            }
+            
+            for name, future in futures.items():
+                result = future.result()
+                self.stats['repo_sync'][name] = result
+                if result['success']:
+                    self.print_success(f"Overlay {name} synchronisiert ({format_duration(result['seconds'])})")
+                else:
+                    self.print_warning(f"Overlay {name} nicht synchronisiert: {result['error']}")
+        
+        return success
+    
+    def sync_main_repository(self, retry: int = 1, mirror_index: int = 0) -> bool:
+        """Synchronisiert den Gentoo-Tree mit Mirror-Failover
+        
+        Schlägt ein Sync fehl, wird der nächste Rsync-Mirror der (nach Scoreboard
+        sortierten) Rotation in sync-uri eingetragen. retry_count bestimmt die Anzahl
+        der Durchläufe durch die Rotation, zwischen den Durchläufen wächst die Wartezeit
+        exponentiell.
+        
+        Args:
+            retry: Nummer des aktuellen Versuchs (1-basiert)
+            mirror_index: Index des Mirrors in der Rsync-Rotation
+        """
+        if retry == 1:
+            self._rsync_rotation = None
+            self.stats['sync_attempts'] = []
+        max_attempts = max(2, len(DEFAULT_GERMAN_MIRRORS_RSYNC) * max(1, self.retry_count))
+        self.print_section(f"SCHRITT 1: Repository-Synchronisation (Versuch {retry}/{max_attempts})")
+        
+        # Wähle die schnellsten Mirror (nur beim ersten Versuch und ohne eigene --mirrors):
+        # mirrorselect-UI nur auf Wunsch und mit Terminal, sonst eingebauter Benchmark
         best_mirrors_distfiles = None
         best_mirror_rsync = None
+        default_mirrors = self.custom_mirrors in (None, DEFAULT_GERMAN_MIRRORS_DISTFILES)
         
-        if retry == 1 and mirror_index == 0 and not self.custom_mirrors:
-            # Versuche Distfiles Mirror auszuwählen
-            try:
-                best_mirrors_distfiles = self.auto_select_best_mirror_distfiles()
-            except (EOFError, KeyboardInterrupt):
-                # Benutzer hat abgebrochen - verwende Standard
-                self.print_info("Verwende Standard-Mirror statt mirrorselect")
-            except Exception:
-                pass
+        if retry == 1 and mirror_index == 0 and default_mirrors:
+            if self.use_mirrorselect and sys.stdin.isatty():
+                # Versuche Distfiles Mirror auszuwählen
+                try:
+                    best_mirrors_distfiles = self.auto_select_best_mirror_distfiles()
+                except (EOFError, KeyboardInterrupt):
+                    # Benutzer hat abgebrochen - verwende Standard
+                    self.print_info("Verwende Standard-Mirror statt mirrorselect")
+                except Exception:
+                    pass
+            elif self.config.get('mirror_probe', True):
+                # Neu messen nur nach Ablauf der TTL oder nach Fehlern, sonst Scoreboard nutzen
+                ttl = float(self.config.get('mirror_score_ttl', 86400))
+                if (self.mirror_scores.needs_probe(DEFAULT_GERMAN_MIRRORS_DISTFILES, ttl)
+                        or self.mirror_scores.needs_probe(DEFAULT_GERMAN_MIRRORS_RSYNC, ttl)):
+                    self.benchmark_mirrors()
+                else:
+                    probed = datetime.fromtimestamp(self.mirror_scores.probed_at)
+                    self.print_info(f"Mirror-Rangfolge aus Scoreboard (gemessen {probed.strftime('%Y-%m-%d %H:%M')})")
+                best_mirrors_distfiles = self.mirror_scores.rank(DEFAULT_GERMAN_MIRRORS_DISTFILES)
+                best_mirror_rsync = self.mirror_scores.rank(DEFAULT_GERMAN_MIRRORS_RSYNC)[0]
         
         # Verwende beste Mirror wenn vorhanden, sonst Fallback
         mirrors_to_use = None
@@ -1289,11 +4047,13 @@ class GentooUpdater:
         else:
             mirrors_to_use = DEFAULT_GERMAN_MIRRORS_DISTFILES
         
-        # Logge die konfigurierten Mirrors
-        self.log_mirrors_info()
+        # Logge die konfigurierten Mirrors (Distfiles ändern sich beim Rsync-Failover nicht)
+        if retry == 1:
+            self.log_mirrors_info()
         
-        # Aktualisiere make.conf mit Distfiles Mirror
+        # Aktualisiere make.conf mit Distfiles Mirror - erst nach dem (parallelen) Backup
         make_conf_path = '/etc/portage/make.conf'
+        self.wait_for_backup()
         if mirrors_to_use and os.path.exists(make_conf_path):
             try:
                 with open(make_conf_path, 'r') as f:
@@ -1319,189 +4079,910 @@ class GentooUpdater:
             except Exception as e:
                 self.print_warning(f"Konnte make.conf nicht aktualisieren: {e}")
         
-        # Aktualisiere repos.conf mit deutschem RSYNC Mirror
-        self.configure_rsync_mirrors()
+        # Rsync-Rotation: gewählter Mirror zuerst, danach die übrigen nach Scoreboard-Rang
+        if self._rsync_rotation is None:
+            ranked = self.mirror_scores.rank(DEFAULT_GERMAN_MIRRORS_RSYNC)
+            self._rsync_rotation = list(dict.fromkeys([best_mirror_rsync] + ranked if best_mirror_rsync else ranked))
+        rsync_mirror = self._rsync_rotation[mirror_index % len(self._rsync_rotation)]
+        
+        # Tree bereits aktuell? Dann kein rsync (schont Mirror-Rate-Limits und I/O)
+        if retry == 1:
+            skip_reason = self.check_tree_freshness(rsync_mirror)
+            if skip_reason:
+                saved = self.state_cache.load('sync').get('seconds')
+                self.stats['sync_skipped'] = {'reason': skip_reason, 'saved_seconds': saved}
+                self.print_success(f"{symbol('skip')} Sync übersprungen: {skip_reason}"
+                                   + (f" (spart ca. {format_duration(saved)})" if saved else ""))
+                return True
+        
+        # Aktualisiere repos.conf mit dem Rsync-Mirror dieses Versuchs
+        self.configure_rsync_mirrors(rsync_mirror)
+        self.transfer_observer.rsync_mirror = rsync_mirror
+        
+        # Timeout pro Mirror: rsync bricht hängende Verbindungen selbst ab, und Portage
+        # versucht nicht erneut denselben Mirror - das Failover übernimmt die Rotation
+        contimeout = int(self.config.get('sync_connect_timeout', 15))
+        io_timeout = int(self.config.get('sync_io_timeout', 180))
+        sync_env = {
+            'PORTAGE_RSYNC_RETRIES': '0',
+            'PORTAGE_RSYNC_EXTRA_OPTS': ' '.join(filter(None, [
+                os.environ.get('PORTAGE_RSYNC_EXTRA_OPTS', ''),
+                f'--contimeout={contimeout}', f'--timeout={io_timeout}'
+            ]))
+        }
         
-        # Verwende Standard-Sync mit repos.conf (Portage-Tree über rsync)
+        # Verwende Standard-Sync mit repos.conf (Portage-Tree über rsync) - Overlays laufen
+        # bei parallelem Sync separat, dann wird nur der Gentoo-Tree synchronisiert
+        sync_cmd = ["emaint", "sync", "-r", "gentoo"] if self._split_sync else ["emerge", "--sync"]
+        attempt_start = time.monotonic()
         success, output = self.run_command(
-            ["emerge", "--sync"],
-            "Synchronisiere Portage-Repositories mit emerge --sync",
-            allow_fail=True
+            sync_cmd,
+            f"Synchronisiere Portage-Repositories mit {' '.join(sync_cmd)} ({rsync_mirror})",
+            allow_fail=True,
+            custom_env=sync_env
         )
+        output.close()
+        self.stats['sync_attempts'].append({
+            'mirror': rsync_mirror,
+            'seconds': round(time.monotonic() - attempt_start, 1),
+            'success': success
+        })
+        
+        # Fehlschläge fließen ins Scoreboard und erzwingen beim nächsten Run eine neue Messung
+        if not success:
+            self.mirror_scores.record_failure(rsync_mirror)
+        if not self.dry_run:
+            self.mirror_scores.save()
+        
+        if success:
+            self.stats['sync_mirror'] = rsync_mirror
+            if not self.dry_run:
+                # Dauer des erfolgreichen Syncs = Zeitersparnis, wenn er später übersprungen wird
+                self.state_cache.save('sync', {
+                    'mirror': rsync_mirror,
+                    'seconds': self.stats['sync_attempts'][-1]['seconds'],
+                    'finished': time.time()
+                })
+            return True
         
-        # Bei Fehler: Quarantine aufräumen und Retry
-        if not success and retry < 2:
-            self.print_warning(_('SYNC_RETRY'))
+        # Bei Fehler: Quarantine aufräumen und mit dem nächsten Mirror erneut versuchen
+        if retry < max_attempts:
+            next_index = (mirror_index + 1) % len(self._rsync_rotation)
+            # Backoff: kurze Pause innerhalb eines Durchlaufs, exponentiell zwischen Durchläufen
+            delay = 2
+            if next_index == 0:
+                delay = min(2 ** (retry // len(self._rsync_rotation)) * 15, 300)
+            self.print_warning(_('SYNC_RETRY', mirror=self._rsync_rotation[next_index], delay=delay))
             self.cleanup_manifest_quarantine()
+            time.sleep(delay)
             
-            # Warte kurz, bevor Retry
-            time.sleep(2)
-            
-            return self.sync_repositories(retry=2, mirror_index=0)
+            return self.sync_main_repository(retry=retry + 1, mirror_index=next_index)
         
-        return success
+        return False
+        
+    def check_tree_freshness(self, rsync_mirror: str) -> Optional[str]:
+        """Prüft ob der lokale Gentoo-Tree einen Sync überflüssig macht
         
+        Prüft das Mindestintervall min_sync_interval (Zeit seit dem letzten lokalen
+        Sync, nicht der Snapshot-Stand des Mirrors) und vergleicht metadata/timestamp.chk
+        mit der Kopie auf dem Mirror.
+        
+        Returns:
+            Grund für das Überspringen oder None wenn synchronisiert werden soll
+        """
+        min_interval = int(self.config.get('min_sync_interval', 0))
+        if min_interval > 0:
+            synced = last_local_sync(GENTOO_REPO_DIR, self.config.get('emerge_log', '/var/log/emerge.log'))
+            age = time.time() - synced if synced is not None else -1
+            if 0 <= age < min_interval:
+                return (f"letzter Sync vor {format_duration(age)} "
+                        f"(Mindestintervall {format_duration(min_interval)})")
+        
+        local_path = os.path.join(GENTOO_REPO_DIR, 'metadata', 'timestamp.chk')
+        try:
+            with open(local_path, 'r') as f:
+                local = parse_tree_timestamp(f.read())
+        except OSError:
+            return None
+        if local is None:
+            return None
+        
+        if not self.config.get('sync_timestamp_check', True):
+            return None
+        remote = fetch_remote_timestamp(rsync_mirror, timeout=float(self.config.get('sync_connect_timeout', 15)))
+        if remote is None:
+            self.logger.info(f"timestamp.chk von {rsync_mirror} nicht abrufbar - synchronisiere")
+            return None
+        self.logger.info(f"timestamp.chk lokal: {local.isoformat()}, Mirror: {remote.isoformat()}")
+        if local >= remote:
+            return f"lokaler Tree entspricht dem Mirror-Stand ({remote.strftime('%Y-%m-%d %H:%M')} UTC)"
+        return None
+    
     def update_eix(self) -> bool:
-        """Aktualisiert die eix-Datenbank"""
+        """Startet eix-update im Hintergrund (nice/ionice), wenn sich die Repositories geändert haben
+        
+        Keiner der folgenden Schritte liest die eix-Datenbank, daher läuft das Update
+        parallel zu Auflösung und Kompilierung. wait_for_eix() wartet vor der
+        Zusammenfassung auf das Ende.
+        
+        Returns:
+            True wenn eix-update gestartet oder nicht nötig war
+        """
         self.print_section("SCHRITT 2: eix-Datenbank aktualisieren")
         
         # Prüfe ob eix installiert ist
-        try:
-            subprocess.run(["which", "eix"], check=True, 
-                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        except subprocess.CalledProcessError:
+        if not shutil.which("eix-update"):
             self.print_warning(_('EIX_NOT_INSTALLED'))
             return True
+        
+        fingerprint = repository_fingerprint()
+        if fingerprint and self.state_cache.load('eix').get('fingerprint') == fingerprint:
+            self.stats['eix'] = {'skipped': True, 'seconds': 0.0, 'success': True}
+            self.print_success(f"{symbol('skip')} eix-Datenbank aktuell - Repositories unverändert seit letztem eix-update")
+            return True
+        
+        command = ["nice", "-n", "19"]
+        if shutil.which("ionice"):
+            command += ["ionice", "-c", "3"]
+        command.append("eix-update")
+        
+        if self.dry_run:
+            self.print_warning(_('DRY_RUN_MSG', cmd=' '.join(command)))
+            return True
+        
+        eix_log = self.log_file.with_suffix('.eix.log')
+        try:
+            with open(eix_log, 'w') as log:
+                self._eix_process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+        except OSError as e:
+            self.print_warning(f"eix-update konnte nicht gestartet werden: {e}")
+            return False
+        
+        self._eix_started = time.monotonic()
+        self._eix_fingerprint = fingerprint
+        self.print_info(f"eix-update läuft im Hintergrund (niedrige CPU-/IO-Priorität, Log: {eix_log})")
+        return True
+    
+    def wait_for_eix(self):
+        """Wartet auf ein im Hintergrund laufendes eix-update und merkt sich den Repository-Stand"""
+        if self._eix_process is None:
+            return
+        
+        if self._eix_process.poll() is None:
+            self.print_info("Warte auf eix-update...")
+        returncode = self._eix_process.wait()
+        self._eix_process = None
+        seconds = round(time.monotonic() - self._eix_started, 1)
+        self.stats['eix'] = {'skipped': False, 'seconds': seconds, 'success': returncode == 0}
+        
+        if returncode == 0:
+            self.print_success(f"eix-Datenbank aktualisiert ({format_duration(seconds)}, im Hintergrund)")
+            if self._eix_fingerprint:
+                self.state_cache.save('eix', {'fingerprint': self._eix_fingerprint, 'finished': time.time()})
+        else:
+            self.print_warning(f"eix-update fehlgeschlagen (Exit Code: {returncode})")
+        
+    def check_updates(self) -> Tuple[bool, str]:
+        """Prüft ob Updates verfügbar sind"""
+        self.print_section("SCHRITT 3: Prüfe verfügbare Updates")
+        
+        # Prüfe blockierte Pakete
+        auto_resolve = self.config.get('resolve_blocks', False)
+        if not self.check_blocked_packages(auto_resolve=auto_resolve):
+            sys.exit(1)
+        
+        try:
+            result = self.resolve_world()
             
-        success, output = self.run_command(
-            ["eix-update"],
-            "Aktualisiere eix-Datenbank"
+            if result.no_updates:
+                self.print_success(_('NO_UPDATES'))
+                return False, ""
+            else:
+                self.print_info(_('UPDATES_AVAILABLE'))
+                print(result.stdout)
+                
+                # Prüfe auf kritische Updates
+                self.detect_critical_updates(result.plan.entries)
+                
+                # Extrahiere Paket-Liste
+                self.extract_package_list(result.plan.entries, 'update')
+                self.stats['download_size'] = result.plan.download_size
+                
+                # Geschätzte Dauer aus der Build-Historie
+                self.estimate_update_duration(result.plan)
+                
+                return True, result.stdout
+                
+        except Exception as e:
+            self.print_error(f"Fehler beim Prüfen der Updates: {str(e)}")
+            return False, ""
+    
+    def get_estimator(self) -> BuildEstimator:
+        """BuildEstimator auf Basis der emerge.log Historie"""
+        history = self.get_history()
+        return BuildEstimator(history.expected_durations() if history else None)
+    
+    def estimate_update_duration(self, plan: MergePlan) -> Optional[Dict]:
+        """Berechnet und zeigt die voraussichtliche Dauer der ausstehenden Updates"""
+        graph = plan.graph()
+        if not graph.nodes:
+            return None
+        
+        jobs = self.config.get_emerge_jobs(graph.max_parallelism)
+        estimate = self.get_estimator().estimate(graph, jobs)
+        self.stats['estimate'] = estimate
+        
+        known = estimate['sources'].get('history', 0)
+        self.print_info(
+            f"{symbol('clock')} Geschätzte Dauer: {format_duration(estimate['seconds'])} "
+            f"(--jobs={jobs}, kritischer Pfad {format_duration(estimate['critical_path_seconds'])}, "
+            f"{known}/{estimate['packages']} Pakete mit Build-Historie)"
         )
+        return estimate
+    
+    def binary_cpvs(self) -> set:
+        """Pakete, die laut Binhost-Index als Binärpaket kommen (brauchen keine Distfiles)"""
+        return set(self.stats.get('binhost', {}).get('binary', []))
+    
+    def start_prefetch(self, plan: MergePlan):
+        """Startet den Distfile-Prefetch im Hintergrund, in Build-Reihenfolge
+        
+        Lädt die Distfiles der ausstehenden Ebuilds mit emerge --fetchonly --nodeps in
+        kleinen Gruppen (prefetch_batch), damit die zuerst gebauten Pakete zuerst
+        bereitstehen. Läuft weiter, während frühere Pakete kompilieren.
+        """
+        if not self.config.get('prefetch_distfiles', True):
+            return
+        
+        graph = plan.graph()
+        binary = self.binary_cpvs()
+        queue = [
+            graph.nodes[cpv] for cpv in graph.topological_order()
+            if graph.nodes[cpv].merge_type == 'ebuild' and graph.nodes[cpv].download_size
+            and cpv not in binary
+        ]
+        if not queue:
+            return
+        
+        total_bytes = sum(entry.download_size for entry in queue)
+        if self.dry_run:
+            self.print_warning(_('DRY_RUN_MSG', cmd=f"emerge --fetchonly --nodeps ({len(queue)} Pakete)"))
+            return
+        
+        self.stats['prefetch'] = {
+            'packages': len(queue),
+            'fetched': 0,
+            'bytes': 0,
+            'seconds': 0.0,
+            'failed': [],
+            'build_wait_seconds': 0.0
+        }
+        self._prefetch_stop = threading.Event()
+        self._prefetch_done = {}
+        self._prefetch_started = time.time()
+        self._prefetch_thread = threading.Thread(target=self._prefetch_worker, args=(queue,), daemon=True)
+        self._prefetch_thread.start()
+        self.print_info(f"Prefetch: {len(queue)} Paket(e), {total_bytes / 1024 ** 2:.1f} MiB "
+                        f"werden im Hintergrund in Build-Reihenfolge geladen")
+    
+    def _fetch_packages(self, entries: List[MergeEntry], observer: 'MirrorTransferObserver') -> bool:
+        """Lädt die Distfiles der angegebenen Pakete (läuft im Prefetch-Thread)"""
+        command = ["emerge", "--fetchonly", "--nodeps", "--quiet", *[f"={entry.cpv}" for entry in entries]]
+        try:
+            # Eigene Prozessgruppe: finish_prefetch beendet auch wget/FETCHCOMMAND-Kinder
+            with self._prefetch_lock:
+                if self._prefetch_stop.is_set():
+                    return False
+                self._prefetch_process = subprocess.Popen(
+                    command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    universal_newlines=True,
+                    start_new_session=True
+                )
+            for line in self._prefetch_process.stdout:
+                self._notify_observers([observer], line)
+            return self._prefetch_process.wait() == 0
+        except OSError as e:
+            self.logger.warning(f"Prefetch fehlgeschlagen: {e}")
+            return False
+    
+    def get_distdir(self) -> str:
+        """DISTDIR aus portageq (Standard /var/cache/distfiles)"""
+        try:
+            result = subprocess.run(["portageq", "distdir"], capture_output=True, text=True, timeout=30)
+            if result.returncode == 0 and result.stdout.strip():
+                return result.stdout.strip()
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        return '/var/cache/distfiles'
+    
+    def list_distfiles(self, entries: List[MergeEntry]) -> List[Tuple[MergeEntry, str, List[str], Tuple[int, Dict[str, str]]]]:
+        """Ermittelt die Distfiles der angegebenen Pakete samt Manifest-Eintrag
+        
+        Die Dateiliste kommt aus emerge --pretend --fetchonly (berücksichtigt USE-Flags),
+        Größe und Hashes aus dem Manifest des Pakets.
+        
+        Returns:
+            Liste von (entry, filename, uris, (size, digests)); Dateien ohne Manifest-Eintrag fehlen
+        """
+        if not entries:
+            return []
+        try:
+            result = subprocess.run(
+                ["emerge", "--pretend", "--fetchonly", "--nodeps", *[f"={entry.cpv}" for entry in entries]],
+                capture_output=True,
+                text=True,
+                timeout=300
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            self.logger.warning(f"Distfile-Liste nicht ermittelbar: {e}")
+            return []
+        
+        locations = {name: options.get('location', os.path.join(REPOS_DIR, name))
+                     for name, options in self.get_repositories().items()}
+        
+        # Pro Paket eine Merge-Zeile, danach eine Zeile mit allen URIs je Datei
+        distfiles = []
+        current: Optional[MergeEntry] = None
+        for line in result.stdout.splitlines():
+            match = MERGE_LINE_RE.match(line)
+            if match:
+                current = MergePlan._parse_entry(match)
+                continue
+            uris = [token for token in line.split() if '://' in token]
+            if not uris or current is None:
+                continue
+            filename = os.path.basename(uris[0])
+            repo_dir = locations.get(current.repository or 'gentoo', GENTOO_REPO_DIR)
+            manifest = read_manifest_dist(os.path.join(repo_dir, current.category, current.package, 'Manifest'), filename)
+            if manifest:
+                distfiles.append((current, filename, uris, manifest))
+        return distfiles
+    
+    def verify_distfiles(self, plan: MergePlan) -> bool:
+        """Prüft vorhandene Distfiles des Merge-Plans parallel gegen das Manifest
+        
+        Defekte Dateien werden gelöscht, unvollständige bleiben zum Fortsetzen liegen;
+        die betroffenen Pakete werden vor dem Kompilieren neu geladen. Bereits geprüfte
+        Dateien (gleiche Größe und mtime) merkt sich distfiles.json.
+        
+        Returns:
+            True wenn danach alle geprüften Distfiles in Ordnung sind
+        """
+        if not self.config.get('verify_distfiles', True) or self.dry_run:
+            return True
+        binary = self.binary_cpvs()
+        entries = [entry for entry in plan.merges if entry.merge_type == 'ebuild' and entry.cpv not in binary]
+        distfiles = self.list_distfiles(entries)
+        if not distfiles:
+            return True
+        
+        start = time.monotonic()
+        distdir = self.get_distdir()
+        cache = self.state_cache.load('distfiles')
+        verified = cache.get('verified', {})
+        pending = {}
+        for entry, filename, _uris, (size, digests) in distfiles:
+            path = os.path.join(distdir, filename)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # Fehlt noch - lädt der Prefetch bzw. emerge
+            if verified.get(filename) == [st.st_size, st.st_mtime_ns]:
+                continue
+            pending.setdefault(filename, (path, size, digests, st, []))[4].append(entry)
+        
+        stats = {'files': len(pending), 'bytes': sum(item[1] for item in pending.values()),
+                 'seconds': 0.0, 'corrupt': [], 'partial': [], 'refetched': []}
+        self.stats['distfile_verify'] = stats
+        if pending:
+            self.print_info(f"Prüfe {len(pending)} Distfile(s), {stats['bytes'] / 1024 ** 2:.1f} MiB gegen das Manifest")
+        
+        refetch: Dict[str, MergeEntry] = {}
+        workers = min(len(pending), os.cpu_count() or 1) or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                filename: pool.submit(verify_distfile, path, size, digests)
+                for filename, (path, size, digests, _st, _entries) in pending.items()
+            }
+            for filename, future in futures.items():
+                path, _size, _digests, st, owners = pending[filename]
+                try:
+                    status = future.result()
+                except Exception as e:
+                    self.logger.warning(f"Prüfung von {filename} fehlgeschlagen: {e}")
+                    continue
+                if status == 'ok':
+                    verified[filename] = [st.st_size, st.st_mtime_ns]
+                    continue
+                if status == 'corrupt':
+                    self.print_warning(f"Distfile {filename} ist beschädigt - wird neu geladen")
+                    stats['corrupt'].append(filename)
+                    try:
+                        os.unlink(path)
+                    except OSError as e:
+                        self.logger.warning(f"{filename} nicht löschbar: {e}")
+                elif status == 'partial':
+                    self.logger.info(f"Distfile {filename} ist unvollständig - Download wird fortgesetzt")
+                    stats['partial'].append(filename)
+                verified.pop(filename, None)
+                for entry in owners:
+                    refetch[entry.cpv] = entry
+        
+        # Verwaiste Einträge nicht ewig mitschleppen
+        present = {filename for _entry, filename, _uris, _manifest in distfiles}
+        cache['verified'] = {name: value for name, value in verified.items()
+                             if name in present or os.path.exists(os.path.join(distdir, name))}
+        self.state_cache.save('distfiles', cache)
+        
+        success = True
+        if refetch:
+            success, output = self.run_command(
+                ["emerge", "--fetchonly", "--nodeps", *[f"={cpv}" for cpv in refetch]],
+                f"Lade {len(refetch)} Paket(e) mit defekten Distfiles neu",
+                allow_fail=True,
+                capture_output=True
+            )
+            output.close()
+            if success:
+                stats['refetched'] = sorted(refetch)
+            else:
+                self.stats['warnings'].append("Defekte Distfiles konnten nicht neu geladen werden")
+        
+        stats['seconds'] = round(time.monotonic() - start, 1)
+        if pending:
+            self.logger.info(f"Distfile-Prüfung: {len(pending)} Datei(en) in {stats['seconds']}s, "
+                             f"{len(stats['corrupt'])} beschädigt, {len(stats['partial'])} unvollständig")
         return success
+    
+    def fetch_large_distfiles(self, entries: List[MergeEntry]):
+        """Lädt große Distfiles segmentiert von mehreren Mirrors (vor dem normalen Fetch)
+        
+        Nur Dateien ab segmented_fetch_min_mb, die noch nicht vollständig in DISTDIR liegen.
+        """
+        distdir = self.get_distdir()
+        min_size = int(self.config.get('segmented_fetch_min_mb', 64)) * 1024 ** 2
+        mirrors = self.mirror_scores.rank(self.stats.get('gentoo_mirrors') or DEFAULT_GERMAN_MIRRORS_DISTFILES)
+        
+        downloads = []
+        for _entry, filename, uris, manifest in self.list_distfiles(entries):
+            if manifest[0] < min_size:
+                continue
+            target = os.path.join(distdir, filename)
+            if os.path.exists(target) and os.path.getsize(target) == manifest[0]:
+                continue
+            urls = [distfile_mirror_url(mirror, filename) for mirror in mirrors] + uris
+            downloads.append((filename, list(dict.fromkeys(urls)), target, manifest))
+        
+        if not downloads:
+            return
+        
+        downloader = SegmentedDownloader(
+            connections=int(self.config.get('segmented_fetch_connections', 4)),
+            segment_size=int(self.config.get('segmented_fetch_segment_mb', 8)) * 1024 ** 2,
+            logger=self.logger
+        )
+        stats = self.stats.setdefault('segmented_fetch', {'files': 0, 'bytes': 0, 'seconds': 0.0,
+                                                           'retries': 0, 'failed': []})
+        for filename, urls, target, (size, digests) in downloads:
+            if self._prefetch_stop.is_set():
+                break
+            try:
+                result = downloader.fetch(urls, target, size, digests)
+            except (FetchError, OSError) as e:
+                self.logger.warning(f"Segmentierter Download von {filename} fehlgeschlagen: {e}")
+                stats['failed'].append(filename)
+                continue
+            stats['files'] += 1
+            stats['bytes'] += result['bytes']
+            stats['seconds'] = round(stats['seconds'] + result['seconds'], 1)
+            stats['retries'] += result['retries']
+            self.logger.info(f"{filename}: {result['bytes'] / 1024 ** 2:.1f} MiB in {result['seconds']}s "
+                             f"über {len(result['mirrors'])} Mirror")
+    
+    def _prefetch_worker(self, queue: List[MergeEntry]):
+        """Prefetch-Thread: lädt die Warteschlange gruppenweise und merkt sich die Fertigstellung"""
+        stats = self.stats['prefetch']
+        batch_size = max(1, int(self.config.get('prefetch_batch', 4)))
+        # Eigener Observer (Zustand pro Ausgabe-Stream), gemeinsames Scoreboard
+        observer = MirrorTransferObserver(self.mirror_scores, self.transfer_observer.mirrors)
+        start = time.monotonic()
+        
+        # Große Distfiles zuerst segmentiert von mehreren Mirrors - emerge --fetchonly
+        # findet sie danach vollständig vor und prüft sie nur noch
+        if self.config.get('segmented_fetch', False):
+            self.fetch_large_distfiles(queue)
+        
+        for index in range(0, len(queue), batch_size):
+            batch = queue[index:index + batch_size]
+            if self._prefetch_stop.is_set():
+                break
+            # Schlägt eine Gruppe fehl, werden ihre Pakete einzeln nachgeladen
+            if self._fetch_packages(batch, observer):
+                fetched = batch
+            else:
+                fetched = []
+                for entry in batch:
+                    if self._prefetch_stop.is_set():
+                        break
+                    if len(batch) > 1 and self._fetch_packages([entry], observer):
+                        fetched.append(entry)
+                    else:
+                        stats['failed'].append(entry.cpv)
+            
+            finished = time.time()
+            for entry in fetched:
+                self._prefetch_done[entry.cpv] = finished
+                stats['fetched'] += 1
+                stats['bytes'] += entry.download_size
+        
+        stats['seconds'] = round(time.monotonic() - start, 1)
+        self.logger.info(f"Prefetch beendet: {stats['fetched']}/{stats['packages']} Pakete in {stats['seconds']}s")
+    
+    def finish_prefetch(self):
+        """Beendet den Prefetch und berechnet, wie lange Builds auf Downloads gewartet haben
+        
+        Wartezeit eines Pakets: Zeit zwischen Build-Start (emerge.log) und dem Ende
+        seines Prefetch, falls der Build früher begann.
+        """
+        if self._prefetch_thread is None:
+            return
+        
+        # Was jetzt noch fehlt, hat emerge bereits selbst geladen
+        with self._prefetch_lock:
+            self._prefetch_stop.set()
+            process = self._prefetch_process
+        if process is not None:
+            self.terminate_process_group(process)
+        self._prefetch_thread.join(timeout=30)
+        self._prefetch_thread = None
+        
+        history = self.get_history()
+        if history and self._prefetch_done:
+            rows = history.conn.execute(
+                "SELECT cpv, MIN(started) FROM builds WHERE started >= ? GROUP BY cpv",
+                (int(self._prefetch_started),)
+            ).fetchall()
+            self.stats['prefetch']['build_wait_seconds'] = round(sum(
+                max(0.0, self._prefetch_done[cpv] - started)
+                for cpv, started in rows if cpv in self._prefetch_done
+            ), 1)
+    
+    def get_binhosts(self) -> List[str]:
+        """Binhost-URLs aus Config/--binhost, sonst PORTAGE_BINHOST aus portageq"""
+        configured = self.config.get('binhost', '')
+        if configured:
+            return configured.split()
+        try:
+            result = subprocess.run(["portageq", "envvar", "PORTAGE_BINHOST"],
+                                    capture_output=True, text=True, timeout=30)
+            return result.stdout.split() if result.returncode == 0 else []
+        except (OSError, subprocess.TimeoutExpired):
+            return []
+    
+    def check_binhost(self, plan: MergePlan) -> bool:
+        """Prüft vor dem Kompilieren, welche ausstehenden Updates als Binärpaket verfügbar sind
+        
+        Lädt die Packages-Indizes der Binhosts (lokal zwischengespeichert) und sucht
+        jedes zu bauende Ebuild nach CPV und USE-Flags. Trefferquote und geschätzte
+        eingesparte Kompilierzeit landen in stats['binhost'].
+        
+        Returns:
+            True wenn ein Binhost konfiguriert ist (emerge läuft dann mit --getbinpkg)
+        """
+        urls = self.get_binhosts()
+        if not urls:
+            return False
+        if self.config.get('binhost', ''):
+            self.emerge_env['PORTAGE_BINHOST'] = ' '.join(urls)
+        
+        indexes = []
+        for url in urls:
+            cache_path = self.state_cache.cache_dir / f"binhost-{hashlib.sha1(url.encode()).hexdigest()[:12]}.Packages"
+            text = fetch_binhost_index(url, cache_path)
+            if text is not None:
+                indexes.append(BinhostIndex.parse(text))
+        
+        pending = [entry for entry in plan.merges if entry.merge_type == 'ebuild']
+        estimator = self.get_estimator()
+        hits = [entry for entry in pending
+                if any(index.lookup(entry.cpv, entry.use_flags, entry.use_expand) for index in indexes)]
+        saved = sum(estimator.duration(entry)[0] for entry in hits)
+        self.stats['binhost'] = {
+            'urls': urls,
+            'index_packages': sum(len(index) for index in indexes),
+            'pending': len(pending),
+            'hits': len(hits),
+            'hit_rate': round(len(hits) / len(pending), 3) if pending else 0.0,
+            'saved_seconds': round(saved, 1),
+            'binary': [entry.cpv for entry in hits]
+        }
+        
+        if not indexes:
+            self.print_warning(f"Binhost-Index nicht verfügbar ({', '.join(urls)}) - emerge fragt den Binhost selbst")
+        elif pending:
+            self.print_info(f"Binhost: {len(hits)}/{len(pending)} Paket(e) als Binärpaket verfügbar, "
+                            f"ca. {format_duration(saved)} Kompilierzeit gespart")
+        return True
+    
+    def get_pkgdir(self) -> str:
+        """PKGDIR aus portageq (Standard /var/cache/binpkgs)"""
+        try:
+            result = subprocess.run(["portageq", "pkgdir"], capture_output=True, text=True, timeout=30)
+            if result.returncode == 0 and result.stdout.strip():
+                return result.stdout.strip()
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        return '/var/cache/binpkgs'
+    
+    def get_fleet_key(self) -> Optional[bytes]:
+        """Liest den gemeinsamen HMAC-Schlüssel (ohne Schlüssel kein Fleet-Modus)"""
+        key_file = self.config.get('fleet_key_file', '/etc/gentoo-updater.key')
+        try:
+            key = Path(key_file).read_bytes().strip()
+        except OSError as e:
+            self.print_error(f"Fleet-Schlüssel {key_file} nicht lesbar: {e}")
+            return None
+        if not key:
+            self.print_error(f"Fleet-Schlüssel {key_file} ist leer")
+            return None
+        return key
+    
+    def publish_fleet_plan(self, plan: MergePlan) -> bool:
+        """Builder: veröffentlicht PKGDIR und den signierten Plan für die Consumer
+        
+        Args:
+            plan: Vor dem Update aufgelöster Merge-Plan (die gebauten Pakete)
+        
+        Returns:
+            True wenn plan.json, Signatur und Binärpakete veröffentlicht wurden
+        """
+        self.print_section("Fleet: Veröffentliche Binärpakete")
+        fleet_dir = Path(self.config.get('fleet_dir', '/var/www/gentoo-fleet'))
+        if self.dry_run:
+            self.print_warning(_('DRY_RUN_MSG', cmd=f"publish {self.get_pkgdir()} -> {fleet_dir}"))
+            return True
+        key = self.get_fleet_key()
+        if key is None:
+            return False
+        
+        try:
+            copied = sync_directory(self.get_pkgdir(), str(fleet_dir / FLEET_PACKAGES))
+            
+            # Prüfsummen des veröffentlichten Index und jedes Binärpakets in den signierten Plan
+            index_path = fleet_dir / FLEET_PACKAGES / 'Packages'
+            index = BinhostIndex.parse(index_path.read_text(errors='replace'))
+            packages = []
+            missing = []
+            for entry in plan.merges:
+                if entry.merge_type not in ('ebuild', 'binary'):
+                    continue
+                build = index.lookup(entry.cpv, entry.use_flags, entry.use_expand)
+                path = fleet_dir / FLEET_PACKAGES / binpkg_path(build) if build else None
+                if path is None or not path.is_file():
+                    missing.append(entry.cpv)
+                    continue
+                packages.append({'cpv': entry.cpv, 'use': list(entry.use_flags), 'path': binpkg_path(build),
+                                 'size': path.stat().st_size, 'sha256': file_sha256(str(path))})
+            data = json.dumps({
+                'version': 2,
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'timestamp': int(time.time()),
+                'builder': socket.gethostname(),
+                'profile': current_profile(),
+                'packages_sha256': file_sha256(str(index_path)),
+                'packages': packages
+            }, indent=2).encode()
+            
+            for name, content in ((FLEET_SIGNATURE, sign_fleet_plan(data, key).encode()), (FLEET_PLAN, data)):
+                tmp_path = fleet_dir / f"{name}.tmp"
+                tmp_path.write_bytes(content)
+                os.replace(tmp_path, fleet_dir / name)
+        except OSError as e:
+            self.print_error(f"Fleet-Veröffentlichung nach {fleet_dir} fehlgeschlagen: {e}")
+            return False
+        
+        for cpv in missing:
+            self.print_warning(f"Kein Binärpaket für {cpv} in PKGDIR - nicht im Fleet-Plan")
+        self.stats['fleet'] = {'role': 'builder', 'packages': len(packages), 'missing': missing,
+                               'copied_files': copied, 'published': str(fleet_dir)}
+        self.print_success(f"Fleet-Plan mit {len(packages)} Paket(en) veröffentlicht "
+                           f"({copied} Datei(en) nach {fleet_dir} kopiert)")
+        return True
+    
+    def fetch_fleet_plan(self) -> Optional[Dict]:
+        """Consumer: lädt plan.json, prüft Signatur, Alter und Profil
+        
+        Returns:
+            Plan-Dict oder None (dann wird normal aus den Quellen gebaut)
+        """
+        url = self.config.get('fleet_url', '').rstrip('/')
+        if not url:
+            self.print_warning("Consumer-Modus ohne fleet_url - baue aus den Quellen")
+            return None
+        key = self.get_fleet_key()
+        if key is None:
+            return None
+        
+        try:
+            with urllib.request.urlopen(f"{url}/{FLEET_PLAN}", timeout=30) as response:
+                data = response.read()
+            with urllib.request.urlopen(f"{url}/{FLEET_SIGNATURE}", timeout=30) as response:
+                signature = response.read().decode().strip()
+        except (OSError, ValueError) as e:
+            self.print_warning(f"Fleet-Plan von {url} nicht abrufbar: {e}")
+            return None
+        
+        if not hmac.compare_digest(sign_fleet_plan(data, key), signature):
+            self.print_error("Signatur des Fleet-Plans ungültig - Plan wird verworfen")
+            return None
+        try:
+            plan = json.loads(data)
+        except ValueError as e:
+            self.print_warning(f"Fleet-Plan nicht lesbar: {e}")
+            return None
+        
+        age = time.time() - plan.get('timestamp', 0)
+        if age > self.config.get('fleet_max_age', 604800):
+            self.print_warning(f"Fleet-Plan von {plan.get('created', '?')} ist zu alt - baue aus den Quellen")
+            return None
+        if plan.get('profile') != current_profile():
+            self.print_warning(f"Profil des Builders ({plan.get('profile')}) weicht ab - baue aus den Quellen")
+            return None
+        return plan
+    
+    def install_fleet_plan(self) -> bool:
+        """Consumer: installiert die vom Builder gebauten Pakete mit --usepkgonly
         
-    def check_updates(self) -> Tuple[bool, str]:
-        """Prüft ob Updates verfügbar sind"""
-        self.print_section("SCHRITT 3: Prüfe verfügbare Updates")
+        Nur Pakete, die im signierten Plan stehen und deren Binärpaket zu den lokalen
+        USE-Flags passt, werden als exakte Atome installiert. Packages-Index und
+        Binärpakete werden vorher gegen die Prüfsummen im signierten Plan geprüft und
+        aus einem lokalen PKGDIR installiert - emerge lädt selbst nichts vom Share.
+        Alles andere (Abweichungen) baut das anschließende normale Update aus den Quellen.
         
-        # Prüfe blockierte Pakete
-        auto_resolve = self.config.get('resolve_blocks', False)
-        if not self.check_blocked_packages(auto_resolve=auto_resolve):
-            sys.exit(1)
+        Returns:
+            True wenn Binärpakete installiert wurden
+        """
+        self.print_section("Fleet: Installiere Binärpakete des Builders")
+        self._fleet_checked = True
+        plan = self.fetch_fleet_plan()
+        if plan is None:
+            return False
         
-        try:
-            result = subprocess.run(
-                ["emerge", "--update", "--deep", "--newuse", 
-                 "--pretend", "@world"],
-                capture_output=True,
-                text=True
-            )
-            
-            if "Total: 0 packages" in result.stdout:
-                self.print_success(_('NO_UPDATES'))
-                return False, ""
+        binhost = f"{self.config.get('fleet_url').rstrip('/')}/{FLEET_PACKAGES}"
+        pkgdir = self.state_cache.cache_dir / 'fleet-packages'
+        index_path = pkgdir / 'Packages'
+        text = fetch_binhost_index(binhost, index_path)
+        if text is None or file_sha256(str(index_path)) != plan.get('packages_sha256'):
+            self.print_error("Packages-Index des Builders passt nicht zum signierten Plan - baue aus den Quellen")
+            return False
+        index = BinhostIndex.parse(text)
+        
+        planned = {package['cpv']: package for package in plan.get('packages', [])}
+        binary = []
+        mismatches = []
+        for entry in self.resolve_world().plan.merges:
+            if entry.merge_type != 'ebuild':
+                continue
+            package = planned.get(entry.cpv)
+            build = index.lookup(entry.cpv, entry.use_flags, entry.use_expand) if package else None
+            if build is None or binpkg_path(build) != package['path']:
+                mismatches.append(entry.cpv)
+            elif download_verified(f"{binhost}/{package['path']}", str(pkgdir / package['path']),
+                                   package['size'], package['sha256']):
+                binary.append(entry.cpv)
             else:
-                self.print_info(_('UPDATES_AVAILABLE'))
-                print(result.stdout)
-                
-                # Prüfe auf kritische Updates
-                self.detect_critical_updates(result.stdout)
-                
-                # Extrahiere Paket-Liste
-                self.extract_package_list(result.stdout, 'update')
-                
-                return True, result.stdout
-                
-        except Exception as e:
-            self.print_error(f"Fehler beim Prüfen der Updates: {str(e)}")
-            return False, ""
+                self.print_warning(f"Binärpaket {package['path']} passt nicht zum signierten Plan - "
+                                   f"baue {entry.cpv} aus den Quellen")
+                mismatches.append(entry.cpv)
+        
+        self.stats['fleet'] = {'role': 'consumer', 'builder': plan.get('builder'),
+                               'plan_created': plan.get('created'), 'binary': len(binary),
+                               'source': mismatches, 'installed': False}
+        self.print_info(f"Fleet-Plan von {plan.get('builder', '?')} ({plan.get('created', '?')}): "
+                        f"{len(binary)} Binärpaket(e), {len(mismatches)} Abweichung(en) aus den Quellen")
+        for cpv in mismatches[:5]:
+            self.print_info(f"  {symbol('skip')} aus den Quellen: {cpv}")
+        if not binary:
+            return False
+        
+        jobs = self.config.get_emerge_jobs()
+        success, output = self.run_command(
+            ["emerge", "--oneshot", "--usepkgonly", f"--jobs={jobs}",
+             *[f"={cpv}" for cpv in binary]],
+            f"Installiere {len(binary)} Binärpaket(e) des Builders",
+            allow_fail=True,
+            custom_env={'PKGDIR': str(pkgdir)}
+        )
+        output.close()
+        self.stats['fleet']['installed'] = success
+        if not success:
+            self.print_warning("Installation der Binärpakete fehlgeschlagen - normales Update übernimmt")
+        # Die installierten Pakete verändern den Merge-Plan
+        self.invalidate_resolution()
+        return success
     
-    def extract_package_list(self, output: str, operation: str):
-        """Extrahiert Paket-Namen aus emerge-Output und markiert kritische Pakete"""
-        pattern = r'\[ebuild.*?\]\s+([^\s]+)'
-        packages = re.findall(pattern, output)
-        critical_packages = self.config.get('critical_packages', [])
+    def extract_package_list(self, entries: List[MergeEntry], operation: str):
+        """Übernimmt Pakete aus der geparsten Mergeliste und markiert kritische Pakete"""
+        critical_packages = set(self.config.get('critical_packages', []))
         
         if operation == 'update':
-            self.stats['packages_updated'].extend(packages)
+            merges = list({entry.cpv: entry for entry in entries if entry.is_merge}.values())
+            self.stats['packages_updated'].extend(entry.cpv for entry in merges)
             # Markiere kritische Pakete die aktualisiert werden
-            for pkg in packages:
-                for crit_pkg in critical_packages:
-                    if crit_pkg in pkg:
-                        if not hasattr(self.stats, 'critical_packages_in_update'):
-                            self.stats['critical_packages_in_update'] = []
-                        self.stats['critical_packages_in_update'].append(pkg)
-                        break
+            critical_in_update = [entry.cpv for entry in merges if entry.cp in critical_packages]
+            if critical_in_update:
+                self.stats.setdefault('critical_packages_in_update', []).extend(critical_in_update)
         elif operation == 'remove':
-            self.stats['packages_removed'].extend(packages)
+            self.stats['packages_removed'].extend(
+                entry.cpv for entry in entries if entry.merge_type == 'uninstall'
+            )
 
-    def detect_dependency_conflicts(self, output: str) -> List[Dict[str, str]]:
+    def run_emerge(self, command: List[str], description: str,
+                   abort_predicates: Optional[List] = None) -> Tuple[bool, DiagnosticsReport]:
+        """Führt emerge aus und klassifiziert die Ausgabe während sie läuft
+        
+        Scheitert der Resolver sicher (autounmask nötig, unauflösbare Blocker), wird
+        emerge sofort beendet statt das restliche Backtracking abzuwarten.
+        
+        Args:
+            command: emerge-Befehl
+            description: Beschreibung für die Ausgabe
+            abort_predicates: Weitere Abbruch-Prädikate (z.B. DeadlineGuard)
+        
+        Returns:
+            Tuple (success, report): Erfolg und DiagnosticsReport des Laufs
+        """
+        diagnostics = EmergeDiagnostics()
+        abort_predicates = ([diagnostics.resolver_failure] if self.config.get('early_abort', True) else []) \
+            + list(abort_predicates or [])
+        start = time.monotonic()
+        success, output = self.run_command(command, description, allow_fail=True, observers=[diagnostics],
+                                           abort_predicates=abort_predicates)
+        output.close()
+        report = diagnostics.report
+        # Ohne Merge-Zeile hat der Lauf nur aufgelöst (oder ist dabei gescheitert)
+        if report.resolve_seconds is None:
+            report.resolve_seconds = round(time.monotonic() - start, 1)
+        
+        if not success and not self.dry_run:
+            self.stats['diagnostics'] = report.to_dict()
+            for package, build_log in report.failed.items():
+                self.print_error(f"{package} fehlgeschlagen" + (f" - Build-Log: {build_log}" if build_log else ""))
+            if report.fetch_failures:
+                self.print_warning(f"Download fehlgeschlagen: {', '.join(report.fetch_failures[:5])}")
+        return success, report
+    
+    def detect_dependency_conflicts(self, output: OutputCapture) -> List[Dict[str, str]]:
         """Erkennt Dependency-Konflikte aus emerge-Ausgabe
         
         Returns:
             Liste von Konflikten mit 'package' und 'conflict' Keys
         """
-        conflicts = []
-        
-        if not output or "conflicts with" not in output.lower():
-            return conflicts
-        
-        # Parses Konflikte wie: "X conflicts with Y"
-        lines = output.split('\n')
-        for line in lines:
-            if 'conflicts with' in line.lower():
-                conflicts.append({
-                    'package': line.strip(),
-                    'conflict': 'dependency_conflict'
-                })
-        
-        return conflicts
+        return [{'package': line, 'conflict': 'dependency_conflict'}
+                for line in EmergeDiagnostics.scan(output).conflicts]
     
-    def detect_ignored_binary_packages(self, output: str) -> List[Dict[str, str]]:
+    def detect_ignored_binary_packages(self, output: OutputCapture) -> List[Dict[str, str]]:
         """Erkennt ignorierte Binary-Packages aufgrund von USE-Flag Mismatches
         
         Returns:
             Liste von ignorierte Paketen
         """
-        ignored = []
-        
-        if not output or "following binary packages have been ignored" not in output.lower():
-            return ignored
-        
-        in_ignored_section = False
-        for line in output.split('\n'):
-            if 'following binary packages have been ignored' in line.lower():
-                in_ignored_section = True
-                continue
-            elif in_ignored_section:
-                if line.strip().startswith('=') or line.strip() == '':
-                    continue
-                elif any(x in line for x in ['WARNING:', 'NOTE:', '!!! ', '>>>']):
-                    break
-                elif line.strip():
-                    ignored.append({
-                        'package': line.strip(),
-                        'reason': 'use_mismatch'
-                    })
-        
-        return ignored
+        return [{'package': package, 'reason': 'use_mismatch'}
+                for package in EmergeDiagnostics.scan(output).ignored_binpkgs]
     
-    def detect_skipped_updates(self, output: str) -> List[str]:
+    def detect_skipped_updates(self, output: OutputCapture) -> List[str]:
         """Erkennt übersprungene Updates aufgrund von Konflikten
         
         Returns:
             Liste von übersprungenen Paketen
         """
-        skipped = []
-        
-        if "updates/rebuilds have been skipped" not in output.lower():
-            return skipped
-        
-        lines = output.split('\n')
-        for i, line in enumerate(lines):
-            if "updates/rebuilds have been skipped" in line.lower():
-                # Nächste Zeilen analysieren bis eine neue Sektion kommt
-                for j in range(i + 1, min(i + 20, len(lines))):
-                    if lines[j].strip().startswith('(') and '::' in lines[j]:
-                        # Paket-Zeile gefunden
-                        pkg_match = re.search(r'\(([^,]+),', lines[j])
-                        if pkg_match:
-                            skipped.append(pkg_match.group(1).strip())
-        
-        return skipped
+        return EmergeDiagnostics.scan(output).skipped_updates
 
-    def requires_autounmask_recovery(self, output: str) -> bool:
+    def requires_autounmask_recovery(self, output: OutputCapture) -> bool:
         """Prüft, ob emerge wegen notwendiger autounmask-Änderungen abgebrochen ist"""
-        if not output:
-            return False
-
-        output_lower = output.lower()
-        indicators = [
-            "use --autounmask-write to write changes to config files",
-            "the following use changes are necessary to proceed",
-            "autounmask change(s)",
-            "no ebuilds built with use flags to satisfy"
-        ]
-        return any(indicator in output_lower for indicator in indicators)
+        return EmergeDiagnostics.scan(output).autounmask
 
     def apply_autounmask_and_update_configs(self, base_emerge_cmd: List[str]) -> bool:
         """Führt autounmask-write aus und merged Konfigurationsänderungen automatisch"""
@@ -1516,11 +4997,12 @@ class GentooUpdater:
         ]
         autounmask_cmd = [base_emerge_cmd[0], *autounmask_flags, *base_emerge_cmd[1:]]
 
-        success, _ = self.run_command(
+        success, output = self.run_command(
             autounmask_cmd,
             "Wende autounmask-Änderungen automatisch an",
             allow_fail=True
         )
+        output.close()
         if not success:
             self.print_warning("Autounmask-Änderungen konnten nicht automatisch geschrieben werden")
             return False
@@ -1536,15 +5018,19 @@ class GentooUpdater:
             self.print_warning("Weder etc-update noch dispatch-conf gefunden - automatische Recovery nicht möglich")
             return False
 
-        success, _ = self.run_command(
+        success, output = self.run_command(
             merge_cmd,
             merge_desc,
             allow_fail=True
         )
+        output.close()
         if not success:
             self.print_warning("Konfigurations-Merge nach autounmask fehlgeschlagen")
             return False
 
+        # /etc/portage wurde geändert - gecachtes Resolver-Ergebnis ist veraltet
+        self.invalidate_resolution()
+        
         self.print_success("Autounmask-Recovery erfolgreich abgeschlossen")
         return True
             
@@ -1556,24 +5042,46 @@ class GentooUpdater:
         """
         self.print_section("SCHRITT 4: System-Update")
         
+        # Consumer: zuerst die Binärpakete des Builders, danach nur noch Abweichungen
+        if self.config.get('fleet_role', '') == 'consumer' and not self._fleet_checked:
+            self.install_fleet_plan()
+        
         # Prüfe welche Pakete aktualisiert werden (mit --pretend)
         self.print_info(_('MODULE_ANALYSIS'))
         try:
-            result = subprocess.run(
-                ["emerge", "--update", "--deep", "--newuse", 
-                 "--with-bdeps=y", "--pretend", "@world"],
-                capture_output=True,
-                text=True
+            result = self.resolve_world()
+            kernel_updated = any(
+                entry.category == 'sys-kernel' and entry.package.endswith('-sources')
+                for entry in result.plan.merges
             )
-            kernel_updated = "sys-kernel/" in result.stdout and "-sources" in result.stdout
             if kernel_updated:
                 self.print_warning(_('KERNEL_UPDATE_DETECTED'))
                 self.stats['kernel_updated'] = True
         except:
             kernel_updated = False
         
+        # Merge-Graph: begrenzt --jobs auf die tatsächlich erreichbare Parallelität
+        max_parallelism = None
+        graph = None
+        if self._resolution is not None and self._resolution.plan.merges:
+            graph = self._resolution.plan.graph()
+            path, _length = graph.critical_path()
+            max_parallelism = graph.max_parallelism
+            self.stats['plan_graph'] = {
+                'packages': len(graph.nodes),
+                'layers': len(graph.layers()),
+                'max_parallelism': max_parallelism,
+                'critical_path': path
+            }
+            self.logger.info(f"Merge-Graph: {len(graph.nodes)} Pakete, max. Parallelität {max_parallelism}, "
+                             f"kritischer Pfad {len(path)} Pakete")
+            if graph.cyclic:
+                self.print_warning(f"Zyklus im Merge-Graphen: {len(graph.cyclic)} Paket(e) in Plan-Reihenfolge "
+                                   f"eingeordnet ({', '.join(graph.cyclic[:3])})")
+                self.stats['plan_graph']['cyclic'] = graph.cyclic
+        
         # Baue emerge-Befehl mit Performance-Optimierungen
-        jobs = self.config.get_emerge_jobs()
+        jobs = self.config.get_emerge_jobs(max_parallelism)
         load_avg = self.config.get_load_average()
         resolve_blocks = self.config.get('resolve_blocks', False)
         backtrack_level = self.config.get('backtrack_level', 20)
@@ -1586,101 +5094,536 @@ class GentooUpdater:
             f"--load-average={load_avg}",
         ]
         
-        # Füge --backtrack hinzu, wenn blockierte Pakete automatisch gelöst werden sollen
+        # Backtrack-Stufe: aus der Historie gelernt (--backtrack legt sie fest);
+        # --resolve-blocks hebt sie mindestens auf backtrack_level
+        backtrack_history = BacktrackHistory(self.state_cache, self.config.get('backtrack_memory_days', 14))
+        if self.config.get('adaptive_backtrack', True):
+            backtrack_level, reason = backtrack_history.choose(backtrack_level,
+                                                               backtrack_level if resolve_blocks else 0)
+            source = 'history'
+        else:
+            reason = "fest vorgegeben"
+            source = 'fixed'
+        emerge_cmd.append(f"--backtrack={backtrack_level}")
+        self.stats['backtrack'] = {'level': backtrack_level, 'source': source, 'reason': reason,
+                                   'attempts': backtrack_history.recorded}
         if resolve_blocks:
-            emerge_cmd.append(f"--backtrack={backtrack_level}")
             self.print_info(f"Backtracking aktiviert mit Level {backtrack_level} wegen blockierter Pakete")
+        else:
+            self.print_info(f"Backtrack-Level {backtrack_level} ({reason})")
+        
+        # Binhost: Verfügbarkeit vorab aus dem Packages-Index, dann mit --getbinpkg bauen
+        binpkg_opts = []
+        if 'binhost' in self.stats or (self._resolution is not None and self.check_binhost(self._resolution.plan)):
+            binpkg_opts = ["--getbinpkg"]
+        # Builder: jedes gebaute Paket als Binärpaket für die Consumer ablegen
+        if self.config.get('fleet_role', '') == 'builder':
+            binpkg_opts.append("--buildpkg")
+        emerge_cmd.extend(binpkg_opts)
         
         emerge_cmd.append("@world")
         
         self.print_info(_('PERFORMANCE_INFO', jobs=jobs, load=load_avg))
         
-        # Führe das eigentliche Update durch
-        success, output = self.run_command(
-            emerge_cmd,
-            "Aktualisiere System-Pakete",
-            allow_fail=True
-        )
-
+        try:
+            return self.run_update_plan(emerge_cmd, graph, jobs, backtrack_history, kernel_updated)
+        finally:
+            if not self.dry_run:
+                backtrack_history.save()
+    
+    def run_update_plan(self, emerge_cmd: List[str], graph: Optional[DependencyGraph], jobs: int,
+                        backtrack_history: 'BacktrackHistory', kernel_updated: bool) -> Tuple[bool, bool]:
+        """Führt das Update aus: nach Deadline geplant, in Batches oder als ein @world-Lauf
+        
+        Jeder emerge-Lauf geht durch emerge_with_recovery(); mit Deadline hält eine
+        DeadlineGuard den Lauf an, bevor ein Paket startet, das nicht mehr rechtzeitig
+        fertig wird.
+        
+        Returns:
+            Tuple (success, kernel_updated)
+        """
+        durations = None
+        if graph is not None and (self.deadline is not None or self.max_packages):
+            estimator = self.get_estimator()
+            durations = {cpv: estimator.duration(entry)[0] for cpv, entry in graph.nodes.items()}
+        guard = DeadlineGuard(self.deadline, durations) if self.deadline is not None else None
+        
+        # Deadline/Wartungsfenster: nur so viel einplanen, wie rechtzeitig fertig wird
+        if self.deadline is not None and graph is not None:
+            selected = self.schedule_for_deadline(graph, durations, jobs)
+            deferred = self.stats['schedule']['deferred']
+            self.print_info(f"{symbol('clock')} Deadline {datetime.fromtimestamp(self.deadline).strftime('%H:%M')}: "
+                            f"{len(selected)} von {len(graph.nodes)} Paketen eingeplant")
+            
+            if deferred:
+                for cpv in deferred[:5]:
+                    self.print_info(f"  {symbol('skip')} verschoben: {cpv}")
+                if not selected:
+                    self.print_warning("Kein Paket passt in das verbleibende Zeitfenster")
+                    return True, False
+                
+                # Batch-Größe nach Zeit: wenige lange Batches, damit der Resolver pro
+                # emerge-Aufruf nur einen kleinen Teil des Fensters kostet
+                subgraph = graph.subgraph(selected)
+                budget = self.stats['schedule']['budget_seconds']
+                resolver = self.stats['resolver']
+                resolver_seconds = resolver['seconds'] / resolver['runs'] if resolver['runs'] else 0.0
+                batch_seconds = max(budget / max(1, int(self.config.get('deadline_batches', 4))),
+                                    20 * resolver_seconds)
+                batches = subgraph.timed_batches(durations, jobs, batch_seconds)
+                if self.max_packages:
+                    batches = [batch[index:index + self.max_packages]
+                               for batch in batches for index in range(0, len(batch), self.max_packages)]
+                success, complete = self.run_batched_update(emerge_cmd[:-1], subgraph, batches,
+                                                            backtrack_history, durations, guard)
+                kernel_updated = kernel_updated and any(
+                    graph.nodes[cpv].category == 'sys-kernel' for cpv in selected
+                )
+                
+                # Finaler @world-Lauf ohne die verschobenen Pakete: holt nach, was der
+                # --tree-Graph nicht erfasst hat. Verschobenes folgt im nächsten Fenster.
+                if not success or not complete or time.time() >= self.deadline:
+                    return success, kernel_updated
+                self.print_info("Starte finalen @world-Lauf (ohne verschobene Pakete)...")
+                excluded = sorted({graph.nodes[cpv].cp for cpv in deferred}
+                                  - {graph.nodes[cpv].cp for cpv in selected})
+                final_cmd = emerge_cmd[:-1] + [f"--exclude={cp}" for cp in excluded] + ["@world"]
+                success, _report = self.emerge_with_recovery(
+                    final_cmd, "Aktualisiere System-Pakete (finaler Lauf)", backtrack_history, guard
+                )
+                return success or guard.stopped_at is not None, kernel_updated
+        
+        # --max-packages: Batches in Build-Reihenfolge, danach finaler @world-Lauf für Übersehenes
+        if self.max_packages and graph is not None and len(graph.nodes) > self.max_packages:
+            self.print_info(_('PACKAGE_LIMIT', max=self.max_packages))
+            success, complete = self.run_batched_update(
+                emerge_cmd[:-1], graph, graph.batches(self.max_packages), backtrack_history, durations, guard
+            )
+            if not success or not complete:
+                return success, kernel_updated
+            self.print_info("Starte finalen @world-Lauf...")
+        
+        # Führe das eigentliche Update durch - auch wenn alles ins Fenster passt, wacht
+        # die DeadlineGuard über den Lauf
+        success, _report = self.emerge_with_recovery(emerge_cmd, "Aktualisiere System-Pakete",
+                                                     backtrack_history, guard)
+        if guard is not None and guard.stopped_at is not None:
+            return True, kernel_updated
+        return success, kernel_updated
+    
+    def emerge_with_recovery(self, command: List[str], description: str,
+                             backtrack_history: 'BacktrackHistory',
+                             guard: Optional[DeadlineGuard] = None) -> Tuple[bool, DiagnosticsReport]:
+        """Führt emerge mit der vollständigen Recovery-Kette aus (@world-Lauf wie Batch)
+        
+        Diagnose und früher Abbruch über run_emerge(), Vermerk in der Backtrack-Historie,
+        autounmask-Recovery und das Rennen der Recovery-Strategien bei Konflikten. Hat
+        die DeadlineGuard den Lauf angehalten, folgt kein weiterer Versuch.
+        
+        Args:
+            command: emerge-Befehl mit Zielen (@world oder =atom...)
+            description: Beschreibung für die Ausgabe
+            backtrack_history: Historie, in der jeder Versuch vermerkt wird
+            guard: Deadline-Wache als zusätzliches Abbruch-Prädikat
+        
+        Returns:
+            Tuple (success, report) des letzten Versuchs
+        """
+        predicates = [guard] if guard is not None else None
+        
+        def stopped() -> bool:
+            if guard is not None and guard.stopped_at is not None:
+                self.stats.setdefault('schedule', {})['stopped_at'] = guard.stopped_at
+                return True
+            return False
+        
+        success, report = self.run_emerge(command, description, predicates)
+        self.record_backtrack_attempt(backtrack_history, command, success, report, 'update')
+        if success or stopped():
+            return success, report
+        
         # Wenn notwendige USE/Config-Änderungen fehlen: automatisch anwenden und einmal neu versuchen
-        if not success and self.auto_autounmask and self.requires_autounmask_recovery(output):
-            recovered = self.apply_autounmask_and_update_configs(emerge_cmd)
+        if self.auto_autounmask and report.autounmask:
+            recovered = self.apply_autounmask_and_update_configs(command)
             if recovered:
                 self.print_info("Starte emerge nach automatischer autounmask-Recovery erneut...")
-                success, output = self.run_command(
-                    emerge_cmd,
-                    "Aktualisiere System-Pakete (Retry nach autounmask)",
-                    allow_fail=True
-                )
-        elif not success and self.requires_autounmask_recovery(output):
+                success, report = self.run_emerge(command, f"{description} (Retry nach autounmask)", predicates)
+                if success or stopped():
+                    return success, report
+        elif report.autounmask:
             self.print_warning("Autounmask-Recovery erkannt, aber deaktiviert (--no-auto-autounmask)")
         
         # Handhabe Dependency-Konflikte und ignorierte Binary-Packages
-        if not success:
-            conflicts = self.detect_dependency_conflicts(output)
-            ignored_binpkgs = self.detect_ignored_binary_packages(output)
-            skipped_updates = self.detect_skipped_updates(output)
-            
-            if conflicts:
-                self.print_warning(f"Dependency-Konflikte erkannt ({len(conflicts)})")
-                for conflict_info in conflicts:
-                    self.print_warning(f"  {conflict_info['package']}")
+        conflicts = report.conflicts
+        ignored_binpkgs = report.ignored_binpkgs
+        skipped_updates = report.skipped_updates
+        
+        if conflicts or report.blocked:
+            self.print_warning(f"Dependency-Konflikte erkannt ({len(conflicts)})")
+            for conflict in conflicts:
+                self.print_warning(f"  {conflict}")
+        
+        if ignored_binpkgs:
+            self.print_warning(f"Binary-Packages mit USE-Mismatch ignoriert ({len(ignored_binpkgs)})")
+            for package in ignored_binpkgs[:5]:  # Nur erste 5 ausgeben
+                self.print_warning(f"  {package}")
+        
+        if skipped_updates:
+            self.print_warning(f"Updates übersprungen aufgrund von Konflikten ({len(skipped_updates)})")
+            for pkg in skipped_updates[:5]:  # Nur erste 5 ausgeben
+                self.print_warning(f"  {pkg}")
+        
+        # Resolver-Fehler: alle Strategien parallel als --pretend testen, nur die
+        # günstigste auflösbare läuft danach wirklich
+        if conflicts or report.blocked or ignored_binpkgs or skipped_updates:
+            winner = self.race_recovery_strategies(command, backtrack_history)
+            if winner is not None:
+                name, retry_cmd = winner
+                success, report = self.run_emerge(retry_cmd, f"{description} (Retry mit {name})", predicates)
+                self.record_backtrack_attempt(backtrack_history, retry_cmd, success, report, name)
+                stopped()
+        
+        return success, report
+        
+    def record_backtrack_attempt(self, history: 'BacktrackHistory', command: List[str],
+                                 success: bool, report: DiagnosticsReport, strategy: str):
+        """Vermerkt, ob der Resolver auf der Stufe des Befehls aufgelöst hat
+        
+        Aufgelöst heißt: Builds haben begonnen oder der Lauf war erfolgreich. Nur
+        Konflikte, Blocker und übersprungene Updates zählen als Scheitern der Stufe -
+        autounmask-Bedarf oder Build-Fehler sagen nichts über das Backtracking aus.
+        """
+        if self.dry_run:
+            return
+        pure = '--binpkg-respect-use=n' not in command
+        if success or report.merging:
+            history.record(backtrack_of(command), True, report.resolve_seconds, strategy, pure)
+        elif report.conflicts or report.blocked or report.skipped_updates:
+            history.record(backtrack_of(command), False, report.resolve_seconds, strategy, pure)
+    
+    def race_recovery_strategies(self, emerge_cmd: List[str],
+                                 history: Optional['BacktrackHistory'] = None) -> Optional[Tuple[str, List[str]]]:
+        """Testet die Recovery-Strategien gleichzeitig als emerge --pretend
+        
+        Die Anzahl paralleler Proben ist durch CPU-Kerne und MemAvailable begrenzt
+        (recovery_probe_mb je Probe). Gewinner ist die günstigste Strategie, die
+        auflöst, sobald alle günstigeren gescheitert sind; übrige Proben werden beendet.
+        
+        Args:
+            emerge_cmd: Fehlgeschlagener emerge-Befehl (mit @world)
+            history: Backtrack-Historie, in der die Proben vermerkt werden
+        
+        Returns:
+            Tuple (name, command) der Gewinner-Strategie oder None
+        """
+        level = backtrack_of(emerge_cmd)
+        candidates = [(name, strategy_command(emerge_cmd, options))
+                      for name, options in recovery_strategies(level)]
+        if self.dry_run:
+            name, command = candidates[0]
+            self.print_warning(_('DRY_RUN_MSG', cmd=' '.join(command + ["--pretend"])))
+            return name, command
+        
+        probe_bytes = int(self.config.get('recovery_probe_mb', 1024)) * 1024 ** 2
+        available = read_mem_available()
+        workers = min(len(candidates), os.cpu_count() or 1)
+        if available is not None:
+            workers = min(workers, available // max(1, probe_bytes))
+        workers = max(1, workers)
+        self.print_info(f"Teste {len(candidates)} Recovery-Strategien parallel ({workers} gleichzeitig)...")
+        
+        env = os.environ.copy()
+        env.update(self.emerge_env)
+        stop = threading.Event()
+        processes: List[subprocess.Popen] = []
+        lock = threading.Lock()
+        
+        def probe(command: List[str]) -> Tuple[Optional[bool], float]:
+            diagnostics = EmergeDiagnostics()
+            start = time.monotonic()
+            # Stop-Prüfung und Start unter einem Lock: eine Probe, die gerade startet,
+            # während eine andere gewinnt, wird nicht mehr gestartet statt verwaist
+            with lock:
+                if stop.is_set():
+                    return None, 0.0
+                try:
+                    process = subprocess.Popen(command + ["--pretend"], stdout=subprocess.PIPE,
+                                               stderr=subprocess.STDOUT, universal_newlines=True,
+                                               env=env, start_new_session=True)
+                except OSError as e:
+                    self.logger.warning(f"Recovery-Probe nicht startbar: {e}")
+                    return False, 0.0
+                processes.append(process)
+            for line in process.stdout:
+                diagnostics(line)
+                if diagnostics.resolver_failure(line):
+                    self.terminate_process_group(process)
+                    break
+            process.wait()
+            if stop.is_set():
+                return None, round(time.monotonic() - start, 1)
+            # Exit-Code 0 genügt nicht: --pretend meldet Slot-Konflikte und übersprungene
+            # Updates, ohne zu scheitern
+            report = diagnostics.report
+            resolved = (process.returncode == 0 and diagnostics.resolver_failure() is None
+                        and not report.conflicts and not report.skipped_updates)
+            return resolved, round(time.monotonic() - start, 1)
+        
+        race_start = time.monotonic()
+        results: Dict[int, Optional[bool]] = {}
+        probes = []
+        winner = None
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(probe, command): index for index, (_name, command) in enumerate(candidates)}
+            for future in as_completed(futures):
+                index = futures[future]
+                resolved, seconds = future.result()
+                results[index] = resolved
+                name, command = candidates[index]
+                probes.append({'strategy': name, 'level': backtrack_of(command),
+                               'resolved': resolved, 'seconds': seconds})
+                # Abgebrochene Proben (resolved None) sagen nichts über die Stufe aus
+                if history is not None and resolved is not None:
+                    history.record(backtrack_of(command), resolved, seconds, name,
+                                   pure='--binpkg-respect-use=n' not in command)
+                self.logger.info(f"Recovery-Probe {candidates[index][0]}: "
+                                 f"{'löst auf' if resolved else 'scheitert'} ({seconds}s)")
                 
-                # Versuche mit erhöhtem Backtrack-Level erneut
-                if conflicts and '--backtrack' not in ' '.join(emerge_cmd):
-                    self.print_info("Versuche mit --backtrack=30 erneut...")
-                    retry_cmd = emerge_cmd.copy()
-                    retry_cmd.insert(len(retry_cmd) - 1, "--backtrack=30")
-                    success, output = self.run_command(
-                        retry_cmd,
-                        "Aktualisiere System-Pakete (Retry mit erhöhtem Backtrack)",
-                        allow_fail=True
-                    )
+                # Günstigste auflösbare Strategie, sobald alle günstigeren gescheitert sind
+                for position in range(len(candidates)):
+                    if position not in results:
+                        break
+                    if results[position]:
+                        winner = position
+                        break
+                if winner is not None:
+                    stop.set()
+                    with lock:
+                        for process in processes:
+                            if process.poll() is None:
+                                self.terminate_process_group(process, grace=2.0)
+                    break
+        
+        wall = round(time.monotonic() - race_start, 1)
+        self.stats['recovery'] = {
+            'probes': probes,
+            'workers': workers,
+            'winner': candidates[winner][0] if winner is not None else None,
+            'wall_seconds': wall,
+            'sequential_seconds': round(sum(probe['seconds'] for probe in probes), 1)
+        }
+        if winner is None:
+            self.print_warning(f"Keine Recovery-Strategie löst die Abhängigkeiten auf ({wall}s)")
+            return None
+        self.print_success(f"Recovery-Strategie {candidates[winner][0]} löst auf ({wall}s)")
+        return candidates[winner]
+    
+    def run_batched_update(self, base_cmd: List[str], graph: DependencyGraph,
+                           batches: List[List[str]], backtrack_history: 'BacktrackHistory',
+                           durations: Optional[Dict[str, float]] = None,
+                           guard: Optional[DeadlineGuard] = None) -> Tuple[bool, bool]:
+        """Emerged die Mergeliste in abhängigkeitskonsistenten Batches
+        
+        Die Batches folgen der Build-Reihenfolge des Merge-Graphen (siehe
+        DependencyGraph.batches() zu dessen Grenzen) und werden mit --oneshot =atom...
+        über emerge_with_recovery() gebaut. Nach jedem Batch wird der Fortschritt unter
+        cache_dir gespeichert; ein unterbrochener Run wird fortgesetzt, indem Pakete aus
+        dessen abgeschlossenen Batches, die laut VDB installiert sind, entfallen. Schlägt ein Batch fehl, werden
+        nur die davon abhängigen Pakete übersprungen. Ist eine Deadline gesetzt, wird
+        vor jedem Batch geprüft, ob er noch rechtzeitig fertig wird; innerhalb eines
+        Batches hält die DeadlineGuard emerge vor dem ersten zu späten Paket an.
+        
+        Args:
+            base_cmd: emerge-Befehl mit Performance-Optionen, ohne @world
+            graph: Merge-Graph der ausstehenden Updates
+            batches: Batches aus DependencyGraph.batches()
+            backtrack_history: Backtrack-Historie für die Versuche jedes Batches
+            durations: Erwartete Dauer pro Paket (für die Deadline-Prüfung)
+            guard: Deadline-Wache für die emerge-Läufe
+        
+        Returns:
+            Tuple (success, complete): kein Batch fehlgeschlagen / alle Batches gebaut
+        """
+        # Fortsetzen: bereits gebaute Pakete des letzten, unvollständigen Runs überspringen
+        # (fehlt doch etwas, holt es der finale @world-Lauf nach)
+        resumed: List[str] = []
+        previous = self.state_cache.load('batches')
+        if previous and not previous.get('finished'):
+            previous_batches = previous.get('batches', [])
+            done = previous.get('resumed', []) + [cpv for index in previous.get('completed', [])
+                                                  if 0 < index <= len(previous_batches)
+                                                  for cpv in previous_batches[index - 1]]
+            merged = {cpv for cpv in done if os.path.isdir(os.path.join(VDB_DIR, cpv))}
+            resumed = [cpv for batch in batches for cpv in batch if cpv in merged]
+            self.print_info(f"Letzter Run: {len(previous.get('completed', []))}/"
+                            f"{len(previous_batches)} Batches abgeschlossen "
+                            f"({previous.get('updated', '?')}) - setze fort, "
+                            f"{len(resumed)} Paket(e) bereits installiert")
+            if resumed:
+                batches = [remaining for remaining in
+                           ([cpv for cpv in batch if cpv not in merged] for batch in batches) if remaining]
+        
+        self.print_info(f"{sum(len(batch) for batch in batches)} Pakete in {len(batches)} Batches")
+        
+        checkpoint = {
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'batches': batches,
+            'resumed': resumed,
+            'completed': [],
+            'failed': [],
+            'skipped': [],
+            'deferred': [],
+            'finished': False
+        }
+        self.stats['batches'] = checkpoint
+        blocked: set = set()
+        jobs = self.config.get_emerge_jobs(graph.max_parallelism)
+        
+        for index, batch in enumerate(batches, 1):
+            # Deadline: nur starten, wenn der Batch voraussichtlich rechtzeitig fertig wird
+            if self.deadline is not None:
+                batch_seconds = [durations.get(cpv, 0.0) for cpv in batch] if durations else [0.0]
+                expected = max(max(batch_seconds), sum(batch_seconds) / max(1, jobs))
+                if time.time() + expected > self.deadline:
+                    deferred = [cpv for remaining in batches[index - 1:] for cpv in remaining]
+                    checkpoint['deferred'] = deferred
+                    self.print_warning(f"Deadline {datetime.fromtimestamp(self.deadline).strftime('%H:%M')} "
+                                       f"erreicht - {len(deferred)} Paket(e) auf den nächsten Run verschoben")
+                    break
             
-            if not success and ignored_binpkgs:
-                self.print_warning(f"Binary-Packages mit USE-Mismatch ignoriert ({len(ignored_binpkgs)})")
-                for ignored_info in ignored_binpkgs[:5]:  # Nur erste 5 ausgeben
-                    self.print_warning(f"  {ignored_info['package']}")
-                
-                # Versuche mit --binpkg-respect-use=n um Binary-Packages trotz USE-Mismatch zu akzeptieren
-                self.print_info("Versuche mit --binpkg-respect-use=n um Binary-Package-Konflikte zu umgehen...")
-                retry_cmd = emerge_cmd.copy()
-                # Entferne @world am Ende und füge es mit binpkg-Option wieder hinzu
-                if retry_cmd[-1] == '@world':
-                    retry_cmd = retry_cmd[:-1]
-                retry_cmd.append("--binpkg-respect-use=n")
-                retry_cmd.append("@world")
-                success, output = self.run_command(
-                    retry_cmd,
-                    "Aktualisiere System-Pakete (Retry mit --binpkg-respect-use=n)",
-                    allow_fail=True
-                )
+            atoms = [cpv for cpv in batch if cpv not in blocked]
+            skipped = [cpv for cpv in batch if cpv in blocked]
+            if skipped:
+                checkpoint['skipped'].extend(skipped)
+                self.print_warning(f"Batch {index}: {len(skipped)} Paket(e) übersprungen "
+                                   f"(Abhängigkeit fehlgeschlagen)")
+            if not atoms:
+                continue
             
-            if not success and skipped_updates:
-                self.print_warning(f"Updates übersprungen aufgrund von Konflikten ({len(skipped_updates)})")
-                for pkg in skipped_updates[:5]:  # Nur erste 5 ausgeben
-                    self.print_warning(f"  {pkg}")
-                self.print_info("Versuche mit höherem Backtrack-Level und zusätzlichen Flags...")
-                
-                retry_cmd = [
-                    "emerge",
-                    "--update", "--deep", "--newuse",
-                    "--with-bdeps=y",
-                    f"--jobs={jobs}",
-                    f"--load-average={load_avg}",
-                    "--backtrack=50",
-                    "--binpkg-respect-use=n",
-                    "--ask=n",
-                    "@world"
-                ]
-                success, output = self.run_command(
-                    retry_cmd,
-                    "Aktualisiere System-Pakete (Finale Retry mit Maximum-Optionen)",
-                    allow_fail=True
-                )
+            # --deep --with-bdeps=y bleiben: Abhängigkeiten außerhalb des --tree-Graphen
+            # werden mit ihren =atom-Paketen aktualisiert
+            batch_cmd = base_cmd + ["--oneshot", *[f"={cpv}" for cpv in atoms]]
+            success, _report = self.emerge_with_recovery(
+                batch_cmd, f"Batch {index}/{len(batches)}: {len(atoms)} Paket(e)", backtrack_history, guard
+            )
+            
+            if guard is not None and guard.stopped_at is not None:
+                deferred = atoms + [cpv for remaining in batches[index:] for cpv in remaining]
+                checkpoint['deferred'] = deferred
+                self.print_warning(f"Deadline {datetime.fromtimestamp(self.deadline).strftime('%H:%M')} "
+                                   f"erreicht - Batch {index} angehalten, {len(deferred)} Paket(e) "
+                                   f"auf den nächsten Run verschoben")
+                break
+            if success:
+                checkpoint['completed'].append(index)
+            else:
+                checkpoint['failed'].append(index)
+                blocked |= graph.dependants_of(atoms)
+            
+            checkpoint['updated'] = datetime.now().isoformat(timespec='seconds')
+            if not self.dry_run:
+                self.state_cache.save('batches', checkpoint)
         
-        return success, kernel_updated
+        checkpoint['finished'] = not checkpoint['failed'] and not checkpoint['deferred']
+        if not self.dry_run:
+            self.state_cache.save('batches', checkpoint)
+        
+        if checkpoint['failed']:
+            self.print_error(f"{len(checkpoint['failed'])} von {len(batches)} Batches fehlgeschlagen: "
+                             f"{', '.join(str(i) for i in checkpoint['failed'])}")
+            return False, False
+        
+        if checkpoint['deferred']:
+            return True, False
+        
+        self.print_success(f"Alle {len(batches)} Batches erfolgreich abgeschlossen")
+        return True, True
+    
+    def get_security_packages(self) -> set:
+        """category/package-Namen aus offenen GLSAs (glsa-check), leer wenn nicht verfügbar"""
+        if not shutil.which("glsa-check"):
+            return set()
+        try:
+            result = subprocess.run(
+                ["glsa-check", "--list", "affected"],
+                capture_output=True,
+                text=True,
+                timeout=120
+            )
+        except (subprocess.TimeoutExpired, OSError) as e:
+            self.logger.warning(f"glsa-check fehlgeschlagen: {e}")
+            return set()
+        
+        packages = set()
+        for line in result.stdout.splitlines():
+            match = re.search(r'\(\s*([^)]+?)\s*\)\s*$', line)
+            if match:
+                packages.update(atom for atom in match.group(1).split() if '/' in atom)
+        return packages
+    
+    def schedule_for_deadline(self, graph: DependencyGraph,
+                              durations: Dict[str, float], jobs: int) -> List[str]:
+        """Wählt die größte abhängigkeitskonsistente Teilmenge, die vor der Deadline fertig wird
         
+        Kritische Pakete und Security-Fixes (GLSA) werden zuerst eingeplant, danach
+        die übrigen Pakete aufsteigend nach erwarteter Dauer - schwere Pakete, die
+        nicht mehr passen, werden auf den nächsten Run verschoben. Jedes Paket wird
+        nur zusammen mit all seinen ausstehenden Abhängigkeiten gewählt.
+        
+        Returns:
+            Ausgewählte Pakete (cpv)
+        """
+        safety = float(self.config.get('deadline_safety_factor', 1.2))
+        budget = (self.deadline - time.time()) / safety
+        critical = set(self.config.get('critical_packages', []))
+        security = self.get_security_packages()
+        
+        def priority(cpv: str) -> Tuple[int, float]:
+            cp = graph.nodes[cpv].cp
+            rank = 0 if cp in critical else 1 if cp in security else 2
+            return rank, durations[cpv]
+        
+        selected: set = set()
+        finish: Dict[str, float] = {}
+        total_work = 0.0
+        
+        for candidate in sorted(graph.nodes, key=priority):
+            if candidate in selected:
+                continue
+            # Abhängigkeits-Hülle des Kandidaten (noch nicht gewählte Pakete)
+            closure = []
+            stack = [candidate]
+            seen = set()
+            while stack:
+                cpv = stack.pop()
+                if cpv in selected or cpv in seen:
+                    continue
+                seen.add(cpv)
+                closure.append(cpv)
+                stack.extend(graph.deps[cpv])
+            
+            closure_finish = dict(finish)
+            for cpv in [c for c in graph.topological_order() if c in seen]:
+                closure_finish[cpv] = durations[cpv] + max(
+                    (closure_finish[dep] for dep in graph.deps[cpv]), default=0.0
+                )
+            work = total_work + sum(durations[cpv] for cpv in closure)
+            makespan = max(work / max(1, jobs), max(closure_finish.values(), default=0.0))
+            
+            if makespan <= budget:
+                selected.update(closure)
+                finish = closure_finish
+                total_work = work
+        
+        self.stats['schedule'] = {
+            'deadline': datetime.fromtimestamp(self.deadline).isoformat(timespec='minutes'),
+            'budget_seconds': round(budget, 1),
+            'selected': len(selected),
+            'deferred': sorted(set(graph.nodes) - selected),
+            'security_packages': sorted(security & {entry.cp for entry in graph.nodes.values()})
+        }
+        return [cpv for cpv in graph.topological_order() if cpv in selected]
+    
     def check_kernel_module_mismatch(self) -> bool:
         """Prüft, ob Kernel-Module für den aktuellen Kernel fehlen oder veraltet sind
         
@@ -1756,7 +5699,7 @@ class GentooUpdater:
                 text=True
             )
             
-            if "Total: 0 packages" in result.stdout:
+            if MergePlan.parse(result.stdout).total == 0:
                 self.print_success(_('NO_EXTERNAL_MODULES'))
                 return True
             else:
@@ -1771,6 +5714,7 @@ class GentooUpdater:
             "Kompiliere Kernel-Module neu",
             allow_fail=True
         )
+        output.close()
         
         if success:
             self.stats['modules_rebuilt'] = True
@@ -1795,16 +5739,19 @@ class GentooUpdater:
             capture_output=True
         )
         
+        with output:
+            if success:
+                self.extract_package_list(MergePlan.parse(str(output)).entries, 'remove')
+                print(output)
+        
         if success:
-            self.extract_package_list(output, 'remove')
-            print(output)
-            
             # Jetzt tatsächlich entfernen
             success, output = self.run_command(
                 ["emerge", "--depclean", "--ask=n"],
                 "Entferne nicht mehr benötigte Pakete",
                 allow_fail=True
             )
+            output.close()
         
         return success
         
@@ -1829,6 +5776,7 @@ class GentooUpdater:
             "Repariere kaputte Abhängigkeiten",
             allow_fail=True
         )
+        output.close()
         return success
 
     def handle_python_updates(self) -> bool:
@@ -1857,6 +5805,7 @@ class GentooUpdater:
             "Rebuild von Paketen gegen neue Python-Version (preserved-rebuild)",
             allow_fail=True
         )
+        output.close()
         
         if success:
             self.print_success("preserved-rebuild erfolgreich abgeschlossen!")
@@ -1977,6 +5926,7 @@ class GentooUpdater:
                 "Aktualisiere Konfigurationsdateien automatisch",
                 allow_fail=True
             )
+            output.close()
             
             if success:
                 self.print_success("Alle Konfigurationsdateien wurden automatisch aktualisiert")
@@ -2007,9 +5957,31 @@ class GentooUpdater:
     
     def print_summary(self, duration):
         """Gibt eine Zusammenfassung des Updates aus"""
+        # eix-update und Prefetch liefen im Hintergrund - erst hier wird darauf gewartet
+        self.wait_for_eix()
+        self.finish_prefetch()
+        
         self.print_section("UPDATE-ZUSAMMENFASSUNG")
         
+        # Transfer-Statistiken aus Fetch/Sync dieses Runs sichern
+        if not self.dry_run:
+            self.mirror_scores.save()
+        
+        # Builds dieses Runs aus emerge.log übernehmen
+        if self.stats['packages_updated'] and not self.dry_run:
+            history = self.get_history()
+            if history:
+                since = int(time.time() - duration.total_seconds())
+                rows = history.conn.execute(
+                    "SELECT cpv, duration FROM builds WHERE finished >= ? AND binary = 0 "
+                    "ORDER BY duration DESC LIMIT 5", (since,)
+                ).fetchall()
+                self.stats['longest_builds'] = [(cpv, seconds) for cpv, seconds in rows]
+        
         print(f"{Colors.BOLD}Dauer:{Colors.ENDC} {duration}")
+        if self.stats.get('estimate') and self.stats.get('update_duration_seconds') is not None:
+            print(f"{Colors.BOLD}System-Update:{Colors.ENDC} {format_duration(self.stats['update_duration_seconds'])} "
+                  f"(geschätzt: {format_duration(self.stats['estimate']['seconds'])})")
         print()
         
         # Zeige verwendete Mirrors
@@ -2021,6 +5993,27 @@ class GentooUpdater:
                 print(f"{Colors.BOLD}Primärer Mirror:{Colors.ENDC} {self.stats['used_mirror']}")
             print()
         
+        if self.stats.get('sync_skipped'):
+            print(f"{Colors.BOLD}Sync übersprungen:{Colors.ENDC} {self.stats['sync_skipped']['reason']}")
+            print()
+        
+        if self.stats.get('repo_sync'):
+            print(f"{Colors.OKBLUE}Repository-Sync:{Colors.ENDC}")
+            for name, result in self.stats['repo_sync'].items():
+                status = symbol('checkmark') if result['success'] else symbol('error')
+                print(f"  {status} {name} ({format_duration(result['seconds'])})")
+            print()
+        
+        # Sync-Versuche (Failover über die Rsync-Rotation)
+        if self.stats.get('sync_attempts'):
+            print(f"{Colors.OKBLUE}Sync-Versuche:{Colors.ENDC}")
+            for attempt in self.stats['sync_attempts']:
+                status = symbol('checkmark') if attempt['success'] else symbol('error')
+                print(f"  {status} {attempt['mirror']} ({format_duration(attempt['seconds'])})")
+            if self.stats.get('sync_mirror'):
+                print(f"{Colors.BOLD}Sync-Mirror:{Colors.ENDC} {self.stats['sync_mirror']}")
+            print()
+        
         if self.stats['packages_updated']:
             print(f"{Colors.OKGREEN}Aktualisierte Pakete ({len(self.stats['packages_updated'])}):{Colors.ENDC}")
             for pkg in self.stats['packages_updated'][:10]:  # Zeige erste 10
@@ -2029,6 +6022,51 @@ class GentooUpdater:
                 print(f"  ... und {len(self.stats['packages_updated']) - 10} weitere")
             print()
         
+        fleet = self.stats.get('fleet')
+        if fleet and fleet['role'] == 'builder':
+            print(f"{Colors.BOLD}Fleet (Builder):{Colors.ENDC} {fleet['packages']} Paket(e) veröffentlicht "
+                  f"nach {fleet['published']}")
+        elif fleet:
+            print(f"{Colors.BOLD}Fleet (Consumer):{Colors.ENDC} {fleet['binary']} Binärpaket(e) von "
+                  f"{fleet['builder']}, {len(fleet['source'])} aus den Quellen")
+        if fleet:
+            print()
+        
+        binhost = self.stats.get('binhost')
+        if binhost and binhost['pending']:
+            print(f"{Colors.BOLD}Binhost:{Colors.ENDC} {binhost['hits']}/{binhost['pending']} Binärpakete "
+                  f"({binhost['hit_rate'] * 100:.0f}%), ca. {format_duration(binhost['saved_seconds'])} "
+                  f"Kompilierzeit gespart")
+            print()
+        
+        backtrack = self.stats.get('backtrack')
+        if backtrack:
+            resolved = [attempt for attempt in backtrack['attempts'] if attempt['resolved']]
+            print(f"{Colors.BOLD}Backtrack:{Colors.ENDC} Start mit Level {backtrack['level']} "
+                  f"({backtrack['reason']})"
+                  + (f", aufgelöst mit {resolved[0]['strategy']}" if resolved else ""))
+            print()
+        
+        if self.stats.get('download_size'):
+            print(f"{Colors.BOLD}Download-Größe:{Colors.ENDC} {self.stats['download_size'] / (1024 ** 2):.1f} MiB")
+            prefetch = self.stats.get('prefetch')
+            if prefetch:
+                print(f"{Colors.BOLD}Prefetch:{Colors.ENDC} {prefetch['fetched']}/{prefetch['packages']} Pakete, "
+                      f"{prefetch['bytes'] / (1024 ** 2):.1f} MiB in {format_duration(prefetch['seconds'])}, "
+                      f"Build-Wartezeit {format_duration(prefetch['build_wait_seconds'])}")
+            verify = self.stats.get('distfile_verify')
+            if verify and verify['files']:
+                print(f"{Colors.BOLD}Distfile-Prüfung:{Colors.ENDC} {verify['files']} Datei(en) in "
+                      f"{format_duration(verify['seconds'])}, {len(verify['corrupt'])} beschädigt, "
+                      f"{len(verify['partial'])} unvollständig")
+            print()
+        
+        if self.stats.get('longest_builds'):
+            print(f"{Colors.OKBLUE}Längste Builds:{Colors.ENDC}")
+            for cpv, seconds in self.stats['longest_builds']:
+                print(f"  • {cpv} ({format_duration(seconds)})")
+            print()
+        
         if self.stats['packages_removed']:
             print(f"{Colors.OKCYAN}Entfernte Pakete ({len(self.stats['packages_removed'])}):{Colors.ENDC}")
             for pkg in self.stats['packages_removed'][:5]:
@@ -2052,6 +6090,14 @@ class GentooUpdater:
                 print(f"  {symbol('warning')} {pkg}")
             print()
         
+        schedule = self.stats.get('schedule')
+        if schedule and schedule['deferred']:
+            print(f"{Colors.WARNING}{symbol('clock')} Auf das nächste Wartungsfenster verschoben "
+                  f"({len(schedule['deferred'])}):{Colors.ENDC}")
+            for cpv in schedule['deferred'][:10]:
+                print(f"  {symbol('skip')} {cpv}")
+            print()
+        
         if self.stats['warnings']:
             print(f"{Colors.WARNING}Warnungen ({len(self.stats['warnings'])}):{Colors.ENDC}")
             for warn in self.stats['warnings'][:5]:
@@ -2072,11 +6118,19 @@ class GentooUpdater:
     
     def save_summary_json(self, duration):
         """Speichert Update-Summary als JSON"""
+        estimate = self.stats.get('estimate') or {}
+        actual = self.stats.get('update_duration_seconds')
         summary = {
             'timestamp': datetime.now().isoformat(),
             'duration': str(duration),
+            'duration_seconds': round(duration.total_seconds(), 1),
+            'estimated_update_seconds': estimate.get('seconds'),
+            'actual_update_seconds': actual,
+            'estimate_error_seconds': (round(actual - estimate['seconds'], 1)
+                                       if actual is not None and estimate else None),
             'mirrors': self.stats.get('gentoo_mirrors', []),
             'primary_mirror': self.stats.get('used_mirror'),
+            'backtrack': self.stats.get('backtrack'),
             'stats': self.stats
         }
         
@@ -2119,6 +6173,77 @@ Details siehe: {self.log_file}
         except Exception as e:
             self.print_warning(f"Konnte Benachrichtigung nicht senden: {e}")
             
+    def run_plan_graph(self, output_format: str = 'text', output_file: Optional[str] = None):
+        """Gibt den Merge-Graphen der ausstehenden Updates aus (--plan-graph)
+        
+        Args:
+            output_format: text, json oder dot
+            output_file: Optionaler Pfad für den Export (sonst stdout)
+        """
+        result = self.resolve_world()
+        if result.returncode != 0:
+            self.print_error(f"emerge --pretend fehlgeschlagen (Exit Code: {result.returncode})")
+            print(result.stdout + result.stderr)
+            sys.exit(1)
+        
+        graph = result.plan.graph()
+        
+        if output_format == 'json':
+            report = json.dumps(graph.to_dict(), indent=2) + '\n'
+        elif output_format == 'dot':
+            report = graph.to_dot()
+        else:
+            path, _length = graph.critical_path()
+            layers = graph.layers()
+            counts = graph.dependant_counts()
+            lines = [
+                f"Merge-Graph: {len(graph.nodes)} Pakete, {len(layers)} Ebenen, "
+                f"max. Parallelität {graph.max_parallelism}",
+                f"Empfohlene --jobs (auto): {self.config.get_emerge_jobs(graph.max_parallelism)}",
+                "",
+                f"Kritischer Pfad ({len(path)} Pakete):",
+                "  " + " → ".join(path),
+                "",
+                "Parallelität pro Ebene:",
+            ]
+            for index, layer in enumerate(layers, 1):
+                lines.append(f"  Ebene {index:3}: {len(layer)} Paket(e)")
+            lines.append("")
+            lines.append("Pakete mit den meisten Abhängigen:")
+            for cpv, count in sorted(counts.items(), key=lambda item: -item[1])[:10]:
+                lines.append(f"  {cpv} ({count})")
+            report = '\n'.join(lines) + '\n'
+        
+        if output_file:
+            with open(output_file, 'w') as f:
+                f.write(report)
+            self.print_success(f"Merge-Graph exportiert: {output_file}")
+        else:
+            print(report, end='')
+    
+    def show_history(self, atom: str):
+        """Zeigt die Build-Historie eines Pakets (--history)"""
+        history = self.get_history()
+        if history is None:
+            sys.exit(1)
+        
+        builds = history.builds(atom)
+        if not builds:
+            self.print_warning(f"Keine Builds für {atom} in {history.log_path} gefunden")
+            return
+        
+        print(f"\n{Colors.BOLD}Build-Historie: {atom}{Colors.ENDC}")
+        for cpv, finished, seconds, binary in builds:
+            date = datetime.fromtimestamp(finished).strftime('%Y-%m-%d %H:%M')
+            kind = " (binpkg)" if binary else ""
+            print(f"  {date}  {format_duration(seconds):>8}  {cpv}{kind}")
+        
+        cp = atom if '/' in atom else split_atom(builds[0][0])[0] + '/' + atom
+        expected = history.expected_duration(cp)
+        if expected is not None:
+            print(f"\n{Colors.BOLD}Erwartete Dauer:{Colors.ENDC} {format_duration(expected)}")
+        print()
+    
     def run_modules_only(self):
         """Baut nur Kernel-Module neu (ohne System-Update)"""
         start_time = datetime.now()
@@ -2159,17 +6284,20 @@ Details siehe: {self.log_file}
         
         if self.timeout:
             print(f"{Colors.OKCYAN}{symbol('clock')} Timeout: {self.timeout} Sekunden{Colors.ENDC}")
+            if self.deadline is None:
+                self.deadline = time.time() + self.timeout
+        if self.deadline is not None:
+            print(f"{Colors.OKCYAN}{symbol('clock')} Deadline: "
+                  f"{datetime.fromtimestamp(self.deadline).strftime('%Y-%m-%d %H:%M')}{Colors.ENDC}")
         if self.retry_count > 1:
             print(f"{Colors.OKCYAN}{symbol('sync')} Retry-Count: {self.retry_count}{Colors.ENDC}")
         if self.max_packages:
             print(f"{Colors.OKCYAN}{symbol('package')} Max Packages: {self.max_packages}{Colors.ENDC}")
         
         # Prüfe ob mirrorselect verfügbar ist und informiere Benutzer
-        try:
-            subprocess.run(["which", "mirrorselect"], check=True,
-                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=2)
+        if shutil.which("mirrorselect"):
             print(f"{Colors.OKCYAN}{_('MIRRORSELECT_AVAILABLE')}{Colors.ENDC}")
-        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
+        else:
             print(f"{Colors.WARNING}{_('MIRRORSELECT_NOT_INSTALLED')}{Colors.ENDC}")
             print(f"{Colors.OKCYAN}{_('MIRRORSELECT_INSTALL_TIP')}{Colors.ENDC}")
             print(f"{Colors.OKCYAN}{_('MIRRORSELECT_BENEFIT')}{Colors.ENDC}\n")
@@ -2181,20 +6309,46 @@ Details siehe: {self.log_file}
             if not self.check_disk_space():
                 sys.exit(1)
             
-            # Erstelle Backup
-            self.backup_important_files()
-            
-            # Vorbereitung: Räume Manifest-Fehler auf
+            # Vorbereitung: Räume Manifest-Fehler auf (vor dem Sync - liegt im Tree, den rsync schreibt)
             self.cleanup_manifest_quarantine()
             
-            # Schritt 1: Sync (wenn nicht übersprungen)
-            if not self.skip_sync:
-                if not self.sync_repositories():
-                    self.print_error("Repository-Synchronisation fehlgeschlagen nach 2 Versuchen")
-                    update_success = False
-                    sys.exit(1)
-            else:
-                print(f"{Colors.WARNING}{symbol('skip')} Skipping repository synchronisation (--skip-sync){Colors.ENDC}")
+            # Backup und Aufräumen alter Backups sind reine lokale I/O und laufen parallel
+            # zum Sync; make.conf wird erst nach Abschluss des Backups umgeschrieben
+            preflight_start = time.monotonic()
+            sync_seconds = 0.0
+            backup_dir = Path(self.config.get('backup_dir', '/var/backups/gentoo-updater'))
+            with ThreadPoolExecutor(max_workers=2) as preflight:
+                self._backup_future = preflight.submit(self._run_timed, self.backup_important_files, prune=False)
+                futures = {'backup': self._backup_future}
+                if self.config.get('enable_backups', True) and backup_dir.is_dir():
+                    futures['prune_backups'] = preflight.submit(self._run_timed, self.cleanup_old_backups, backup_dir)
+                
+                # Schritt 1: Sync (wenn nicht übersprungen)
+                if not self.skip_sync:
+                    sync_start = time.monotonic()
+                    sync_ok = self.sync_repositories()
+                    sync_seconds = time.monotonic() - sync_start
+                    if not sync_ok:
+                        self.print_error(_('SYNC_FAILED', attempts=len(self.stats.get('sync_attempts', []))))
+                        update_success = False
+                        sys.exit(1)
+                else:
+                    print(f"{Colors.WARNING}{symbol('skip')} Skipping repository synchronisation (--skip-sync){Colors.ENDC}")
+                
+                # Join-Punkt vor der Abhängigkeitsauflösung
+                tasks = {name: future.result() for name, future in futures.items()}
+            self._backup_future = None
+            
+            wall = time.monotonic() - preflight_start
+            saved = max(0.0, sum(tasks.values()) + sync_seconds - wall)
+            self.stats['preflight'] = {
+                'tasks': {name: round(seconds, 2) for name, seconds in tasks.items()},
+                'sync_seconds': round(sync_seconds, 1),
+                'wall_seconds': round(wall, 1),
+                'saved_seconds': round(saved, 1)
+            }
+            if saved >= 1:
+                self.print_info(f"Backup/Aufräumen parallel zum Sync: {format_duration(saved)} eingespart")
             
             # Schritt 2: eix-update (wenn nicht übersprungen)
             if not self.skip_eix:
@@ -2214,13 +6368,30 @@ Details siehe: {self.log_file}
                     self.send_notification(True, duration)
                     return
                 
+                # Vorhandene Distfiles prüfen, dann fehlende parallel zur Kompilierung laden -
+                # vorher klären, was als Binärpaket kommt (Fleet-Consumer, Binhost)
+                if has_updates:
+                    if self.config.get('fleet_role', '') == 'consumer':
+                        self.install_fleet_plan()
+                    plan = self.resolve_world().plan
+                    self.check_binhost(plan)
+                    self.verify_distfiles(plan)
+                    self.start_prefetch(plan)
+                
             # Schritt 4: System-Update
+            fleet_plan = self._resolution.plan if self._resolution is not None else None
+            update_start = time.monotonic()
             success, kernel_updated = self.update_system()
+            self.stats['update_duration_seconds'] = round(time.monotonic() - update_start, 1)
             if not success:
                 self.print_error("System-Update fehlgeschlagen")
                 update_success = False
                 sys.exit(1)
             
+            # Builder: gebaute Pakete und signierten Plan für die Consumer veröffentlichen
+            if self.config.get('fleet_role', '') == 'builder' and fleet_plan is not None:
+                self.publish_fleet_plan(fleet_plan)
+            
             # Schritt 5: Kernel-Module neu bauen
             # Prüfe ob Module fehlen oder veraltet sind (auch ohne Update)
             needs_module_rebuild = kernel_updated or self.check_kernel_module_mismatch()
@@ -2292,7 +6463,7 @@ def main():
     env_auto_autounmask = os.getenv('GENTOO_UPDATER_AUTO_AUTOUNMASK')
     env_skip_internet_check = os.getenv('GENTOO_UPDATER_SKIP_INTERNET_CHECK', 'false').lower() == 'true'
     env_resolve_blocks = os.getenv('GENTOO_UPDATER_RESOLVE_BLOCKS', 'false').lower() == 'true'
-    env_backtrack = os.getenv('GENTOO_UPDATER_BACKTRACK', '20')
+    env_backtrack = os.getenv('GENTOO_UPDATER_BACKTRACK')
     
     parser = argparse.ArgumentParser(
         description='Gentoo System Updater - Automatisiert System-Updates',
@@ -2465,9 +6636,56 @@ Umgebungsvariablen:
     
     parser.add_argument('--backtrack',
                        type=int,
-                       default=20,
+                       default=None,
                        help=get_help_text('backtrack'))
     
+    parser.add_argument('--plan-graph',
+                       nargs='?',
+                       const='text',
+                       choices=['text', 'json', 'dot'],
+                       default=None,
+                       help=get_help_text('plan_graph'))
+    
+    parser.add_argument('--plan-graph-output',
+                       type=str,
+                       default=None,
+                       help=get_help_text('plan_graph_output'))
+    
+    parser.add_argument('--deadline',
+                       type=str,
+                       default=None,
+                       metavar='HH:MM',
+                       help=get_help_text('deadline'))
+    
+    parser.add_argument('--window',
+                       type=str,
+                       default=None,
+                       help=get_help_text('window'))
+    
+    parser.add_argument('--fetch',
+                       nargs=2,
+                       metavar=('URI', 'FILE'),
+                       default=None,
+                       help=get_help_text('fetch'))
+    
+    parser.add_argument('--binhost',
+                       type=str,
+                       default=None,
+                       metavar='URL',
+                       help=get_help_text('binhost'))
+    
+    parser.add_argument('--role',
+                       type=str,
+                       choices=['builder', 'consumer'],
+                       default=None,
+                       help=get_help_text('role'))
+    
+    parser.add_argument('--history',
+                       type=str,
+                       default=None,
+                       metavar='ATOM',
+                       help=get_help_text('history'))
+    
     parser.add_argument('--version',
                        action='version',
                        version=f'Gentoo Updater v{__version__}')
@@ -2547,7 +6765,11 @@ Umgebungsvariablen:
     if env_resolve_blocks:
         args.resolve_blocks = True
     if env_backtrack:
-        args.backtrack = int(env_backtrack) if env_backtrack else 20
+        args.backtrack = int(env_backtrack)
+    
+    # FETCHCOMMAND-Modus: wird von Portage pro Datei aufgerufen (ohne Root, ohne Checks)
+    if args.fetch:
+        sys.exit(fetchcommand_main(args.fetch[0], args.fetch[1], Config(args.config)))
     
     # ===== KRITISCHE CHECKS: INTERNET-VERBINDUNG =====
     # Prüfe Internet-Verbindung, sofern nicht übersprungen
@@ -2591,8 +6813,18 @@ Umgebungsvariablen:
         if args.resolve_blocks:
             config.config['resolve_blocks'] = True
         
-        # Backtrack level from parameter override config
-        config.config['backtrack_level'] = args.backtrack
+        # Backtrack level from parameter override config (disables the learned level)
+        if args.backtrack is not None:
+            config.config['backtrack_level'] = args.backtrack
+            config.config['adaptive_backtrack'] = False
+        
+        # Binhost from parameter override config
+        if args.binhost:
+            config.config['binhost'] = args.binhost
+        
+        # Fleet role from parameter override config
+        if args.role:
+            config.config['fleet_role'] = args.role
         
         updater = GentooUpdater(
             verbose=args.verbose, 
@@ -2609,8 +6841,25 @@ Umgebungsvariablen:
             auto_autounmask=args.auto_autounmask
         )
         
+        updater.use_mirrorselect = args.use_mirrorselect
+        
+        # Wartungsfenster (--deadline hat Vorrang vor --window)
+        try:
+            if args.deadline:
+                updater.deadline = parse_deadline(args.deadline)
+            elif args.window:
+                updater.deadline = time.time() + parse_window(args.window)
+        except ValueError as e:
+            parser.error(str(e))
+        
+        # Nur Build-Historie ausgeben
+        if args.history:
+            updater.show_history(args.history)
+        # Nur Merge-Graph ausgeben
+        elif args.plan_graph:
+            updater.run_plan_graph(args.plan_graph, args.plan_graph_output)
         # Nur Module neu gebaut werden sollen
-        if args.rebuild_modules:
+        elif args.rebuild_modules:
             updater.run_modules_only()
         # Nur spezifische Operationen ausführen (--only-*)
         elif args.only_sync: